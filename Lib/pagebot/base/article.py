@@ -14,7 +14,6 @@
 #
 #     article.py
 #
-import os
 from pagebot.base.typesetter import Typesetter
 
 class Article:
@@ -67,10 +66,7 @@ class Article:
         and finding the related functions to call."""
         if self.mdText:
             t = Typesetter(self.doc.context)
-            tmpPath = '/tmp/PageBot-Article.xml'
-            path = t.markDown2XmlFile(tmpPath, self.mdText)
-            galley = t.typesetFile(path)
-            os.remove(tmpPath)
+            galley = t.typesetMarkdown(self.mdText)
 
 if __name__ == "__main__":
     import doctest
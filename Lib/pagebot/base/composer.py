@@ -87,8 +87,9 @@ class Composer:
 
             elif targets.get('box') is not None and targets.get('box').isText and targets.get('box').bs is not None and e.isText:
                 # If new content and last content are both text boxes, then
-                # merge the string.
-                targets.get('box').bs += e.bs
+                # merge the string, in place. Text.append marks the box to
+                # be solved again.
+                targets.get('box').append(e.bs)
 
             elif targets.get('box') is not None:
                 # Otherwise just paste the galley-element onto the target box.
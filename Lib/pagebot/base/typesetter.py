@@ -504,17 +504,94 @@ class Typesetter:
             s += str(postfix or '')
         return s
 
+    def _get_styles(self):
+        """Dictionary of styles by tag name or selector, such as "li p". Set
+        it as a whole, or call self.stylesChanged() after changing the names
+        in place. Added and removed names are found without that call too,
+        but not a compound name that replaces another one.
+
+        >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
+        >>> t = Typesetter(HtmlContext(), styles={'p': {}})
+        >>> sorted(t.getStyleMatcher())
+        ['p']
+        >>> t.styles = {'em': {}}
+        >>> sorted(t.getStyleMatcher())
+        ['em']
+        """
+        return self._styles
+    def _set_styles(self, styles):
+        self._styles = styles
+        self.stylesChanged()
+    styles = property(_get_styles, _set_styles)
+
+    def stylesChanged(self):
+        """Lets self know that the style names in self.styles changed, so
+        the selector trie is built again."""
+        self._styleMatcher = None
+
+    def getStyleMatcher(self):
+        """Answers the selector trie of self.styles. Style names such as
+        "li p" are split into tags and stored in reverse order, as nested
+        {tag: [childTrie, styleName]} dictionaries, so the tag history can be
+        matched from its end, without building all suffix strings. The trie is
+        built once, and again after self.stylesChanged() or if the number of
+        styles changed.
+
+        >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
+        >>> t = Typesetter(HtmlContext(), styles={'p': {}, 'li p': {}})
+        >>> trie = t.getStyleMatcher()
+        >>> sorted(trie), trie['p'][1], trie['p'][0]['li'][1]
+        (['p'], 'p', 'li p')
+        >>> style = t.styles.pop('li p')
+        >>> t.styles['ul p'] = {} # Same number of styles.
+        >>> t.stylesChanged()
+        >>> sorted(t.getStyleMatcher()['p'][0])
+        ['ul']
+        """
+        if self._styleMatcher is None or self._styleMatcherSize != len(self.styles):
+            trie = {}
+            for styleName in self.styles:
+                node = None
+                children = trie
+                for tag in reversed(styleName.split(' ')):
+                    node = children.setdefault(tag, [{}, None])
+                    children = node[0]
+                if node is not None:
+                    node[1] = styleName
+            self._styleMatcher = trie
+            self._styleMatcherSize = len(self.styles)
+        return self._styleMatcher
+
     def getMatchingStyleNames(self, tag):
-        """Answers the list of matching style, with decreasing relevance."""
-        revHistory = self.tagHistory[:]
-        revHistory.reverse()
+        """Answers the list of matching style, with decreasing relevance.
+
+        >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
+        >>> styles = {'p': dict(a=1), 'li p': dict(b=2), 'ul li p': {}, 'em': dict(c=3)}
+        >>> t = Typesetter(HtmlContext(), styles=styles)
+        >>> for tag in ('document', 'ul', 'li', 'p'):
+        ...     t.addHistory(tag)
+        >>> t.getMatchingStyleNames('p')
+        ['li p', 'p']
+        >>> style = styles.pop('em')
+        >>> styles['strong'] = dict(d=4) # Same number of styles, still found.
+        >>> t.addHistory('strong')
+        >>> t.getMatchingStyleNames('strong')
+        ['strong']
+        """
         matches = []
-        for n in range(len(revHistory)):
-            styleName = revHistory[:n+1]
-            styleName.reverse()
-            styleName = ' '.join(styleName)
-            style = self.getNamedStyle(styleName)
-            if style:
+        children = self.getStyleMatcher()
+        if self.tagHistory and self.tagHistory[-1] not in children and \
+                self.tagHistory[-1] in self.styles:
+            # Style added in place, without changing the number of styles.
+            self.stylesChanged()
+            children = self.getStyleMatcher()
+        # Walk back in history, as long as there are longer selectors.
+        for historyTag in reversed(self.tagHistory):
+            node = children.get(historyTag)
+            if node is None:
+                break
+            children, styleName = node
+            if styleName is not None and self.getNamedStyle(styleName):
                 matches.append(styleName)
         matches.reverse()
         return matches
@@ -541,12 +618,9 @@ class Typesetter:
         mergedStyle = copy.copy(self.peekStyle())
         # Find the best matching style for tag on order of relevance,
         # considering the possible HTML tag parents and the history.
-        for styleName in self.getMatchingStyleNames(tag):
-            nodeStyle = self.getNamedStyle(styleName)
-            if nodeStyle: # Not None and not empty
-                for name, value in nodeStyle.items():
-                    mergedStyle[name] = value
-                break
+        matches = self.getMatchingStyleNames(tag)
+        if matches:
+            mergedStyle.update(self.getNamedStyle(matches[0]))
         return mergedStyle
 
     def append(self, bs):
@@ -554,11 +628,8 @@ class Typesetter:
         galley, if it exists. Otherwise create a new Text and add it to
         self.galley."""
         if self.galley.elements and self.galley.elements[-1].isText:
-            box = self.galley.elements[-1]
-            if box.bs is None:
-                box.bs = bs
-            else:
-                box.bs += bs
+            # In place, without copying existing runs.
+            self.galley.elements[-1].append(bs)
         elif hasattr(bs, 's'):
             s = bs.s
             while s and s[0] in ' \t\n\r':
@@ -688,18 +759,14 @@ class Typesetter:
         # text. Back to the style of the parent, which was in nodeStyle.
         self.popStyle()
 
-    def markDown2XmlFile(self, fileName, mdText, mdExtensions=None):
-        """Take the markdown source, convert to HTML/XML and save in the file
-        called fileName. If the fileName does not end with ".xml" extension,
-        then add it. Answer the (new) fileName.
+    def markDown2Xml(self, mdText, mdExtensions=None):
+        """Take the markdown source, convert to HTML/XML and answer it as
+        string, wrapped in a <document> root tag. Nothing is written to disk.
 
-        >>> import os
         >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
-        >>> md = '''## Subtitle at start\\n\\n~~~\\npage = page.next\\n~~~\\n\\n# Title\\n\\n##Subtitle\\n\\nPlain text'''
-        >>> context = HtmlContext()
-        >>> t = Typesetter(context)
-        >>> fileName = t.markDown2XmlFile('/tmp/PageBot_Typesetter_test.xml', md)
-        >>> #os.remove(fileName)
+        >>> t = Typesetter(HtmlContext())
+        >>> t.markDown2Xml('# Title\\n\\nPlain text')
+        '<?xml version="1.0" encoding="utf-8"?>\\n<document><h1>Title</h1>\\n<p>Plain text</p></document>'
         """
         if mdExtensions is None:
             mdExtensions = self.MARKDOWN_EXTENSIONS
@@ -717,6 +784,22 @@ class Typesetter:
                 # Replace all returns by tabs. Paragraphs should be made with <p> and <br/>.
                 xml = xml.replace(c1, c2)
             xml += '\r'
+        return xml
+
+    def markDown2XmlFile(self, fileName, mdText, mdExtensions=None):
+        """Take the markdown source, convert to HTML/XML and save in the file
+        called fileName. If the fileName does not end with ".xml" extension,
+        then add it. Answer the (new) fileName.
+
+        >>> import os
+        >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
+        >>> md = '''## Subtitle at start\\n\\n~~~\\npage = page.next\\n~~~\\n\\n# Title\\n\\n##Subtitle\\n\\nPlain text'''
+        >>> context = HtmlContext()
+        >>> t = Typesetter(context)
+        >>> fileName = t.markDown2XmlFile('/tmp/PageBot_Typesetter_test.xml', md)
+        >>> #os.remove(fileName)
+        """
+        xml = self.markDown2Xml(mdText, mdExtensions)
 
         if not fileName.endswith('.xml'):
             # Make sure file name has xml extension.
@@ -728,20 +811,78 @@ class Typesetter:
         f.close()
         return fileName
 
-    def typesetMarkdown(self, mdText, mdExtensions=None, e=None, xPath=None):
-        tmpPath = '/tmp/PageBot_Typesetter.xml'
-        fileName = self.markDown2XmlFile(tmpPath, mdText, mdExtensions)
-        self.typesetFile(fileName, e=e, xPath=xPath)
-        #os.remove(tmpPath)
+    def typesetMarkdown(self, mdText, mdExtensions=None, e=None, xPath=None, xmlPath=None):
+        """Convert the markdown source to XML and typeset it into self.galley,
+        without temporary files. If the optional `xmlPath` is defined, then
+        the XML is also saved in that file, e.g. for debugging. Answer the
+        galley.
+
+        >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
+        >>> t = Typesetter(HtmlContext())
+        >>> galley = t.typesetMarkdown('# Title\\n\\nPlain text')
+        >>> t.root.tag, [node.tag for node in t.root]
+        ('document', ['h1', 'p'])
+        >>> galley is t.galley
+        True
+        """
+        xml = self.markDown2Xml(mdText, mdExtensions)
+        if xmlPath is not None:
+            # Optional copy on disk, not used for parsing.
+            f = codecs.open(xmlPath, mode="w", encoding="utf-8")
+            f.write(xml)
+            f.close()
+        return self.typesetXml(xml, e=e, xPath=xPath, name=xmlPath)
+
+    def typesetXml(self, xml, e=None, xPath=None, name=None):
+        """Parse the `xml` string in memory and typeset the nodes into
+        self.galley. If `xPath` is defined, then only typeset the first node
+        that matches. The optional `name` is set as name of the galley.
+        Answer the galley.
+
+        >>> from pagebot.contexts.htmlcontext.htmlcontext import HtmlContext
+        >>> t = Typesetter(HtmlContext())
+        >>> galley = t.typesetXml('<document><h1>Title</h1><p>Text</p></document>', xPath='p')
+        >>> t.root.tag
+        'document'
+        """
+        # Root element of the tree, stored for later retrieval.
+        return self.typesetRoot(ET.fromstring(xml), e=e, xPath=xPath, name=name)
+
+    def typesetRoot(self, root, e=None, xPath=None, name=None):
+        """Typeset the etree `root` node, or the first node that matches the
+        optional `xPath`, into self.galley. Answer the galley."""
+        self.root = root
+
+        # If XSL filtering is defined, they get the filtered nodes.
+        if xPath is not None:
+            filteredNodes = self.root.findall(xPath)
+            if filteredNodes:
+                # How to handle if we got multiple result nodes?
+                self.typesetNode(filteredNodes[0], e)
+        else:
+            # Collect all flowing text in one formatted string, while
+            # simulating the page/flow, because we need to keep track on which
+            # page/flow nodes results get positioned (e.g. for toc-head
+            # reference, image index and footnote placement.
+            self.typesetNode(self.root, e)
+
+        # Remember this galley where it came from.
+        if name is not None:
+            self.galley.name = name
+
+        # Answer the self.galley.
         return self.galley
 
-    def typesetFile(self, fileName, e=None, xPath=None, patterns=None):
+    def typesetFile(self, fileName, e=None, xPath=None, patterns=None, saveXml=False):
         """Read the XML document and parse it into a tree of document-chapter
         nodes. Make the typesetter start at page pageNumber and find the name
         of the flow in the page template.  The optional filter can be a list of
         tag names that need to be included in the composition, ignoring the
         rest.
 
+        MarkDown files are converted to XML in memory. If `saveXml` is True,
+        then the XML is also saved next to the MarkDown file.
+
         The optional rootStyle can be defined as style for the root tag,
         cascading force all child elements. Answer the root node."""
         fileExtension = fileName.split('.')[-1]
@@ -757,29 +898,15 @@ class Typesetter:
                 for pattern, pythonCode in patterns:
                     mdText = mdText.replace(pattern, pythonCode)
 
-            fileName = self.markDown2XmlFile(fileName, mdText) # Translate MarkDown to HTML and save in file.
+            if saveXml:
+                # Translate MarkDown to HTML and save in file.
+                fileName = self.markDown2XmlFile(fileName, mdText)
+            else:
+                xml = self.markDown2Xml(mdText)
+                return self.typesetXml(xml, e=e, xPath=xPath, name=fileName)
 
         tree = ET.parse(fileName)
-        self.root = tree.getroot() # Get the root element of the tree and store for later retrieval.
-
-        # If XSL filtering is defined, they get the filtered nodes.
-        if xPath is not None:
-            filteredNodes = self.root.findall(xPath)
-            if filteredNodes:
-                # How to handle if we got multiple result nodes?
-                self.typesetNode(filteredNodes[0], e)
-        else:
-            # Collect all flowing text in one formatted string, while
-            # simulating the page/flow, because we need to keep track on which
-            # page/flow nodes results get positioned (e.g. for toc-head
-            # reference, image index and footnote placement.
-            self.typesetNode(self.root, e)
-
-        # Remember this galley where it came from.
-        self.galley.name = fileName
-
-        # Answer the self.galley.
-        return self.galley
+        return self.typesetRoot(tree.getroot(), e=e, xPath=xPath, name=fileName)
 
 if __name__ == '__main__':
     import doctest
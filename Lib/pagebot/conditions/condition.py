@@ -14,6 +14,8 @@
 #     condition.py
 #
 class Condition:
+    # Instances of the conditions of evaluateAll() and solveAll().
+    _subConditions = None
 
     def __init__(self, value=1, tolerance=1, error=-10, verbose=False):
         self.value = value # Value to answer if the condition is valid
@@ -29,6 +31,23 @@ class Condition:
         # FIXME: no-member test()
         self.addScore(parent is not None, e, score)
 
+    def getDependencies(self, e):
+        """Answers the list of elements, other than `e`, that the solution of
+        this condition on `e` depends on. If one of them changes, then `e` is
+        solved again by an incremental Document.solve(). Default is the parent,
+        that most conditions align or fit to.
+
+        >>> from pagebot.elements.element import Element
+        >>> parent = Element(name='Parent')
+        >>> e = Element(name='Child', parent=parent)
+        >>> Condition().getDependencies(e) == [parent]
+        True
+        """
+        parent = e.parent
+        if parent is None:
+            return []
+        return [parent]
+
     def addScore(self, success, e, score):
         if success:
             score.result += self.value
@@ -36,15 +55,44 @@ class Condition:
             score.result += self.error
             score.fails.append((self, e))
 
+    def getSubConditions(self, conditionClasses):
+        """Answers the list of instances of `conditionClasses`, with the
+        value, tolerance, error and verbose of self. Instances are made once
+        and then reused by evaluateAll() and solveAll().
+
+        >>> from pagebot.conditions import Fit, Left2Left
+        >>> fit = Fit(tolerance=2)
+        >>> conditions = fit.getSubConditions([Left2Left])
+        >>> conditions, conditions[0].tolerance
+        ([Left2Left], 2)
+        >>> fit.getSubConditions([Left2Left])[0] is conditions[0]
+        True
+        """
+        if self._subConditions is None:
+            self._subConditions = {}
+        subConditions = self._subConditions
+        instances = []
+        for conditionClass in conditionClasses:
+            key = (conditionClass, self.value, self.tolerance, self.error, self.verbose)
+            condition = subConditions.get(key)
+            if condition is None:
+                condition = subConditions[key] = conditionClass(self.value,
+                    self.tolerance, self.error, self.verbose)
+            instances.append(condition)
+        return instances
+
     def evaluateAll(self, e, conditions, score):
-        result = 0
-        for conditionClass in conditions:
-            conditionClass(self.value, self.tolerance, self.error, self.verbose).evaluate(e, score)
+        for condition in self.getSubConditions(conditions):
+            condition.evaluate(e, score)
 
     def solveAll(self, e, conditions, score):
-        result = 0
-        for conditionClass in conditions:
-            conditionClass(self.value, self.tolerance, self.error, self.verbose).solve(e, score)
+        for condition in self.getSubConditions(conditions):
+            condition.solve(e, score)
 
     def __repr__(self):
         return self.__class__.__name__
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -14,10 +14,32 @@
 #     floating.py
 #
 from pagebot.conditions.condition import Condition
+from pagebot.conditions.solvegraph import getSiblingsKey
+
+class FloatCondition(Condition):
+    """Float conditions place the element against the previous siblings in
+    the same z-layer, so they depend on these too."""
+    def getDependencies(self, e):
+        """Answers the parent of `e` and the key of the siblings node of the
+        parent in the SolveGraph, so a change of any of the siblings marks `e`
+        with a single edge, instead of an edge to each previous sibling.
+
+        >>> from pagebot.elements.element import Element
+        >>> from pagebot.conditions.solvegraph import getSiblingsKey
+        >>> parent = Element(name='Parent')
+        >>> e1 = Element(name='E1', parent=parent)
+        >>> e2 = Element(name='E2', parent=parent)
+        >>> Float2Top().getDependencies(e2) == [parent, getSiblingsKey(parent)]
+        True
+        """
+        dependencies = Condition.getDependencies(self, e)
+        if dependencies:
+            dependencies.append(getSiblingsKey(dependencies[0]))
+        return dependencies
 
 # Margins
 
-class Float2Left(Condition):
+class Float2Left(FloatCondition):
     """Align the element.left with max of all placed element.right or
     parent.left. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -27,7 +49,7 @@ class Float2Left(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Left(), e, score)
 
-class Float2Right(Condition):
+class Float2Right(FloatCondition):
     """Align the element.right with min of all placed element.left or
     parent.right. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -37,7 +59,7 @@ class Float2Right(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Right(), e, score)
 
-class Float2Top(Condition):
+class Float2Top(FloatCondition):
     """Align the `element.top` with max of all placed `element.bottom` or
     `parent.top`. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -47,7 +69,7 @@ class Float2Top(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Top(), e, score)
 
-class Float2Bottom(Condition):
+class Float2Bottom(FloatCondition):
     """Align the element.bottom with max of all placed element.top or
     parent.bottom. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -59,7 +81,7 @@ class Float2Bottom(Condition):
 
 # Sides
 
-class Float2SideLeft(Condition):
+class Float2SideLeft(FloatCondition):
     """Align the element.left with max of all placed element.right or
     parent.sideLeft. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -69,7 +91,7 @@ class Float2SideLeft(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideLeft(), e, score)
 
-class Float2SideRight(Condition):
+class Float2SideRight(FloatCondition):
     """Align the element.right with min of all placed element.left or
     parent.sideRight. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -79,7 +101,7 @@ class Float2SideRight(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideRight(), e, score)
 
-class Float2SideTop(Condition):
+class Float2SideTop(FloatCondition):
     """Align the element.top with max of all placed element.bottom or
     parent.sideTop. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -89,7 +111,7 @@ class Float2SideTop(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideTop(), e, score)
 
-class Float2SideBottom(Condition):
+class Float2SideBottom(FloatCondition):
     """Align the element.bottom with max of all placed element.top or
     parent.sideBottom. Positioning includes the margin of all elements."""
     def test(self, e):
@@ -101,7 +123,7 @@ class Float2SideBottom(Condition):
 
 # Combinations
 
-class Float2LeftTop(Condition):
+class Float2LeftTop(FloatCondition):
     def test(self, e):
         return e.isFloatOnLeft(self.tolerance) and e.isFloatOnTop(self.tolerance)
 
@@ -109,7 +131,7 @@ class Float2LeftTop(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Left() and e.float2Top(), e, score)
 
-class Float2TopLeft(Condition):
+class Float2TopLeft(FloatCondition):
     def test(self, e):
         return e.isFloatOnTop(self.tolerance) and e.isFloatOnLeft(self.tolerance)
 
@@ -117,7 +139,7 @@ class Float2TopLeft(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Top() and e.float2Left(), e, score)
 
-class Float2RightTop(Condition):
+class Float2RightTop(FloatCondition):
     def test(self, e):
         return e.isFloatOnRight(self.tolerance) and e.isFloatOnTop(self.tolerance)
 
@@ -125,7 +147,7 @@ class Float2RightTop(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Right() and e.float2Top(), e, score)
 
-class Float2TopRight(Condition):
+class Float2TopRight(FloatCondition):
     def test(self, e):
         return e.isFloatOnTop(self.tolerance) and e.isFloatOnRight(self.tolerance)
 
@@ -133,7 +155,7 @@ class Float2TopRight(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Top() and e.float2Right(), e, score)
 
-class Float2LeftBottom(Condition):
+class Float2LeftBottom(FloatCondition):
     def test(self, e):
         return e.isFloatOnLeft(self.tolerance) and e.isFloatOnBottom(self.tolerance)
 
@@ -141,7 +163,7 @@ class Float2LeftBottom(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Left() and e.float2Bottom(), e, score)
 
-class Float2BottomLeft(Condition):
+class Float2BottomLeft(FloatCondition):
     def test(self, e):
         return e.isFloatOnBottom(self.tolerance) and e.isFloatOnLeft(self.tolerance)
 
@@ -149,7 +171,7 @@ class Float2BottomLeft(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Bottom() and e.float2Left(), e, score)
 
-class Float2RightBottom(Condition):
+class Float2RightBottom(FloatCondition):
     def test(self, e):
         return e.isFloatOnRight(self.tolerance) and e.isFloatOnBottom(self.tolerance)
 
@@ -157,7 +179,7 @@ class Float2RightBottom(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2Right() and e.float2Bottom(), e, score)
 
-class Float2BottomRight(Condition):
+class Float2BottomRight(FloatCondition):
     def test(self, e):
         return e.isFloatOnBottom(self.tolerance) and e.isFloatOnRight(self.tolerance)
 
@@ -167,7 +189,7 @@ class Float2BottomRight(Condition):
 
 # Combination sides
 
-class Float2SideLeftTops(Condition):
+class Float2SideLeftTops(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideLeft(self.tolerance) and e.isFloatOnSideTop(self.tolerance)
 
@@ -175,7 +197,7 @@ class Float2SideLeftTops(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideLeft() and e.float2SideTop(), e, score)
 
-class Float2TopSideLefts(Condition):
+class Float2TopSideLefts(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideTop(self.tolerance) and e.isFloatOnSideLeft(self.tolerance)
 
@@ -183,7 +205,7 @@ class Float2TopSideLefts(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideTop() and e.float2SideLeft(), e, score)
 
-class Float2SideRightTops(Condition):
+class Float2SideRightTops(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideRight(self.tolerance) and e.isFloatOnSideTop(self.tolerance)
 
@@ -191,7 +213,7 @@ class Float2SideRightTops(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideRight() and e.float2SideTop(), e, score)
 
-class Float2TopSideRights(Condition):
+class Float2TopSideRights(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideTop(self.tolerance) and e.isFloatOnSideRight(self.tolerance)
 
@@ -199,7 +221,7 @@ class Float2TopSideRights(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideTop() and e.float2SideRight(), e, score)
 
-class Float2SideLeftBottoms(Condition):
+class Float2SideLeftBottoms(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideLeft(self.tolerance) and e.isFloatOnSideBottom(self.tolerance)
 
@@ -207,7 +229,7 @@ class Float2SideLeftBottoms(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideLeft() and e.float2SideBottom(), e, score)
 
-class Float2BottomSideLefts(Condition):
+class Float2BottomSideLefts(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideBottom(self.tolerance) and e.isFloatOnSideLeft(self.tolerance)
 
@@ -215,7 +237,7 @@ class Float2BottomSideLefts(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideBottom() and e.float2SideLeft(), e, score)
 
-class Float2SideRightBottoms(Condition):
+class Float2SideRightBottoms(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideRight(self.tolerance) and e.isFloatOnSideBottom(self.tolerance)
 
@@ -223,10 +245,15 @@ class Float2SideRightBottoms(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideRight() and e.float2SideBottom(), e, score)
 
-class Float2BottomSideRights(Condition):
+class Float2BottomSideRights(FloatCondition):
     def test(self, e):
         return e.isFloatOnSideBottom(self.tolerance) and e.isFloatOnSideRight(self.tolerance)
 
     def solve(self, e, score):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.float2SideBottom() and e.float2SideRight(), e, score)
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -42,6 +42,30 @@ class Overflow2Next(Condition):
         if not self.test(e): # Only try to solve if condition test fails.
             self.addScore(e.overflow2Next(), e, score)
 
+    def getDependencies(self, e):
+        """Answers the parent and the elements in the flow after `e`, that the
+        overflow of `e` is poured into. If one of them changes (e.g. it is
+        resized), then the flow is solved again from `e`.
+
+        >>> from pagebot.document import Document
+        >>> from pagebot.elements import Element
+        >>> doc = Document(w=300, h=300)
+        >>> page = doc[1]
+        >>> e1 = Element(name='e1', nextElement='e2', parent=page)
+        >>> e2 = Element(name='e2', nextElement='e3', parent=page)
+        >>> e3 = Element(name='e3', nextElement='e1', parent=page) # Circular
+        >>> [d.name for d in Overflow2Next().getDependencies(e1)]
+        ['default', 'e2', 'e3']
+        """
+        dependencies = Condition.getDependencies(self, e)
+        eIds = {e.eId}
+        nextElement = e.next
+        while nextElement is not None and nextElement.eId not in eIds:
+            eIds.add(nextElement.eId)
+            dependencies.append(nextElement)
+            nextElement = nextElement.next
+        return dependencies
+
 class EqualizeFlow2Height(Condition):
         """Test if all elements in the flow have the same height and/or same
         amount of text lines."""
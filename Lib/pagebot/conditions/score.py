@@ -14,9 +14,45 @@
 #     score.py
 #
 class Score:
-    def __init__(self):
+    """Result of solving the conditions of elements. The Solver also sets the
+    number of solve passes and if they converged or oscillated. If `timing`
+    is a dictionary, then Element.solve() adds the time spent per condition
+    class.
+
+    >>> score = Score(timing=True)
+    >>> score.addTiming('Float2Top', 0.5)
+    >>> score.addTiming('Float2Top', 0.25)
+    >>> score.timing
+    {'Float2Top': [2, 0.75]}
+    >>> score
+    Score: 0 Fails: 0
+    """
+    def __init__(self, timing=False):
         self.result = 0
         self.fails = []
+        # Set by the Solver.
+        self.iterations = 1
+        self.converged = None
+        self.oscillating = False
+        # Key is condition class name, value is [calls, seconds].
+        self.timing = None
+        if timing:
+            self.timing = {}
 
     def __repr__(self):
         return 'Score: %s Fails: %d' % (self.result, len(self.fails))
+
+    def addTiming(self, condition, seconds):
+        """Adds the `seconds` spent in solving `condition` to self.timing."""
+        if not isinstance(condition, str):
+            condition = condition.__class__.__name__
+        timing = self.timing.get(condition)
+        if timing is None:
+            timing = self.timing[condition] = [0, 0]
+        timing[0] += 1
+        timing[1] += seconds
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     solvegraph.py
+#
+#     Dependency graph of the conditions of a document. If the solution of
+#     the conditions of element A depends on element B (e.g. A floats against
+#     B, or aligns on the padding of its parent B), then A is a dependent of
+#     B. When B changes, Element.markDirty() marks A too, so an incremental
+#     Document.solve() solves A again. Edges are made by Element.solve() from
+#     Condition.getDependencies(), dependents are kept by weakref.
+#     Conditions that depend on all child elements of a parent (such as the
+#     float conditions) use the siblings node of the parent instead, so the
+#     graph does not grow with the square of the number of children.
+#
+import weakref
+
+def getSiblingsKey(parent):
+    """Answers the key of the node in the graph that stands for all child
+    elements of `parent`. A change of one of the children marks the
+    dependents of this node that come after it in parent.elements.
+
+    >>> from pagebot.elements.element import Element
+    >>> parent = Element(name='Parent')
+    >>> getSiblingsKey(parent) == ('siblings', parent.eId)
+    True
+    """
+    return ('siblings', parent.eId)
+
+class SolveGraph:
+    """Keeps the dependent elements of elements, by their eId.
+
+    >>> from pagebot.elements.element import Element
+    >>> parent = Element(name='Parent')
+    >>> e1 = Element(name='E1', parent=parent)
+    >>> e2 = Element(name='E2', parent=parent)
+    >>> graph = SolveGraph()
+    >>> graph.setDependencies(e2, [parent, e1])
+    >>> graph.getDependents(e1) == [e2], graph.getDependents(parent) == [e2]
+    (True, True)
+    >>> graph.setDependencies(e2, [parent]) # Replaces the previous edges.
+    >>> graph.getDependents(e1), len(graph)
+    ([], 1)
+    >>> e3 = Element(name='E3', parent=parent)
+    >>> graph.setDependencies(e3, [parent, getSiblingsKey(parent), parent])
+    >>> [e.name for e in graph.getDependents(e1)], len(graph)
+    (['E3'], 3)
+    """
+    def __init__(self):
+        # Key is eId of an element, value is {eId: dependent element}
+        self.dependents = {}
+        # Key is eId of a dependent element, value is tuple of the eIds of the
+        # elements it depends on.
+        self.dependencies = {}
+        # Number of times that elements were solved, see Element.markDirty()
+        self.solved = 0
+
+    def __repr__(self):
+        return '<%s %d edges>' % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return sum(len(eIds) for eIds in self.dependencies.values())
+
+    def setDependencies(self, e, elements):
+        """Sets the list of `elements` that the conditions of `e` depend on,
+        replacing the previous ones. The list may contain siblings keys, made
+        by getSiblingsKey(). Elements without eId, such as the document, are
+        ignored."""
+        self.removeDependencies(e)
+        eIds = {} # Ordered set of the keys.
+        for dependency in elements:
+            if isinstance(dependency, tuple):
+                eId = dependency
+            else:
+                eId = getattr(dependency, 'eId', None)
+            if eId is None or dependency is e or eId in eIds:
+                continue
+            dependents = self.dependents.get(eId)
+            if dependents is None:
+                dependents = self.dependents[eId] = weakref.WeakValueDictionary()
+            dependents[e.eId] = e
+            eIds[eId] = True
+        if eIds:
+            self.dependencies[e.eId] = tuple(eIds)
+
+    def removeDependencies(self, e):
+        """Removes the edges from the elements that `e` depends on."""
+        for eId in self.dependencies.pop(e.eId, ()):
+            dependents = self.dependents.get(eId)
+            if dependents is not None:
+                dependents.pop(e.eId, None)
+                if not dependents:
+                    del self.dependents[eId]
+
+    def getDependents(self, e, seenSiblings=None):
+        """Answers the list of elements that depend on `e`, including the
+        dependents of the siblings node of the parent of `e` that come after
+        `e` in parent.elements. The float conditions only look at previous
+        siblings, so a change of `e` does not affect the ones before it. If
+        the dictionary `seenSiblings` is defined, then it keeps per siblings
+        key the lowest order of a child that was answered already. Dependents
+        after that order are skipped, so a walk over the graph answers the
+        dependents of a siblings node only once.
+
+        >>> from pagebot.elements.element import Element
+        >>> parent = Element(name='Parent')
+        >>> e1, e2, e3 = [Element(name='E%d' % n, parent=parent) for n in (1, 2, 3)]
+        >>> graph = SolveGraph()
+        >>> for e in (e1, e2, e3):
+        ...     graph.setDependencies(e, [parent, getSiblingsKey(parent)])
+        >>> [e.name for e in graph.getDependents(e1)], graph.getDependents(e3)
+        (['E2', 'E3'], [])
+        >>> seenSiblings = {}
+        >>> [e.name for e in graph.getDependents(e2, seenSiblings)], graph.getDependents(e3, seenSiblings)
+        (['E3'], [])
+        >>> [e.name for e in graph.getDependents(e1, seenSiblings)]
+        ['E2']
+        """
+        dependents = self.dependents.get(e.eId)
+        if dependents:
+            dependents = list(dependents.values())
+        else:
+            dependents = []
+        parent = e.parent
+        if parent is not None and getattr(parent, 'eId', None) is not None:
+            key = getSiblingsKey(parent)
+            siblingDependents = self.dependents.get(key)
+            if siblingDependents:
+                # Order of the children, kept by the float query index.
+                orders = parent.siblingIndex.orders
+                order = orders.get(e.eId, -1)
+                seenOrder = len(orders)
+                if seenSiblings is not None:
+                    seenOrder = seenSiblings.get(key, seenOrder)
+                    seenSiblings[key] = min(order, seenOrder)
+                for eId, d in siblingDependents.items():
+                    if order < orders.get(eId, -1) <= seenOrder:
+                        dependents.append(d)
+        return dependents
+
+    def clear(self):
+        self.dependents = {}
+        self.dependencies = {}
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     solver.py
+#
+#     Solves the conditions of a document or element in repeated passes,
+#     until a pass no longer changes the layout. One pass solves the
+#     conditions in tree order, so conditions that depend on elements that
+#     are solved later in the same pass (a block that is fitted after its
+#     children are aligned, overflow into a next element) need more passes.
+#     The layout state after each pass is compared with the previous ones:
+#     an equal state is a fixpoint, a state equal to an older one means that
+#     the conditions oscillate, so more passes will not solve them.
+#
+from pagebot.conditions.score import Score
+from pagebot.toolbox.units import upt
+
+# Maximum number of passes of Solver.solve(), if not defined otherwise.
+SOLVE_MAX_ITERATIONS = 10
+
+def getSolveState(target):
+    """Answers the hashable layout state of `target` (a document or an
+    element) and its descendants: the position, size and text length of all
+    elements, in tree order.
+
+    >>> from pagebot.elements.element import Element
+    >>> e = Element(x=10, y=20, w=100, h=200, elements=[Element(w=50, h=60)])
+    >>> state = getSolveState(e)
+    >>> state
+    ((10, 20, 100, 200, None), (0, 0, 50, 60, None))
+    >>> e.elements[0].x = 5
+    >>> getSolveState(e) == state
+    False
+    """
+    if hasattr(target, 'getSortedPages'): # Document
+        todo = []
+        for _, pnPages in target.getSortedPages():
+            todo += pnPages
+        todo.reverse()
+    else:
+        todo = [target]
+    state = []
+    while todo: # Depth first, without recursion.
+        e = todo.pop()
+        textLength = None
+        if e.isText and e.bs is not None:
+            textLength = len(e.bs)
+        state.append((upt(e.x), upt(e.y), upt(e.w), upt(e.h), textLength))
+        children = list(e.iterElements())
+        children.reverse()
+        todo += children
+    return tuple(state)
+
+class Solver:
+    """Solves the conditions of a document or element, until the layout no
+    longer changes, the conditions oscillate or `maxIterations` passes are
+    done. The answered Score has the result and fails of the last pass, next
+    to the number of passes. The layout converged if the last pass changed
+    nothing and no condition failed. If `timing` is True, then score.timing
+    has the number of calls and seconds of all passes per condition class.
+
+    >>> from pagebot.document import Document
+    >>> from pagebot.elements.element import Element
+    >>> from pagebot.conditions import SolveBlock, Left2Left, Fit2Right, Right2Right
+    >>> doc = Document(w=500, h=500)
+    >>> page = doc[1]
+    >>> page.padding = 0
+    >>> conditions = [SolveBlock(), Left2Left(), Fit2Right()] # Fit after the child.
+    >>> box = Element(w=100, h=100, parent=page, conditions=conditions)
+    >>> child = Element(w=50, h=40, parent=box, conditions=[Right2Right()])
+    >>> score = Solver(timing=True).solve(doc)
+    >>> score, score.iterations, score.converged, box.w, child.x
+    (Score: 0 Fails: 0, 3, True, 500pt, 450pt)
+    >>> sorted(score.timing), score.timing['Right2Right'][0]
+    (['Fit2Right', 'Left2Left', 'Right2Right', 'SolveBlock'], 3)
+    >>> Solver().solve(doc).iterations # Already solved.
+    1
+
+    >>> from pagebot.conditions.condition import Condition
+    >>> class Toggle(Condition):
+    ...     def solve(self, e, score):
+    ...         e.x = 100 - e.x
+    >>> e = Element(x=0, parent=page, conditions=[Toggle()])
+    >>> score = Solver(maxIterations=20).solve(e)
+    >>> score.iterations, score.converged, score.oscillating
+    (2, False, True)
+
+    >>> class Fail(Condition):
+    ...     def solve(self, e, score):
+    ...         self.addScore(False, e, score)
+    >>> e.conditions = [Fail()]
+    >>> score = Solver().solve(e) # Nothing changes, but not solved.
+    >>> score, score.iterations, score.converged, score.oscillating
+    (Score: -10 Fails: 1, 1, False, False)
+    >>> e = Element(parent=page, conditions=[Fail()])
+    >>> score = Solver().solve(e, incremental=True)
+    >>> score, score.iterations, score.converged
+    (Score: -10 Fails: 1, 1, False)
+    """
+    def __init__(self, maxIterations=None, timing=False):
+        if maxIterations is None:
+            maxIterations = SOLVE_MAX_ITERATIONS
+        self.maxIterations = max(1, maxIterations)
+        self.timing = timing
+
+    def __repr__(self):
+        return '<%s maxIterations=%d>' % (self.__class__.__name__, self.maxIterations)
+
+    def solve(self, target, score=None, incremental=False):
+        """Solves the conditions of `target`, a document or an element, in
+        passes of target.solve(). If `incremental` is True, then each pass
+        only solves the elements that changed (see Element.markDirty) or
+        failed in the previous pass. Answers the Score, adding to `score` if
+        it is defined."""
+        if score is None:
+            score = Score(timing=self.timing)
+        elif self.timing and score.timing is None:
+            score.timing = {}
+
+        states = {getSolveState(target): 0}
+        score.converged = False
+        score.oscillating = False
+
+        for iteration in range(1, self.maxIterations + 1):
+            passScore = Score()
+            passScore.timing = score.timing
+            target.solve(passScore, incremental)
+            score.iterations = iteration
+            if incremental:
+                # Try the failing conditions again in the next pass, as a
+                # full pass does, so their fails are in the last pass too.
+                for _, e in passScore.fails:
+                    e.markDirty()
+
+            state = getSolveState(target)
+            seen = states.get(state)
+            if seen == iteration - 1:
+                # This pass changed nothing. The layout is solved if no
+                # condition failed, otherwise more passes will not solve it.
+                score.converged = not passScore.fails
+                break
+            if seen is not None:
+                # Back at the layout of an older pass.
+                score.oscillating = True
+                break
+            states[state] = iteration
+
+        # Result and fails of the last pass.
+        score.result += passScore.result
+        score.fails += passScore.fails
+        return score
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
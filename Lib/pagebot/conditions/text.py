@@ -18,20 +18,7 @@
 #     to solve it. Otherwise a fail remains after self.solve()
 #
 from pagebot.conditions.condition import Condition
-
-# Margins
-
-class Overflow2Next(Condition):
-    """If the element has overflow, then try to solve it. Note that
-    when used in a Composer-typesetter environment, this will not update the
-    `globals['page']` value. In that case it is better to call the
-    `Element.overflow2Next()` directly at the start of a new chapter."""
-    def test(self, e):
-        return e.isOverflow(self.tolerance)
-
-    def solve(self, e, score):
-        if not self.test(e): # Only try to solve if condition test fails.
-            self.addScore(e.overflow2Next(), e, score)
+from pagebot.conditions.flow import Overflow2Next # Defined in flow.py
 
 # Columns
 
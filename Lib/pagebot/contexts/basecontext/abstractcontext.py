@@ -39,6 +39,16 @@ class AbstractContext:
         """PageBot function."""
         raise NotImplementedError
 
+    def savePage(self, path, index, fileType=None, pageIndex=-1):
+        """Saves page `pageIndex` of the drawing as page `index` of a
+        multi-page export to `path`. PageBot function."""
+        raise NotImplementedError
+
+    def saveFrames(self, frames, path, durations=None):
+        """Saves the `frames` answered by self.savePage() as animation to
+        `path`. PageBot function."""
+        raise NotImplementedError
+
     def getDrawing(self):
         """Answers the current drawing stack/canvas. Note that the result is
         native to the context, no standard API can be applied to this object.
@@ -19,6 +19,7 @@ from pagebot.constants import (DEFAULT_LANGUAGE, DEFAULT_FONT_SIZE,
 from pagebot.fonttoolbox.objects.font import findFont
 from pagebot.toolbox.units import units, em, upt
 from pagebot.toolbox.color import color
+from pagebot.style import copyStyleValues
 
 class BabelRun:
 
@@ -63,6 +64,21 @@ class BabelRun:
             return False
         return self.s == pbr.s and self.style == pbr.style
 
+    def copy(self):
+        """Answers a copy of self, sharing the string and the immutable style
+        values. The native context run is not copied.
+
+        >>> from pagebot.toolbox.units import pt
+        >>> run = BabelRun('ABCD', dict(fontSize=pt(12)))
+        >>> copied = run.copy()
+        >>> copied == run, copied.s is run.s, copied.style is run.style
+        (True, True, False)
+        """
+        run = self.__class__(self.s, copyStyleValues(self.style))
+        if 'context' in self.__dict__:
+            run.context = self.context
+        return run
+
     def __repr__(self):
         r = '<%s' % self.__class__.__name__
         if self.s:
@@ -181,6 +197,23 @@ class BabelLineInfo:
     def __repr__(self):
         return '<%s y=%s>' % (self.__class__.__name__, self.y)
 
+    def copy(self):
+        """Answers a copy of self with copies of the run infos, so changes to
+        the copy or its runs don't alter self. The native context line is
+        shared.
+
+        >>> line = BabelLineInfo(0, 20, None)
+        >>> line.runs.append(BabelRunInfo('ABCD', dict(fontSize=12), None))
+        >>> copied = line.copy()
+        >>> copied.runs[0].style['fontSize'] = 14
+        >>> copied.runs.append(BabelRunInfo('EFGH', {}, None))
+        >>> len(line.runs), line.runs[0].style['fontSize'], copied.y
+        (1, 12, 20pt)
+        """
+        line = self.__class__(self.x, self.y, self.context, cLine=self.cLine)
+        line.runs = [run.copy() for run in self.runs]
+        return line
+
 
 class BabelRunInfo:
     """BabelRunInfo is information decompiled from a native context text line.
@@ -200,3 +233,8 @@ class BabelRunInfo:
 
     def __repr__(self):
         return '<%s "%s">' % (self.__class__.__name__, self.s)
+
+    def copy(self):
+        """Answers a copy of self with a copy of the style. The native context
+        run is shared."""
+        return self.__class__(self.s, copyStyleValues(self.style), self.context, cRun=self.cRun)
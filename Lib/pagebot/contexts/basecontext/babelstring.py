@@ -35,6 +35,11 @@ from pagebot.fonttoolbox.objects.font import findFont, Font
 from pagebot.toolbox.units import units, pt, em, upt
 from pagebot.toolbox.color import color
 
+def isMarkerRun(run):
+    """Answers if `run` is a marker run, as added by BabelString.addMarker().
+    Marker runs are not merged with other runs."""
+    return run.s.startswith('[[') and '::' in run.s
+
 class BabelString:
     """BabelString is a generic string format, that stores a string or text as
     a list of BabelRun instances. String behaviour can differ between various
@@ -163,6 +168,7 @@ class BabelString:
         self._pwh = None # Cache of calculated pixel width (self.pw, self.ph)
         self._overflowStart = None # Line index where overflow starts.
         self._overflowEnd = None # Line (non-inclusive)
+        self._fontMetrics = {} # Cache of font metrics by font, see self.getFontMetrics()
 
     def _get_w(self):
         """Answers the request width of this string. If None, no width is
@@ -397,9 +403,7 @@ class BabelString:
         topLineAscender = 0
         if self.lines:
             for run in self.lines[0].runs:
-                font = self.getFont(run.style)
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                topLineAscender = max(topLineAscender, fontSize * font.info.typoAscender / font.info.unitsPerEm)
+                topLineAscender = max(topLineAscender, self.getRunMetric(run.style, 'typoAscender'))
         return topLineAscender
     topLineAscender = property(_get_topLineAscender)
 
@@ -431,10 +435,7 @@ class BabelString:
         topLineAscender_h = 0
         if self.lines:
             for run in self.lines[0].runs:
-                font = self.getFont(run.style)
-                ascender_h = font['h'].maxY
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                topLineAscender_h = max(topLineAscender_h, fontSize * ascender_h / font.info.unitsPerEm)
+                topLineAscender_h = max(topLineAscender_h, self.getRunMetric(run.style, 'ascender_h'))
         return topLineAscender_h
     topLineAscender_h = property(_get_topLineAscender_h)
 
@@ -464,9 +465,7 @@ class BabelString:
         topLineDescender = 0
         if self.lines:
             for run in self.lines[0].runs:
-                font = self.getFont(run.style)
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                topLineDescender = min(topLineDescender, fontSize * font.info.typoDescender / font.info.unitsPerEm)
+                topLineDescender = min(topLineDescender, self.getRunMetric(run.style, 'typoDescender'))
         return topLineDescender
     topLineDescender = property(_get_topLineDescender)
 
@@ -479,9 +478,7 @@ class BabelString:
 
         if self.lines:
             for run in self.lines[0].runs:
-                font = self.getFont(run.style)
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                topLineCapHeight = max(topLineCapHeight, fontSize * font.info.capHeight / font.info.unitsPerEm)
+                topLineCapHeight = max(topLineCapHeight, self.getRunMetric(run.style, 'capHeight'))
         return topLineCapHeight
     topLineCapHeight = property(_get_topLineCapHeight)
 
@@ -492,9 +489,7 @@ class BabelString:
         topLineXHeight = 0
         if self.lines:
             for run in self.lines[0].runs:
-                font = self.getFont(run.style)
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                topLineXHeight = max(topLineXHeight, fontSize * font.info.xHeight / font.info.unitsPerEm)
+                topLineXHeight = max(topLineXHeight, self.getRunMetric(run.style, 'xHeight'))
         return topLineXHeight
     topLineXHeight = property(_get_topLineXHeight)
 
@@ -506,9 +501,7 @@ class BabelString:
         bottomLineDescender = 0
         if self.lines:
             for run in self.lines[-1].runs:
-                font = self.getFont(run.style)
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                bottomLineDescender = min(bottomLineDescender, fontSize * font.info.typoDescender / font.info.unitsPerEm)
+                bottomLineDescender = min(bottomLineDescender, self.getRunMetric(run.style, 'typoDescender'))
         return bottomLineDescender
     bottomLineDescender = property(_get_bottomLineDescender)
 
@@ -521,14 +514,59 @@ class BabelString:
         bottomLineDescender_p = 0
         if self.lines:
             for run in self.lines[-1].runs:
-                font = self.getFont(run.style)
-                descender_p = font['p'].minY
-                fontSize = units(run.style.get('fontSize', DEFAULT_FONT_SIZE))
-                bottomLineDescender_p = min(bottomLineDescender_p, fontSize * descender_p / font.info.unitsPerEm)
+                bottomLineDescender_p = min(bottomLineDescender_p, self.getRunMetric(run.style, 'descender_p'))
         return bottomLineDescender_p
     bottomLineDescender_p = property(_get_bottomLineDescender_p)
 
 
+    def getFontMetrics(self, style):
+        """Answers the dictionary with the metrics of the font of `style` in
+        font units. Metrics are kept by font until self.reset(), so the font of
+        runs and lines is only found once.
+
+        >>> from pagebot.contexts import getContext
+        >>> context = getContext()
+        >>> bs = BabelString('ABCD', dict(font='PageBot-Regular'), context=context)
+        >>> metrics = bs.getFontMetrics(bs.style)
+        >>> metrics['unitsPerEm'], metrics['typoAscender']
+        (1000, 748)
+        >>> metrics is bs.getFontMetrics(dict(font='PageBot-Regular', fontSize=pt(24)))
+        True
+        """
+        fontKey = style.get('font')
+        if isinstance(fontKey, Font):
+            fontKey = fontKey.path
+        metrics = self._fontMetrics.get(fontKey)
+        if metrics is None:
+            font = self.getFont(style)
+            info = font.info
+            metrics = dict(font=font, unitsPerEm=info.unitsPerEm,
+                typoAscender=info.typoAscender, typoDescender=info.typoDescender,
+                capHeight=info.capHeight, xHeight=info.xHeight)
+            self._fontMetrics[fontKey] = metrics
+        return metrics
+
+    def getRunMetric(self, style, name):
+        """Answers the font metric `name` of the run `style`, scaled to its
+        fontSize. Besides the keys of self.getFontMetrics(), the `name` can be
+        "ascender_h" (top of /h) or "descender_p" (bottom of /p).
+
+        >>> from pagebot.contexts import getContext
+        >>> context = getContext()
+        >>> style = dict(font='PageBot-Regular', fontSize=pt(100))
+        >>> bs = BabelString('ABCD', style, context=context)
+        >>> bs.getRunMetric(style, 'typoAscender'), bs.getRunMetric(style, 'ascender_h')
+        (74.8pt, 72pt)
+        """
+        metrics = self.getFontMetrics(style)
+        if name not in metrics:
+            if name == 'ascender_h':
+                metrics[name] = metrics['font']['h'].maxY
+            elif name == 'descender_p':
+                metrics[name] = metrics['font']['p'].minY
+        fontSize = units(style.get('fontSize', DEFAULT_FONT_SIZE))
+        return fontSize * metrics[name] / metrics['unitsPerEm']
+
     def addMarker(self, markerId, arg):
         """Adds a marker as a new run. Code can run through the self.runs to
         mark a run with additional information. A marker is a tiny piece of
@@ -821,6 +859,97 @@ class BabelString:
         bsResult.reset()
         return bsResult
 
+    def extend(self, bs):
+        """Appends the plain string or the runs of BabelString `bs` to self,
+        without copying the existing runs of self. Runs of `bs` with a style
+        equal to the last run are merged into it. Other runs are added as new
+        BabelRun instances with a copy of their style, so later changes to `bs`
+        don't alter self. Like `self + bs`, the width and height of `bs` are
+        taken. The context cache is cleared once.
+
+        >>> from pagebot.toolbox.units import pt
+        >>> from pagebot.contexts import getContext
+        >>> context = getContext()
+        >>> bs1 = context.newString('ABCD', dict(fontSize=pt(18)))
+        >>> runs = bs1.runs
+        >>> bs1.extend(context.newString('EFGH', dict(fontSize=pt(18)))) # Equal style, merged
+        >>> bs1.runs
+        [<BabelRun "ABCDEFGH">]
+        >>> bs2 = context.newString('IJKL', dict(fontSize=pt(24)))
+        >>> bs1.extend(bs2)
+        >>> bs1.runs, bs1.runs is runs
+        ([<BabelRun "ABCDEFGH">, <BabelRun "IJKL">], True)
+        >>> bs2.fontSize = pt(30) # Changing bs2 does not change bs1
+        >>> bs1.fontSize
+        24pt
+        >>> bs1.extend('MN') # Plain string is added to the last run.
+        >>> bs1.runs
+        [<BabelRun "ABCDEFGH">, <BabelRun "IJKLMN">]
+        """
+        if isinstance(bs, str):
+            self.add(bs) # Add to last run or create new BabelRun
+            return
+        if not isinstance(bs, BabelString):
+            raise ValueError("@bs must be string or other %s" % self.__class__.__name__)
+
+        runs = self.runs
+        for run in bs.runs:
+            if not run.s:
+                continue
+            lastRun = runs[-1] if runs else None
+            if lastRun is not None and lastRun.style == run.style and \
+                    not isMarkerRun(lastRun) and not isMarkerRun(run):
+                lastRun.s += run.s
+                lastRun._cr = None # Clear cache of native context run.
+            else:
+                runs.append(BabelRun(run.s, copy(run.style)))
+        self._w = bs._w
+        self._h = bs._h
+        self.reset()
+
+    def __iadd__(self, bs):
+        """Appends `bs` in place, see self.extend(). This avoids copying all
+        runs on every `bs1 += bs2`, which makes sequential text assembly
+        linear in the number of runs. Note that other references to the left
+        operand see the change too, use `bs1 + bs2` for a new string.
+
+        >>> from pagebot.toolbox.units import pt
+        >>> from pagebot.contexts import getContext
+        >>> context = getContext()
+        >>> bs = bs1 = context.newString('ABCD', dict(fontSize=pt(18)))
+        >>> bs += context.newString('EFGH', dict(fontSize=pt(24)))
+        >>> bs is bs1, bs.runs
+        (True, [<BabelRun "ABCD">, <BabelRun "EFGH">])
+        """
+        self.extend(bs)
+        return self
+
+    def copy(self):
+        """Answers a copy of self, with copies of the runs that share their
+        strings and immutable style values. The context cache is not copied,
+        it is rebuilt by the copy when needed. Used by Text.copy(), instead of
+        a deep copy that also copies the native context string, the cached
+        lines and the fonts.
+
+        >>> from pagebot.toolbox.units import pt
+        >>> from pagebot.contexts import getContext
+        >>> context = getContext()
+        >>> bs = context.newString('ABCD', dict(fontSize=pt(18)), w=pt(100))
+        >>> copied = bs.copy()
+        >>> copied.runs == bs.runs, copied.runs[0] is bs.runs[0], copied.w
+        (True, False, 100pt)
+        >>> copied.fontSize = pt(24) # Changing the copy does not change self.
+        >>> bs.fontSize, copied.fontSize, copied.context is bs.context
+        (18pt, 24pt, True)
+        """
+        bs = self.__class__.__new__(self.__class__)
+        bs.runs = [run.copy() for run in self.runs]
+        bs._context = self._context # Shared weakref to the context.
+        bs._w = self._w
+        bs._h = self._h
+        bs.reset()
+        return bs
+
     def __eq__(self, bs):
         """Compares @bs with self.
 
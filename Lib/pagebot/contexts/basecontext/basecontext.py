@@ -26,6 +26,7 @@ from pagebot.constants import (LEFT, RIGHT, CENTER, DEFAULT_FRAME_DURATION,
         DEFAULT_FONT, XXXL)
 from pagebot.contexts.basecontext.abstractcontext import AbstractContext
 from pagebot.contexts.basecontext.babelstring import BabelString
+from pagebot.contexts.basecontext.textmeasurecache import TextMeasureCache
 from pagebot.errors import PageBotFileFormatError
 from pagebot.fonttoolbox.objects.font import findFont
 from pagebot.style import makeStyle
@@ -48,9 +49,14 @@ class BaseContext(AbstractContext):
     # Tells Typesetter that by default tags should not be included in output.
     useTags = False
     EXPORT_TYPES = None
+    # File types of which pages can be built and saved one by one in separate
+    # processes, see PageView.build().
+    PARALLEL_PAGE_TYPES = ()
 
     def __init__(self, name=None):
         self.name = name or self.__class__.__name__
+        # Measured text sizes, lines and overflow, see textmeasurecache.py
+        self.textMeasureCache = TextMeasureCache()
         # Holds current open Bézier path.
         self._bezierpath = None
 
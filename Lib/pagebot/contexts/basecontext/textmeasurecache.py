@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     textmeasurecache.py
+#
+#     Cache of text measurements (size, lines and overflow) of a context.
+#     Conditions such as Shrink2TextHeight, Overflow2Next and Baseline2Grid
+#     measure the same text many times during solve(), and every measurement
+#     reflows the text. The key is made from the content of the BabelString
+#     (the strings and the style values that change the measurement) and the
+#     requested width and height, so a changed string or style never answers
+#     an old measurement, even if the style dictionary was altered in place.
+#
+from collections import OrderedDict
+
+from pagebot.fonttoolbox.objects.font import Font
+from pagebot.toolbox.color import Color
+from pagebot.toolbox.units import isUnit
+
+# Style keys that change the size, wrapping or overflow of a text.
+TEXT_MEASURE_STYLE_KEYS = ('font', 'fontSize', 'leading', 'tracking',
+    'xTextAlign', 'xAlign', 'language', 'hyphenation', 'baselineShift',
+    'openTypeFeatures', 'fontVariations', 'tabs', 'indent', 'tailIndent',
+    'firstLineIndent', 'paragraphTopSpacing', 'paragraphBottomSpacing')
+# Line info also answers the fill color of the runs.
+TEXT_LINES_STYLE_KEYS = TEXT_MEASURE_STYLE_KEYS + ('textFill',)
+TEXT_MEASURE_CACHE_SIZE = 1024
+
+def getStableValue(value):
+    """Answers a hashable value, that is equal for equal style values,
+    including units, colors, fonts and nested lists and dictionaries.
+
+    >>> from pagebot.toolbox.units import pt, em
+    >>> getStableValue(pt(12)) == getStableValue(pt(12)), getStableValue(pt(12)) == getStableValue(em(12))
+    (True, False)
+    >>> getStableValue(dict(liga=True, smcp=[1, 2]))
+    (('liga', True), ('smcp', (1, 2)))
+    """
+    if isUnit(value):
+        return (value.__class__.__name__, value.v, getStableValue(value.base), getStableValue(value.g))
+    if isinstance(value, Font):
+        return value.path
+    if isinstance(value, Color):
+        return value.fullString
+    if isinstance(value, dict):
+        return tuple(sorted((key, getStableValue(v)) for key, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(getStableValue(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+def getBabelStringKey(bs, styleKeys=TEXT_MEASURE_STYLE_KEYS):
+    """Answers the hashable key of the content of BabelString `bs`: the
+    strings of the runs with the values of `styleKeys` in their style.
+
+    >>> from pagebot.contexts import getContext
+    >>> from pagebot.toolbox.units import pt
+    >>> context = getContext()
+    >>> bs1 = context.newString('ABCD', dict(fontSize=pt(12), textFill=0.5))
+    >>> bs2 = context.newString('ABCD', dict(fontSize=pt(12)))
+    >>> getBabelStringKey(bs1) == getBabelStringKey(bs2) # Fill does not change the size.
+    True
+    >>> bs2.runs[0].style['fontSize'] = pt(14) # Changing the style in place changes the key.
+    >>> getBabelStringKey(bs1) == getBabelStringKey(bs2)
+    False
+    """
+    runs = []
+    for run in bs.runs:
+        style = run.style or {}
+        runs.append((run.s, tuple(getStableValue(style.get(key)) for key in styleKeys)))
+    return tuple(runs)
+
+class TextMeasureCache:
+    """Least recently used cache of text measurements, kept by a context.
+    Entries are keyed by the kind of measurement, the content of the
+    BabelString, its width and height and the arguments of the measurement.
+
+    >>> from pagebot.contexts import getContext
+    >>> from pagebot.toolbox.units import pt
+    >>> context = getContext()
+    >>> cache = TextMeasureCache(size=2)
+    >>> bs = context.newString('ABCD', dict(fontSize=pt(12)))
+    >>> calls = []
+    >>> measure = lambda: calls.append(1) or (pt(30), pt(12))
+    >>> cache.get('size', bs, 100, None, measure), cache.get('size', bs, 100, None, measure)
+    ((30pt, 12pt), (30pt, 12pt))
+    >>> len(calls), cache.hits, cache.misses
+    (1, 1, 1)
+    >>> bs.add('EF') # Changed content is measured again.
+    >>> _ = cache.get('size', bs, 100, None, measure)
+    >>> len(calls), len(cache)
+    (2, 2)
+    >>> _ = cache.get('size', bs, 200, None, measure) # Other width, oldest removed.
+    >>> len(calls), len(cache)
+    (3, 2)
+    """
+    def __init__(self, size=None):
+        if size is None:
+            size = TEXT_MEASURE_CACHE_SIZE
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return '<%s %d entries>' % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def getKey(self, kind, bs, w=None, h=None, args=None):
+        """Answers the cache key of measurement `kind` of `bs` for the
+        requested `w` and `h`."""
+        styleKeys = TEXT_MEASURE_STYLE_KEYS
+        if kind == 'lines':
+            styleKeys = TEXT_LINES_STYLE_KEYS
+        return (kind, getBabelStringKey(bs, styleKeys), getStableValue(w),
+            getStableValue(h), getStableValue(bs.w), getStableValue(bs.h),
+            getStableValue(args))
+
+    def get(self, kind, bs, w, h, measure, args=None):
+        """Answers the cached measurement `kind` of `bs`. If it is not cached,
+        then answer and store the result of calling `measure()`."""
+        if self.size <= 0:
+            return measure()
+        key = self.getKey(kind, bs, w, h, args)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        result = measure()
+        self.entries[key] = result
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Removes all measurements, e.g. after font files changed."""
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -15,6 +15,7 @@
 #     flatcontext.py
 #
 import math
+import weakref
 from sys import platform
 from os import listdir, makedirs
 from os.path import exists
@@ -30,14 +31,102 @@ from pagebot.contexts.flatcontext.flatbuilder import flatBuilder
 from pagebot.contexts.flatcontext.flatbezierpath import FlatBezierPath
 from pagebot.contexts.flatcontext.flatrundata import FlatRunData
 from pagebot.contexts.flatcontext.flatbabeldata import FlatBabelData
+from pagebot.contexts.flatcontext.flatexport import (exportPages, exportPage,
+        getPagePath, saveGif, FLAT_EXPORT_FILETYPES, FLAT_EXPORT_WORKERS)
 from pagebot.filepaths import ROOT_FONT_PATHS
 from pagebot.fonttoolbox.fontpaths import getFontPathOfFont
-from pagebot.fonttoolbox.objects.font import findFont, Font
+from pagebot.fonttoolbox.objects.font import findFont, getFont, Font
 from pagebot.mathematics import to255
 from pagebot.mathematics.transform3d import Transform3D
 from pagebot.toolbox.color import color, Color, noColor, blackColor
 from pagebot.toolbox.units import pt, em, upt, units
 
+# Key is id(font), value is dictionary with the path data of the glyphs of the
+# font, made by getGlyphPathData(). The entry is removed when the font is
+# deleted, and made again if the font changes its ttFont or location.
+GLYPH_PATH_CACHE = {}
+
+def _getFontPathCache(font):
+    """Answers the dictionary {glyphName: (commands, points, dependencies)}
+    with the cached path data of `font`."""
+    key = id(font)
+    fontCache = GLYPH_PATH_CACHE.get(key)
+    if fontCache is None or fontCache['ttFont'] is not font.ttFont or \
+            fontCache['location'] != font.location:
+        if fontCache is None:
+            weakref.finalize(font, GLYPH_PATH_CACHE.pop, key, None)
+        fontCache = GLYPH_PATH_CACHE[key] = dict(ttFont=font.ttFont,
+            location=font.location and dict(font.location), glyphs={})
+    return fontCache['glyphs']
+
+def _addGlyphPathData(glyph, px, py, commands, points, dependencies):
+    """Adds the path commands and points of `glyph` and its components at
+    offset (px, py)."""
+    cubic = glyph.cubic
+    dependencies.append((glyph, cubic))
+    for command, t in cubic:
+        if command == 'moveTo' or command == 'lineTo':
+            x, y = t
+            commands.append((command, 1))
+            points.append((px + x, py + y))
+        elif command == 'curveTo':
+            commands.append((command, 3))
+            for x, y in t:
+                points.append((px + x, py + y))
+        elif command == 'closePath':
+            commands.append((command, 0))
+        elif command == 'component':
+            (x, y), componentGlyph = t
+            # Flipping `y`-axis by default to conform to OS X / DrawBot origin at bottom.
+            _addGlyphPathData(componentGlyph, px + x, py - y, commands, points, dependencies)
+
+def getGlyphPathData(glyph):
+    """Answers the (commands, points) tuple of the outline of `glyph`, with
+    the components included. Commands is a list of (command, numberOfPoints)
+    and points the list of (x, y) in glyph units. The result is cached per
+    font instance (and so per location of a variable font) and glyph name. It
+    is made again if the glyph or one of its components changed.
+
+    >>> from pagebot.fonttoolbox.objects.font import findFont
+    >>> font = findFont('Roboto-Regular')
+    >>> commands, points = getGlyphPathData(font['H'])
+    >>> commands[:2], points[0]
+    ([('moveTo', 1), ('lineTo', 1)], (1120, 830))
+    >>> getGlyphPathData(font['H'])[1] is points # Cached
+    True
+    >>> font['H'].points[0].x = 1200 # Glyph changed
+    >>> getGlyphPathData(font['H'])[1][0]
+    (1200, 830)
+    >>> font['H'].points[0].x = 1120
+    """
+    font = glyph.font
+    glyphCache = None
+    if font is not None:
+        glyphCache = _getFontPathCache(font)
+        data = glyphCache.get(glyph.name)
+        if data is not None:
+            commands, points, dependencies = data
+            for g, cubic in dependencies:
+                if g.cubic is not cubic: # Glyph or component changed.
+                    break
+            else:
+                return commands, points
+
+    commands = []
+    points = []
+    dependencies = []
+    _addGlyphPathData(glyph, 0, 0, commands, points, dependencies)
+    if glyphCache is not None:
+        glyphCache[glyph.name] = commands, points, dependencies
+    return commands, points
+
+def clearGlyphPathCache(font=None):
+    """Clears the cached glyph path data of `font` or of all fonts."""
+    if font is None:
+        GLYPH_PATH_CACHE.clear()
+    else:
+        GLYPH_PATH_CACHE.pop(id(font), None)
+
 class FlatContext(BaseContext):
     """The FlatContext implements the Flat functionality within the PageBot
     framework.
@@ -75,7 +164,8 @@ class FlatContext(BaseContext):
 
     """
 
-    EXPORT_TYPES = (FILETYPE_PDF, FILETYPE_SVG, FILETYPE_PNG, FILETYPE_JPG)
+    EXPORT_TYPES = (FILETYPE_PDF, FILETYPE_SVG, FILETYPE_PNG, FILETYPE_JPG, FILETYPE_GIF)
+    PARALLEL_PAGE_TYPES = FLAT_EXPORT_FILETYPES
 
     # Default is point document, currently untested for other units.
     UNITS = 'pt'
@@ -101,6 +191,13 @@ class FlatContext(BaseContext):
         self._drawing = None
         self._numberOfPages = 0
         self._flatFonts = {} # Caching of {font.path:flatFont}
+        self._flatFontFonts = {} # Caching of {id(flatFont):font}
+        self._flatStrikes = {} # Caching of {(id(flatFont), size, leading, tracking, rgb):strike}
+        self._measuringDocument = None # Dummy Flat document and page to
+        self._measuringPage = None # place text for measuring.
+        self._frameDuration = None
+        self._frameDurations = {} # Seconds by page index, for animated GIF.
+        self.exportWorkers = FLAT_EXPORT_WORKERS # Processes of saveDrawing().
         self.setTransform3D()
         self._numberOfPages = 0
 
@@ -196,8 +293,10 @@ class FlatContext(BaseContext):
         self._numberOfPages += 1
         self._drawing.addpage()
 
-    def saveDrawing(self, path, multiPage=None):
-        """Save the current document to file(s)
+    def saveDrawing(self, path, multiPage=None, workers=None):
+        """Save the current document to file(s). Pages of PNG, JPG and SVG
+        files are exported in `workers` processes, default is
+        self.exportWorkers. See flatexport.exportPages().
 
         >>> import os
         >>> from pagebot.toolbox.units import pt
@@ -210,6 +309,17 @@ class FlatContext(BaseContext):
         >>> w = h = pt(100)
         >>> x = y = pt(0)
         >>> c = blackColor
+        >>> import tempfile
+        >>> folder = tempfile.mkdtemp()
+        >>> context.newPage(w, h)
+        >>> context.frameDuration(0.5)
+        >>> context.newPage(w, h)
+        >>> context.saveDrawing(folder + '/MyTextDocument_F.%s' % FILETYPE_JPG, workers=2)
+        >>> sorted(os.listdir(folder))
+        ['MyTextDocument_F000.jpg', 'MyTextDocument_F001.jpg']
+        >>> context.saveDrawing(folder + '/MyTextDocument_F.gif')
+        >>> exists(folder + '/MyTextDocument_F.gif')
+        True
         """
 
         """
@@ -231,8 +341,6 @@ class FlatContext(BaseContext):
         >>> context.fill(c)
         >>> context.rect(x, y, w-20, h-20)
         >>> context.saveDrawing(exportPath + '/MyTextDocument_F.%s' % FILETYPE_PNG)
-        >>> context.saveDrawing(exportPath + '/MyTextDocument_F.gif')
-        [FlatContext] Gif not yet implemented for "MyTextDocument_F.gif"
         """
         if not multiPage:
             multiPage = True
@@ -240,38 +348,48 @@ class FlatContext(BaseContext):
         # exists.
         self.checkExportPath(path)
         self.fileType = path.split('.')[-1].lower()
+        if workers is None:
+            workers = self.exportWorkers
 
-        if self.fileType == FILETYPE_PNG:
-            if len(self._drawing.pages) == 1 or not multiPage:
-                im = self._drawing.pages[0].image(kind=RGB)
-                im.png(path)
-            else:
-                for n, p in enumerate(self._drawing.pages):
-                    pagePath = path.replace('.'+FILETYPE_PNG, '%03d.%s' % (n, FILETYPE_PNG))
-                    p.image(kind=RGB).png(pagePath)
-        elif self.fileType == FILETYPE_JPG:
-            if len(self._drawing.pages) == 1 or not multiPage:
-                self._drawing.pages[0].image(kind=RGB).jpeg(path)
-            else:
-                for n, p in enumerate(self._drawing.pages):
-                    pagePath = path.replace('.'+FILETYPE_PNG, '%03d.%s' % (n, FILETYPE_PNG))
-                    p.image(kind=RGB).jpeg(pagePath)
-        elif self.fileType == FILETYPE_SVG:
-            if len(self._drawing.pages) == 1 or not multiPage:
-                self._drawing.pages[0].svg(path)
-            else:
-                for n, p in enumerate(self._drawing.pages):
-                    pagePath = path.replace('.'+FILETYPE_SVG, '%03d.%s' % (n, FILETYPE_SVG))
-                    p.svg(pagePath)
-        elif self.fileType == FILETYPE_PDF:
+        if self.fileType == FILETYPE_PDF:
             self._drawing.pdf(path) # Cannot render rgba.
-        elif self.fileType == FILETYPE_GIF:
-            msg = '[FlatContext] Gif not yet implemented for "%s"' % path.split('/')[-1]
-            print(msg)
+        elif self.fileType in FLAT_EXPORT_FILETYPES:
+            durations = [self._frameDurations.get(n) for n in range(len(self._drawing.pages))]
+            exportPages(self._drawing.pages, path, self.fileType, multiPage,
+                workers=workers, durations=durations)
         else:
             msg = '[FlatContext] File format "%s" is not implemented' % path.split('/')[-1]
             raise NotImplementedError(msg)
 
+    def savePage(self, path, index, fileType=None, pageIndex=-1):
+        """Saves page `pageIndex` of the drawing, default the current page, as
+        page `index` of a multi-page export to `path`. Answers the path of the
+        written file. For GIF files, the frame is answered, to be saved by
+        self.saveFrames().
+
+        >>> import os, tempfile
+        >>> folder = tempfile.mkdtemp()
+        >>> context = FlatContext()
+        >>> context.newPage(pt(100), pt(100))
+        >>> os.path.basename(context.savePage(folder + '/Page.png', 3))
+        'Page003.png'
+        >>> frames = [context.savePage(folder + '/Page.gif', n) for n in range(2)]
+        >>> context.saveFrames(frames, folder + '/Page.gif', [0.1, 0.1])
+        >>> sorted(os.listdir(folder))
+        ['Page.gif', 'Page003.png']
+        """
+        self.checkExportPath(path)
+        if fileType is None:
+            fileType = path.split('.')[-1].lower()
+        return exportPage(self._drawing.pages[pageIndex], fileType,
+            getPagePath(path, index))
+
+    def saveFrames(self, frames, path, durations=None):
+        """Saves the `frames` answered by self.savePage() as animated GIF to
+        `path`, with the list of `durations` in seconds per frame."""
+        self.checkExportPath(path)
+        saveGif(frames, path, durations)
+
     # Compatibility with DrawBot API.
     saveImage = saveDrawing
 
@@ -301,6 +419,7 @@ class FlatContext(BaseContext):
 
     def endDrawing(self, doc=None):
         self._drawing = None
+        self._frameDurations = {}
 
     def clear(self):
         self.endDrawing()
@@ -474,7 +593,20 @@ class FlatContext(BaseContext):
     # Glyphs.
 
     def getGlyphPath(self, glyph, p=None, path=None):
-        """Converts the cubic commands to a drawable path."""
+        """Converts the cubic commands to a drawable path. The outline data
+        comes from the glyph path cache, see getGlyphPathData(). All points
+        are transformed with the same matrix.
+
+        >>> from pagebot.fonttoolbox.objects.font import findFont
+        >>> context = FlatContext()
+        >>> context.newPage(1000, 1000)
+        >>> font = findFont('Roboto-Regular')
+        >>> path = context.getGlyphPath(font['H'], (10, 20))
+        >>> path.contours[0][0] # Transformed to Flat coordinates
+        [(1130.0, 150.0)]
+        >>> len(context.getGlyphPath(font['Aacute']).contours) # With components
+        7
+        """
         if path is None:
             path = self.newPath()
 
@@ -484,36 +616,57 @@ class FlatContext(BaseContext):
             px = p[0]
             py = p[1]
 
-        for command, t in glyph.cubic:
+        # Makes sure the page height has been initiated.
+        assert self.height
+        height = upt(self.height)
+        (a, b, _), (c, d, _), _ = self.transform3D.matrix
+        dx, dy, _ = self.transform3D.offset
+
+        commands, points = getGlyphPathData(glyph)
+        index = 0
+        for command, numberOfPoints in commands:
             # TODO: quadTo()
+            transformed = []
+            for x, y in points[index:index+numberOfPoints]:
+                x += px
+                y += py
+                # Same as self.getTransformed(x, y) for z == 0.
+                transformed.append((x*a + y*c + dx, height - (x*b + y*d + dy)))
+            index += numberOfPoints
 
             if command == 'moveTo':
-                x, y = t
-                px0, py0 = self.getTransformed(px+x, py+y)
-                path.moveTo((px0, py0))
+                path.moveTo(transformed[0])
             elif command == 'lineTo':
-                x, y = t
-                px0, py0 = self.getTransformed(px+x, py+y)
-                path.lineTo((px0, py0))
+                path.lineTo(transformed[0])
             elif command == 'curveTo':
-                p0, p1, p = t
-                x0, y0 = p0
-                x1, y1 = p1
-                x, y = p
-                x0, y0 = self.getTransformed(px + x0, py + y0)
-                x1, y1 = self.getTransformed(px + x1, py + y1)
-                x, y = self.getTransformed(px + x, py + y)
-                path.curveTo((x0, y0), (x1, y1), (x, y))
+                path.curveTo(*transformed)
             elif command == 'closePath':
                 path.closePath()
-            elif command == 'component':
-                (x, y), componentGlyph = t
-                # Flipping `y`-axis by default to conform to OS X / DrawBot origin at bottom.
-                y = -y
-                self.getGlyphPath(componentGlyph, (px+x, py+y), path)
 
         return path
 
+    def precomputeGlyphPaths(self, font, glyphNames=None):
+        """Fills the glyph path cache for `font`, e.g. before drawing specimen
+        or waterfall pages. The optional `glyphNames` is a list of glyph names
+        or a string with the characters of the charset. Default is all glyphs
+        of the font. Answers the number of glyphs.
+
+        >>> from pagebot.fonttoolbox.objects.font import findFont
+        >>> context = FlatContext()
+        >>> context.precomputeGlyphPaths(findFont('Roboto-Regular'), 'ABC')
+        3
+        """
+        if glyphNames is None:
+            glyphNames = font.keys()
+        elif isinstance(glyphNames, str):
+            cmap = font.cmap
+            glyphNames = [cmap[ord(c)] for c in glyphNames if ord(c) in cmap]
+        count = 0
+        for glyphName in glyphNames:
+            getGlyphPathData(font[glyphName])
+            count += 1
+        return count
+
     def getFlattenedPath(self, path=None):
         # TODO
         pass
@@ -526,8 +679,10 @@ class FlatContext(BaseContext):
 
     def frameDuration(self, secondsPerFrame, **kwargs):
         """Set the frame duretion for animated gifs to a number of seconds per
-        frame."""
+        frame, for the current page."""
         self._frameDuration = secondsPerFrame
+        if self._drawing is not None and self._drawing.pages:
+            self._frameDurations[len(self._drawing.pages) - 1] = secondsPerFrame
 
     #   T E X T
 
@@ -541,12 +696,49 @@ class FlatContext(BaseContext):
         'font'
         """
         if isinstance(font, str):
-            font = findFont(font)
+            if exists(font):
+                font = getFont(font)
+            else:
+                font = findFont(font)
         if font is None:
+            # Non-existing name, taking default font.
             font = findFont(DEFAULT_FONT)
-        if not font.path in self._flatFonts:
-            self._flatFonts[font.path] = self.b.font.open(font.path)
-        return self._flatFonts[font.path], font
+        flatFont = self._flatFonts.get(font.path)
+        if flatFont is None:
+            flatFont = self._flatFonts[font.path] = self.b.font.open(font.path)
+            self._flatFontFonts[id(flatFont)] = font
+        return flatFont, font
+
+    def _getFontOfFlatFont(self, flatFont):
+        """Answers the Font of the cached `flatFont`, without searching it by
+        name. Otherwise find the font by its name."""
+        font = self._flatFontFonts.get(id(flatFont))
+        if font is None:
+            font = findFont(flatFont.name.decode("utf-8"))
+        return font
+
+    def _getFlatStrike(self, flatFont, fontSize, leading, tracking, rgb):
+        """Answers the (cached) Flat strike for the style values. Runs with
+        the same style share the strike."""
+        key = id(flatFont), fontSize, leading, tracking, rgb
+        st = self._flatStrikes.get(key)
+        if st is None:
+            st = self.b.strike(flatFont).size(fontSize, leading=leading)
+            st.tracking(tracking/10) # Flat tracking if %, BabelString is 1/1000em
+            # FIXME: We need to know the export file type here in advance...
+            #try:
+            #    st.color(self.b.rgba(r, g, b, a)) # Does not work for Flat PDF
+            #except NotImplementedError:
+            st.color(self.b.rgb(*rgb)) # Hmm, how to get Flat PDF tranparancy
+            self._flatStrikes[key] = st
+        return st
+
+    def _getMeasuringPage(self):
+        """Answers the dummy Flat page, used for measuring on placedText."""
+        if self._measuringPage is None:
+            self._measuringDocument = self.b.document(10, 10, 'pt')
+            self._measuringPage = self._measuringDocument.addpage()
+        return self._measuringPage
 
     def _place(self, bs, x, y, w=None, h=None):
         """Places the styled Flat text on a page, transform vertical position
@@ -709,14 +901,29 @@ class FlatContext(BaseContext):
         True
         """
         assert self.page is not None, 'FlatString.text: self.page is not set.'
-        fs = self.fromBabelString(s)
-
-        # FIXME: this actually shows the text?
-        s = fs.textOverflow(self.page, box, align=align)
-        return s
+        def measure():
+            fs = self.fromBabelString(s)
+            # FIXME: this actually shows the text?
+            return fs.textOverflow(self.page, box, align=align)
+        return self.textMeasureCache.get('overflow', s, None, None, measure,
+            args=(tuple(upt(box)), align))
 
     def textSize(self, bs, w=None, h=None, align=None, ascDesc=True):
-        """Determines text size based on placed text value."""
+        """Determines text size based on placed text value. Measurements are
+        cached by content of `bs`, see textmeasurecache.py.
+
+        >>> from pagebot.toolbox.units import pt
+        >>> context = FlatContext()
+        >>> bs = context.newString('ABCD', dict(font='PageBot-Regular', fontSize=pt(24)))
+        >>> size = context.textMeasureCache.get('size', bs, pt(100), None, lambda: (pt(60), pt(24)), args=(None, True))
+        >>> context.textSize(bs, w=pt(100)) # Answered from the cache, without reflow.
+        (60pt, 24pt)
+        """
+        return self.textMeasureCache.get('size', bs, w, h,
+            lambda: self._textSize(bs, w=w, h=h, align=align, ascDesc=ascDesc),
+            args=(align, ascDesc))
+
+    def _textSize(self, bs, w=None, h=None, align=None, ascDesc=True):
         textWidth = 0.0
         textHeight = 0.0
         lastDescender = 0.0
@@ -756,7 +963,9 @@ class FlatContext(BaseContext):
         return pt(textWidth, textHeight)
 
     def getTextLines(self, bs, w=None, h=None, ascDesc=False):
-        """Answer a list of BabeLineInfo instances.
+        """Answer a list of BabeLineInfo instances. Line wrapping is cached by
+        content of `bs`, see textmeasurecache.py. The answered line infos and
+        their run infos are copies, so they can be changed by the caller.
 
         >>> from pagebot.toolbox.units import pt
         >>> context = FlatContext()
@@ -768,7 +977,17 @@ class FlatContext(BaseContext):
         >>> line = lines[10]
         >>> #line
         #<BabelLineInfo y=246pt>
+        >>> line.runs[0].s = 'XYZ' # Does not change the cached lines.
+        >>> line.runs.append(line.runs[0])
+        >>> lines = context.getTextLines(bs)
+        >>> lines[10].runs[0].s != 'XYZ', len(lines[10].runs) == len(line.runs) - 1
+        (True, True)
         """
+        lines = self.textMeasureCache.get('lines', bs, w, h,
+            lambda: self._getTextLines(bs, w=w, h=h))
+        return [line.copy() for line in lines]
+
+    def _getTextLines(self, bs, w=None, h=None):
         placedText = bs.cs.pt
         lines = []
 
@@ -791,7 +1010,7 @@ class FlatContext(BaseContext):
             babelLineInfo = BabelLineInfo(x, y, context=self, cLine=flatLine)
 
             for fst, s in flatLine:
-                font = findFont(fst.font.name.decode("utf-8"))
+                font = self._getFontOfFlatFont(fst.font)
                 style = dict(font=font, fontSize=pt(fst.size), leading=pt(fst.leading),
                     textFill=color(fst.color), tracking=pt(fst.tracking * fst.size))
                 babelRunInfo = BabelRunInfo(s, style, self, cRun=fst) # Cache the flatStyle, just in case.
@@ -820,43 +1039,21 @@ class FlatContext(BaseContext):
         >>> bs.cs.page.width == fData.page.width # Drill into the the Flat object.
         True
         """
-        fDoc = self.b.document(10, 10, 'pt') # Create a dummy document
-        fPage = fDoc.addpage() # Create a dummy page, used for measuring on placedText
+        fPage = self._getMeasuringPage()
         fParagraphs = []
         fRuns = []
 
         for run in bs.runs:
-            # FIXME: can be None, which gives an error when looking up font.path.
-            f = run.style.get('font', DEFAULT_FONT)
-
-            if isinstance(f, Font):
-                flatFont = self.b.font.open(f.path)
-            elif isinstance(f, str) and exists(f):
-                flatFont = self.b.font.open(f)
-            else:
-                font = findFont(f)
-
-                if font is None:
-                    # Non-existing name, taking default font.
-                    # TODO: add to logger.
-                    font = findFont(DEFAULT_FONT)
-
-                flatFont = self.b.font.open(font.path)
-
+            # Font can be a Font instance, a path or a name. Flat fonts are
+            # only opened once per font path by the context.
+            flatFont, _ = self._getFlatFont(run.style.get('font') or DEFAULT_FONT)
             fontSize = run.style.get('fontSize', DEFAULT_FONT_SIZE)
             leading = upt(run.style.get('leading', em(1.2)), base=fontSize)
-            # Keep as multiplication factor to fontSize for Flat.
-            st = self.b.strike(flatFont).size(upt(fontSize), leading=leading)
             tracking = em(run.style.get('tracking', 0), base=fontSize).v
-            st.tracking(tracking/10) # Flat tracking if %, BabelString is 1/1000em
-            r, g, b = self._asFlatColor(color(run.style.get('textFill', blackColor)))
-
-            # FIXME: We need to know the export file type here in advance...
-            #try:
-            #    st.color(self.b.rgba(r, g, b, a)) # Does not work for Flat PDF
-            #except NotImplementedError:
-            st.color(self.b.rgb(r, g, b)) # Hmm, how to get Flat PDF tranparancy
+            rgb = tuple(self._asFlatColor(color(run.style.get('textFill', blackColor))))
+            # Keep as multiplication factor to fontSize for Flat.
             # Now we have a strike that represents the style of this run.
+            st = self._getFlatStrike(flatFont, upt(fontSize), leading, tracking, rgb)
             pars = []
 
             for txt in run.s.split('\n'):
@@ -868,7 +1065,10 @@ class FlatContext(BaseContext):
 
         #pt = fPage.place(txt)
         # Stored typically as BabelString.cs in FlatContext mode.
-        return FlatBabelData(builder=self.b, doc=fDoc, page=fPage, paragraphs=fParagraphs, runs=fRuns)
+        data = FlatBabelData(builder=self.b, doc=self._measuringDocument, page=fPage, paragraphs=fParagraphs, runs=fRuns)
+        # The measuring page is never drawn, don't let placed texts pile up.
+        del fPage.items[:]
+        return data
 
     #   F O N T
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     flatexport.py
+#
+#     Export of the pages of a Flat document to PNG, JPG, SVG and animated GIF
+#     files. Rasterizing and encoding a page is CPU bound, so pages can be
+#     exported in a pool of worker processes. Pages are pickled and sent to the
+#     workers one at a time, with no more than two pages per worker pending,
+#     and the workers write the files themselves, so the rasterized pages are
+#     never held by the main process (except the palette frames of a GIF).
+#     Results are answered in page order, whatever the order of the workers.
+#
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from pagebot.constants import (FILETYPE_JPG, FILETYPE_JPEG, FILETYPE_SVG,
+        FILETYPE_PNG, FILETYPE_GIF, DEFAULT_FRAME_DURATION, RGB)
+
+# Default number of worker processes of exportPages(). 1 exports in the calling
+# process, 0 or None uses all cores.
+FLAT_EXPORT_WORKERS = 1
+FLAT_EXPORT_FILETYPES = (FILETYPE_PNG, FILETYPE_JPG, FILETYPE_JPEG,
+    FILETYPE_SVG, FILETYPE_GIF)
+JPEG_QUALITY = 95
+
+def getExportWorkerCount(workers=None, pageCount=None):
+    """Answers the number of worker processes to export `pageCount` pages.
+    If `workers` is 0 or None, then all cores are used.
+
+    >>> getExportWorkerCount(3), getExportWorkerCount(3, 2), getExportWorkerCount(-1)
+    (3, 2, 1)
+    >>> getExportWorkerCount(0) == (os.cpu_count() or 1)
+    True
+    """
+    if not workers:
+        workers = os.cpu_count() or 1
+    if pageCount is not None:
+        workers = min(workers, pageCount)
+    return max(1, workers)
+
+def getPagePath(path, index):
+    """Answers the file path of page `index` in a multi-page export to `path`,
+    adding the 3 digit page index before the extension.
+
+    >>> getPagePath('_export/MyDocument.png', 0)
+    '_export/MyDocument000.png'
+    >>> getPagePath('_export/my.pages/MyDocument.jpg', 12)
+    '_export/my.pages/MyDocument012.jpg'
+    """
+    if '.' not in os.path.basename(path):
+        return '%s%03d' % (path, index)
+    root, extension = path.rsplit('.', 1)
+    return '%s%03d.%s' % (root, index, extension)
+
+def exportPage(page, fileType, path=None, ppi=72):
+    """Rasterizes and encodes the Flat `page` as `fileType` and writes it to
+    `path`. Answers `path`. For FILETYPE_GIF nothing is written, the page is
+    answered as a palette PIL image, to be assembled by saveGif().
+
+    >>> from pagebot.contexts.flatcontext.flatbuilder import flatBuilder
+    >>> import tempfile
+    >>> doc = flatBuilder.document(40, 30, 'pt')
+    >>> page = doc.addpage()
+    >>> path = exportPage(page, FILETYPE_PNG, tempfile.mkdtemp() + '/Page.png')
+    >>> os.path.getsize(path) > 0
+    True
+    >>> exportPage(page, FILETYPE_GIF).size
+    (40, 30)
+    """
+    if fileType == FILETYPE_SVG:
+        page.svg(path)
+        return path
+    image = page.image(ppi=ppi, kind=RGB)
+    if fileType == FILETYPE_PNG:
+        image.png(path)
+    elif fileType in (FILETYPE_JPG, FILETYPE_JPEG):
+        image.jpeg(path, quality=JPEG_QUALITY)
+    elif fileType == FILETYPE_GIF:
+        image.decompress()
+        frame = Image.frombytes('RGB', (image.width, image.height), bytes(image.data))
+        return frame.convert('P', palette=Image.ADAPTIVE)
+    else:
+        raise NotImplementedError('[flatexport] File format "%s" is not implemented' % fileType)
+    return path
+
+def _exportPickledPage(pageData, fileType, path, ppi):
+    """Worker function of exportPages(), the page is pickled by the caller,
+    so pages that cannot be pickled can still be exported serially."""
+    return exportPage(pickle.loads(pageData), fileType, path, ppi)
+
+def iterExportPages(pages, fileType, paths, workers=None, ppi=72):
+    """Answers a generator of the results of exportPage() for `pages`, in page
+    order. If there is more than one worker, then pages are exported in a
+    process pool, with at most two pending pages per worker. If a page cannot
+    be pickled, the export continues in the calling process.
+
+    >>> from pagebot.contexts.flatcontext.flatbuilder import flatBuilder
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> doc = flatBuilder.document(40, 30, 'pt')
+    >>> pages = [doc.addpage() for n in range(3)]
+    >>> paths = [getPagePath(folder + '/Page.png', n) for n in range(3)]
+    >>> list(iterExportPages(pages, FILETYPE_PNG, paths, workers=2)) == paths
+    True
+    >>> sorted(os.listdir(folder))
+    ['Page000.png', 'Page001.png', 'Page002.png']
+    """
+    workers = getExportWorkerCount(workers, len(pages))
+    if workers == 1:
+        for page, path in zip(pages, paths):
+            yield exportPage(page, fileType, path, ppi)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        index = 0
+        while index < len(pages) or pending:
+            while index < len(pages) and len(pending) < 2 * workers:
+                page = pages[index]
+                path = paths[index]
+                try:
+                    pageData = pickle.dumps(page, pickle.HIGHEST_PROTOCOL)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    break
+                pending.append(executor.submit(_exportPickledPage, pageData,
+                    fileType, path, ppi))
+                index += 1
+            if pending:
+                yield pending.popleft().result()
+            elif index < len(pages):
+                # Page that cannot be pickled, export in this process.
+                yield exportPage(pages[index], fileType, paths[index], ppi)
+                index += 1
+
+def saveGif(frames, path, durations=None, loop=0):
+    """Writes the palette PIL `frames` as animated GIF to `path`. The
+    `durations` list has the number of seconds of each frame, default is
+    DEFAULT_FRAME_DURATION.
+
+    >>> import tempfile
+    >>> path = tempfile.mkdtemp() + '/Animation.gif'
+    >>> frames = [Image.new('P', (20, 10), n) for n in range(3)]
+    >>> saveGif(frames, path, [0.5, None, 2])
+    >>> image = Image.open(path)
+    >>> image.n_frames, image.info['duration']
+    (3, 500)
+    """
+    frames = list(frames)
+    assert frames, '[flatexport] No frames to save as "%s"' % path
+    if durations is None:
+        durations = []
+    milliseconds = []
+    for n in range(len(frames)):
+        duration = DEFAULT_FRAME_DURATION
+        if n < len(durations) and durations[n] is not None:
+            duration = durations[n]
+        milliseconds.append(int(round(duration * 1000)))
+    frames[0].save(path, save_all=True, append_images=frames[1:],
+        duration=milliseconds, loop=loop, optimize=False)
+
+def exportPages(pages, path, fileType=None, multiPage=True, workers=None,
+        durations=None, ppi=72):
+    """Exports the Flat `pages` to `path`. If `multiPage` is True and there is
+    more than one page, then each page is written to its own file, numbered by
+    getPagePath(). Otherwise only the first page is written. GIF files
+    combine all pages as frames of one animation. The `workers` is the number
+    of processes, default is FLAT_EXPORT_WORKERS. Answers the list of
+    written file paths.
+
+    >>> from pagebot.contexts.flatcontext.flatbuilder import flatBuilder
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> doc = flatBuilder.document(40, 30, 'pt')
+    >>> pages = [doc.addpage() for n in range(2)]
+    >>> shape = flatBuilder.shape().nostroke().fill(flatBuilder.rgb(255, 0, 0))
+    >>> _ = pages[1].place(shape.rectangle(0, 0, 20, 20)) # Frames must differ.
+    >>> [os.path.basename(p) for p in exportPages(pages, folder + '/Page.jpg')]
+    ['Page000.jpg', 'Page001.jpg']
+    >>> [os.path.basename(p) for p in exportPages(pages, folder + '/One.svg', multiPage=False)]
+    ['One.svg']
+    >>> paths = exportPages(pages, folder + '/Animation.gif', workers=2)
+    >>> Image.open(paths[0]).n_frames
+    2
+    """
+    if fileType is None:
+        fileType = path.split('.')[-1].lower()
+    if fileType not in FLAT_EXPORT_FILETYPES:
+        raise NotImplementedError('[flatexport] File format "%s" is not implemented' % path.split('/')[-1])
+    if workers is None:
+        workers = FLAT_EXPORT_WORKERS
+    pages = list(pages)
+
+    if fileType == FILETYPE_GIF:
+        if Image is None:
+            raise NotImplementedError('[flatexport] Exporting "%s" needs PIL' % path.split('/')[-1])
+        frames = iterExportPages(pages, fileType, [None] * len(pages), workers, ppi)
+        saveGif(frames, path, durations)
+        return [path]
+
+    if len(pages) == 1 or not multiPage:
+        pages = pages[:1]
+        paths = [path]
+    else:
+        paths = [getPagePath(path, n) for n in range(len(pages))]
+    return list(iterExportPages(pages, fileType, paths, workers, ppi))
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -18,10 +18,14 @@ import codecs
 from pagebot import getContext
 from pagebot.stylelib import styleLib
 from pagebot.conditions.score import Score
+from pagebot.conditions.solvegraph import SolveGraph
+from pagebot.conditions.solver import Solver
 from pagebot.elements.page import Page
 from pagebot.elements.template import Template
+from pagebot.elements.elementindex import (ElementIndex, getIndexValue, NAME,
+        CSSID, CLASSNAME, EID, SID)
 from pagebot.elements.views import viewClasses, defaultViewClass
-from pagebot.style import getRootStyle
+from pagebot.style import getRootStyle, Style, touchStyle
 from pagebot.themes import DEFAULT_THEME_CLASS
 from pagebot.toolbox.transformer import (obj2StyleId, path2Url, json2Dict,
     dict2Json, asNormalizedJSON)
@@ -92,6 +96,15 @@ class Document:
 
         self.theme = theme
 
+        # Index of the elements on the pages by name, cssId, cssClass, class
+        # name, eId and sId. Updated by the elements when they change.
+        self.elementIndex = ElementIndex()
+
+        # Dependencies between the conditions of elements, and the flag that
+        # pages have changed since the last solve, for incremental solving.
+        self.solveGraph = SolveGraph()
+        self._solveDirtyDescendants = True
+
         # If not defined as separate attribute in **kwargs, Adjusts the default
         # self.rootStyle['yAlign'] value based on self.origin.
         self.rootStyle = rs = self.makeRootStyle(**kwargs)
@@ -122,7 +135,12 @@ class Document:
         # Initializes the dictionary of pages. Key is pageNumber, Value is row
         # list of pages:
         # `self.pages[pn][index] = page`
+        # Direct changes that keep the amount of page numbers and pages, such
+        # as replacing a page or a list of pages, must call self.pagesChanged().
         self.pages = {}
+        # Sorted page numbers and reversed tables for fast page (number)
+        # lookups, maintained by self.pageAdded() and self.pagesChanged().
+        self.initializePageTables()
 
         # In case there are pages defined on initialization, add them.
         for page in pages or []:
@@ -273,6 +291,71 @@ class Document:
             self.pages[pn] = []
         self.pages[pn].append(page)
         page.setParent(self)
+        page.markDirty()
+        self.elementIndex.addPage(page)
+        self.pageAdded(pn, page)
+
+    #   P A G E  T A B L E S
+
+    def initializePageTables(self):
+        """Initializes the sorted list of page numbers and the reversed
+        tables from page to (pn, index) and page to ordinal in the sorted
+        list of all pages."""
+        self._pns = [] # Sorted keys of self.pages
+        self._sortedPages = [] # All pages, sorted by (pn, index)
+        self._pageNumbers = {} # page.eId --> (pn, index)
+        self._pageOrdinals = {} # page.eId --> index in self._sortedPages
+        self._pageTablesChanged = False
+
+    def pageAdded(self, pn, page):
+        """Updates the page tables after `page` was appended to
+        self.pages[pn]. Appending at the end is incremental, other changes
+        rebuild the tables on the next query."""
+        if self._pageTablesChanged:
+            return
+        if not self._pns or pn > self._pns[-1]:
+            self._pns.append(pn)
+        elif pn != self._pns[-1]:
+            self.pagesChanged()
+            return
+        self._pageNumbers[page.eId] = pn, len(self.pages[pn]) - 1
+        self._pageOrdinals[page.eId] = len(self._sortedPages)
+        self._sortedPages.append(page)
+
+    def pagesChanged(self):
+        """Marks the page tables to be rebuilt on the next query. To be
+        called after self.pages is altered other than by self.appendPage()."""
+        self._pageTablesChanged = True
+
+    def checkPageTables(self):
+        """Rebuilds the page tables if self.pages changed. Comparing the
+        amount of page numbers and pages also catches direct changes to
+        self.pages that add or remove pages. Other direct changes, such as
+        replacing a page, need a call to self.pagesChanged().
+
+        >>> doc = Document(name='TestDoc', autoPages=2)
+        >>> page = Page()
+        >>> doc.pages[1].append(page)
+        >>> doc.getPageNumber(page), doc.nextPage(doc.pages[1][0]) is page
+        ((1, 1), True)
+        >>> doc.pages[2] = [page, doc.pages[2][0]]
+        >>> doc.getPageNumber(page)
+        (2, 0)
+        >>> other = Page()
+        >>> doc.pages[2][1] = other # Same amount of pages.
+        >>> doc.pagesChanged()
+        >>> doc.getPageNumber(other)
+        (2, 1)
+        """
+        if self._pageTablesChanged or len(self._pns) != len(self.pages) or \
+                len(self._sortedPages) != sum(map(len, self.pages.values())):
+            self.initializePageTables()
+            for pn in sorted(self.pages.keys()):
+                self._pns.append(pn)
+                for index, page in enumerate(self.pages[pn]):
+                    self._pageNumbers[page.eId] = pn, index
+                    self._pageOrdinals[page.eId] = len(self._sortedPages)
+                    self._sortedPages.append(page)
 
     def _get_ancestors(self):
         """Root of the chain of element properties, searching upward in the
@@ -418,7 +501,7 @@ class Document:
         >>> doc.rootStyle['yAlign'], page.yAlign
         ('top', 'top')
         """
-        rootStyle = getRootStyle()
+        rootStyle = Style(getRootStyle())
         for name, v in kwargs.items():
             if name in rootStyle: # Only overwrite existing values.
                 rootStyle[name] = v
@@ -439,6 +522,8 @@ class Document:
         """
         for key, value in style.items():
             self.rootStyle[key] = value
+        # Cached element css values may refer to the root style.
+        touchStyle()
 
     # Answer the cascaded style value, looking up the chain of ancestors, until style value is defined.
 
@@ -516,6 +601,7 @@ class Document:
         """Removes the style *name* if it exists. Raises an error if is does not
         exist."""
         del self.styles[name]
+        touchStyle()
 
     def replaceStyle(self, name, style):
         """Set the style by name. Overwrite the style with that name if it
@@ -523,6 +609,8 @@ class Document:
         self.styles[name] = style
         # Force the name of the style to synchronize with the requested key.
         style['name'] = name
+        # Cached element css values may refer to the replaced style.
+        touchStyle()
         return style # used e.g. when called by self.newStyle(args,...)
 
     def newStyle(self, **kwargs):
@@ -904,8 +992,9 @@ class Document:
         """
         if page.isPage:
             if pn is None:
-                if self.pages.keys():
-                    pn = max(self.pages.keys())+1
+                self.checkPageTables()
+                if self._pns:
+                    pn = self._pns[-1]+1
                 else:
                     pn = 1
             # Create self.pages[pn] = [] if not exists. Then append page to the list.
@@ -941,11 +1030,34 @@ class Document:
         return self.pages[pn]
 
     def findPages(self, eId=None, name=None, pattern=None, pageSelection=None):
-        """Various ways to find pages from their attributes."""
+        """Various ways to find pages from their attributes.
+
+        >>> doc = Document(name='TestDoc', autoPages=10)
+        >>> doc[4].name = 'Chapter'
+        >>> doc.findPages(name='Chapter') == [doc[4]]
+        True
+        >>> doc.findPages(eId=doc[6].eId) == [doc[6]]
+        True
+        >>> doc.findPages(name='Chapter', pageSelection=[5, 6])
+        []
+        >>> len(doc.findPages(name='default'))
+        9
+        """
+        if pattern is None:
+            # Try the element index first, to avoid scanning all pages.
+            if eId is not None:
+                pages = self.findIndexedPages(EID, eId, pageSelection)
+                if pages:
+                    return pages[:1]
+            if name is not None:
+                pages = self.findIndexedPages(NAME, name, pageSelection)
+                if pages:
+                    return sorted(pages, key=self.getPageIndex)
+            # Not in the index, e.g. names derived from page.fileName or
+            # pages that were added to self.pages directly. Scan the pages.
+
         pages = []
-        for pn, pnPages in sorted(self.pages.items()):
-            if not pageSelection is None and not pn in pageSelection:
-                continue
+        for pn, pnPages in self.getSortedPages(pageSelection):
             for page in pnPages: # List of pages with identical pn
                 if eId == page.eId:
                     return [page]
@@ -954,6 +1066,18 @@ class Document:
                     pages.append(page)
         return pages
 
+    def findIndexedPages(self, kind, value, pageSelection=None):
+        """Answers the list of pages in self.elementIndex with value for
+        kind, in order of indexing."""
+        pages = []
+        for e in self.elementIndex.getElements(kind, value):
+            if not e.isPage or getIndexValue(e, kind) != value:
+                continue
+            if e.parent is self and e.eId in self.elementIndex.pageKeys:
+                if pageSelection is None or self.getPageNumber(e)[0] in pageSelection:
+                    pages.append(e)
+        return pages
+
     def findPage(self, eId=None, name=None, pattern=None, pageSelection=None):
         """Answers the first page found from the self.findPages(...) call. Answers None
         if no page can be found matching the parameters."""
@@ -984,6 +1108,10 @@ class Document:
         if sId is not None:
             if self.sId == sId:
                 return self
+            # Unique sId in the element index, no need to search the pages.
+            found = self.elementIndex.getElements(SID, sId)
+            if len(found) == 1 and found[0].sId == sId:
+                return found[0]
             for _, pages in self.pages.items():
                 for page in pages:
                     found = page.findBysId(sId)
@@ -996,7 +1124,36 @@ class Document:
         return None
 
     def deepFind(self, name=None, pattern=None):
+        """Answers the first element on the pages that matches name or
+        pattern. Answers None if no element can be found.
+
+        >>> from pagebot.elements.element import Element
+        >>> doc = Document(autoPages=3)
+        >>> e = Element(name='Unique', parent=doc[3])
+        >>> doc.deepFind('Unique') is e, doc.deepFind('XYZ')
+        (True, None)
+        >>> e.parent = None # Detached, no longer found.
+        >>> doc.deepFind('Unique')
+        >>> from pagebot.elements.page import Page
+        >>> page = Page()
+        >>> doc.pages[4] = [page] # Not in the element index, found by scan.
+        >>> e = Element(name='Direct', parent=page)
+        >>> doc.deepFind('Direct') is e
+        True
+        """
         assert name or pattern
+        if pattern is None:
+            found = []
+            for kind in (CLASSNAME, CSSID, NAME):
+                for e in self.elementIndex.getElements(kind, name):
+                    # Pages don't find themselves.
+                    if not e.isPage and e not in found and \
+                            getIndexValue(e, kind) == name:
+                        found.append(e)
+            # Ordering multiple elements needs the scan below, as well as
+            # values that are not in the index, e.g. derived names.
+            if len(found) == 1:
+                return found[0]
         for pn, pages in self.pages.items():
             for page in pages:
                 found = page.deepFind(name=name, pattern=pattern)
@@ -1072,7 +1229,10 @@ class Document:
         >>> len(doc.pages), sorted(doc.pages.keys())
         (2, [1, 3])
         """
+        for page in self.pages[pn]:
+            self.elementIndex.removePage(page)
         del self.pages[pn]
+        self.pagesChanged()
 
     def makePages(self, pageCnt=1, pn=None, template=None, name=None, w=None,
             h=None, **kwargs):
@@ -1087,7 +1247,8 @@ class Document:
         (4, [1, 2, 3, 4])
         """
         if pn is None:
-            pn = max(self.pages.keys() or [0])+1
+            self.checkPageTables()
+            pn = (self._pns or [0])[-1]+1
 
         for n in range(pageCnt): # First page is n + pn
             # Parent is forced to self.
@@ -1122,13 +1283,10 @@ class Document:
         >>> doc.getPageNumber(next)
         (5, 0)
         """
-        found = False
-        for pn, pnPages in sorted(self.pages.items()):
-            for index, pg in enumerate(pnPages):
-                if found:
-                    return pg
-                if pg.eId == page.eId:
-                    found = True # Trigger to select the next page in the loop.
+        self.checkPageTables()
+        ordinal = self._pageOrdinals.get(page.eId)
+        if ordinal is not None and ordinal + 1 < len(self._sortedPages):
+            return self._sortedPages[ordinal + 1]
         # Not found, create new one?
         if makeNew:
             return self.newPage()
@@ -1152,12 +1310,10 @@ class Document:
         >>> doc.getPageNumber(prev) is None
         True
         """
-        previous = None
-        for pn, pnPages in sorted(self.pages.items()):
-            for index, pg in enumerate(pnPages):
-                if pg.eId == page.eId:
-                   return previous
-                previous = pg
+        self.checkPageTables()
+        ordinal = self._pageOrdinals.get(page.eId)
+        if ordinal:
+            return self._sortedPages[ordinal - 1]
         return None # No previous page found.
 
     def getPageNumber(self, page):
@@ -1167,33 +1323,43 @@ class Document:
 
         {1:[page, page, ...], 2}
 
-        TODO: Make a reversed table if this squential search shows to be slow
-        in the future with large docs.
+        The answer comes from a reversed table, that is only rebuilt if pages
+        are inserted or removed.
+
+        >>> from pagebot.elements.page import Page
+        >>> doc = Document(name='TestDoc', autoPages=5)
+        >>> doc.getPageNumber(doc[4])
+        (4, 0)
+        >>> page = Page()
+        >>> doc.appendPage(page, 3)
+        >>> doc.getPageNumber(page), doc.getPageIndex(page), doc.getPageIndex(doc[4])
+        ((3, 1), 3, 4)
+        >>> doc.getPageNumber(Page()) is None
+        True
         """
-        for pn, pnPages in sorted(self.pages.items()):
-            for index, pg in enumerate(pnPages):
-                if page is pg:
-                    return (pn, 0)
+        if page is None:
+            return None
+        self.checkPageTables()
+        pnIndex = self._pageNumbers.get(page.eId)
+        if pnIndex is not None and self._sortedPages[self._pageOrdinals[page.eId]] is page:
+            return pnIndex
         return None # Cannot find this page
 
     def getPageIndex(self, page):
         """Answer the index number of the page, if the page can be found
         in self. Otherwise answer None.
 
-        TODO: Make a reversed dictionary if this sequential search show to be
-        too slow in the future with large docs.
-
         >>> doc = Document(name='TestDoc', w=500, h=500, startPage=624, autoPages=10)
         >>> page = doc.getLastPage()
         >>> doc.getPageIndex(page)
         9
         """
-        index = 0
-        for pn, pnPages in sorted(self.pages.items()):
-            for pg in pnPages:
-                if pg is page:
-                    return index
-                index += 1
+        if page is None:
+            return None
+        self.checkPageTables()
+        ordinal = self._pageOrdinals.get(page.eId)
+        if ordinal is not None and self._sortedPages[ordinal] is page:
+            return ordinal
         return None
 
     def getFirstPage(self):
@@ -1204,9 +1370,9 @@ class Document:
         >>> doc.getFirstPage()
         <Page #624 default (500pt, 500pt)>
         """
-        for pn, pnPages in sorted(self.pages.items()):
-            for index, page in enumerate(pnPages):
-                return page
+        self.checkPageTables()
+        if self._sortedPages:
+            return self._sortedPages[0]
         return None
 
     def getLastPage(self):
@@ -1217,16 +1383,19 @@ class Document:
         >>> doc.getLastPage()
         <Page #14 default (500pt, 500pt)>
         """
-        pn = sorted(self.pages.keys())[-1]
-        return self.pages[pn][-1]
+        self.checkPageTables()
+        if self._sortedPages:
+            return self._sortedPages[-1]
+        return None
 
     def getSortedPages(self, pageSelection=None):
         """Answers the dynamic list of pages, sorted by y, x and index."""
+        self.checkPageTables()
         pages = [] # List of (pn, pnPages) tuples of pages with the same page number.
-        for pn, pnPages in sorted(self.pages.items()):
+        for pn in self._pns:
             if pageSelection is not None and not pn in pageSelection:
                 continue
-            pages.append((pn, pnPages))
+            pages.append((pn, self.pages[pn]))
         return pages
 
     def getPageTree(self, pageTree=None):
@@ -1375,7 +1544,7 @@ class Document:
             # FIXME: no-member self.language
             languages = [DEFAULT_LANGUAGE]
             #languages = [self.language or DEFAULT_LANGUAGE]
-        for pn, pnPages in sorted(self.pages.items()):
+        for pn, pnPages in self.getSortedPages():
             unknown = []
             for page in pnPages:
                 page.spellCheck(languages, unknown)
@@ -1385,22 +1554,38 @@ class Document:
 
     #   C O N D I T I O N S
 
-    def solve(self, score=None):
+    def solve(self, score=None, incremental=False, maxIterations=1):
         """Evaluate the content of all pages to return the total sum of
         conditions solving. If necessary, the builder for solving specific text
         conditions, such as run length of text and overflow of text boxes, is
-        found by the current self.view.b.
+        found by the current self.view.b. If `incremental` is True, then only
+        the elements that changed since the previous solve and the elements
+        that depend on them are solved (see Element.markDirty). The score
+        then only includes these conditions. If `maxIterations` is more than
+        one (or None for SOLVE_MAX_ITERATIONS), then solving is repeated by a
+        Solver until the layout no longer changes.
 
         >>> doc = Document(name='TestDoc', w=300, h=400, autoPages=2, padding=(30, 40, 50, 60))
         >>> score = doc.solve()
         >>> score
         Score: 0 Fails: 0
+        >>> doc.solve(incremental=True)
+        Score: 0 Fails: 0
+        >>> score = doc.solve(maxIterations=None)
+        >>> score.iterations, score.converged
+        (1, True)
         """
-        score = Score()
-
-        for pn, pnPages in sorted(self.pages.items()):
+        if maxIterations != 1:
+            return Solver(maxIterations).solve(self, score, incremental)
+        if score is None:
+            score = Score()
+        if incremental and not self._solveDirtyDescendants:
+            return score
+        self._solveDirtyDescendants = False
+
+        for pn, pnPages in self.getSortedPages():
             for page in pnPages: # List of pages with identical pn, step through the pages.
-                page.solve(score)
+                page.solve(score, incremental)
 
         return score
 
@@ -81,7 +81,7 @@ class ClipPath:
         path = self.PATH_CLASS(self.view.context)
         path.rect(-self.ml, -self.mb, self.ml + self.w + self.mr, self.mb + self.h + self.mt)
 
-        for e in self.elements:
+        for e in self.iterElements():
             path = path.difference(e.childClipPath)
 
         path.translate(self.xy)
@@ -112,8 +112,13 @@ class ClipPath:
         if index < 0:
             # Don't accept.
             return None
-        if index < len(self.elements):
+        if index < len(self._elements):
+            elementIndex = self.elementIndex
+            if elementIndex is not None:
+                elementIndex.remove(self._elements[index])
+                elementIndex.add(e, self)
             self._elements[index] = e
+            self.elementsChanged()
             if self.eId:
                 self._eIds[e.eId] = e
             return index
@@ -148,6 +153,7 @@ class ClipPath:
         # Possibly add to self again, will move it to the top of the element
         # stack.
         self._elements.append(e)
+        self.elementsChanged()
         # Set parent of element without calling this method again.
         e.setParent(self)
 
@@ -187,6 +193,7 @@ class ClipPath:
 
         if e in self._elements:
             self._elements.remove(e)
+            self.elementsChanged()
 
         # Answer the unlinked elements.
         return e
@@ -81,12 +81,14 @@ class DesignSpaceGraph(DesignSpace):
         return self._cssId or self.CSS_ID or self.eId
     def _set_cssId(self, cssId):
         self._cssId = cssId
+        self.updateElementIndex()
     cssId = property(_get_cssId, _set_cssId)
 
     def _get_cssClass(self):
         return self._cssClass or self.CSS_CLASS or self.__class__.__name__.lower()
     def _set_cssClass(self, cssClass):
         self._cssClass = cssClass
+        self.updateElementIndex()
     cssClass = property(_get_cssClass, _set_cssClass)
 
     def build_html(self, view, path, **kwargs):
@@ -17,9 +17,11 @@
 
 import weakref
 import copy
+from time import perf_counter
 
 from pagebot.conditions.score import Score
-from pagebot.style import makeStyle, getRootStyle
+from pagebot.style import (makeStyle, Style, touchStyle, getRootStyleNames,
+        STYLE_GENERATIONS, STYLE_TREE, copyStyleValues, isSharedStyleValue)
 from pagebot.constants import *
 from pagebot.fonttoolbox.fontpaths import getDefaultFontPath
 from pagebot.fonttoolbox.objects.font import findFont
@@ -39,6 +41,17 @@ from pagebot.elements.flow import Flow
 from pagebot.elements.imaging import Imaging
 from pagebot.elements.shrinking import Shrinking
 from pagebot.elements.showings import Showings
+from pagebot.elements.elementindex import NAME, CSSID, CLASSNAME, SID
+from pagebot.elements.siblingindex import SiblingIndex
+
+# Marks a cached css lookup that did not find a value in the tree, so the
+# default of the calling function is answered.
+NO_STYLE_VALUE = object()
+
+def parentReleased(ref):
+    """Weakref callback when a parent element is garbage collected. Cached
+    css values of its children could depend on the parent."""
+    touchStyle()
 
 class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         Showings):
@@ -57,6 +70,23 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
     isPage = False
     isView = False
 
+    # Preset, so it exists if properties are set before initialization.
+    _parent = None
+    # Dirty flags of incremental Document.solve(), see self.markDirty(). New
+    # elements are always solved.
+    _solveDirty = True
+    _solveDirtyDescendants = False
+    # Value of SolveGraph.solved at the last walk over the dependents of self.
+    _solveDirtyWalk = None
+    # Spatial index of the child elements, see self.siblingIndex.
+    _siblingIndex = None
+    # Attributes that self.copy() shares with the copy: references to other
+    # elements and shared resources.
+    COPY_SHARED_ATTRIBUTES = {'_context', '_template', '_theme'}
+    # Attributes that self.copy() sets itself.
+    COPY_RESET_ATTRIBUTES = {'_parent', '_elements', '_elementsSnapshot',
+        '_siblingIndex', '_eIds', '_cssCache'}
+
     GRADIENT_CLASS = Gradient
     SHADOW_CLASS = Shadow
     PATH_CLASS = BezierPath
@@ -119,6 +149,9 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
 
         """
         self._parent = None
+        # Cache of resolved self.css(...) values, validated by the generation
+        # counters in pagebot.style.
+        self._cssCache = {}
 
         # If not None, it overwrites property of searching up the parent tree.
         self._context = context
@@ -386,8 +419,8 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         if self.title:
             s += ' "%s"' % self.title
 
-        if self.elements:
-            s += ' e=%d' % len(self.elements)
+        if self._elements:
+            s += ' e=%d' % len(self._elements)
         if self.x:
             s += ' x=%s' % self.x
         if self.y:
@@ -413,7 +446,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         >>> i1, i2, len(e)
         (0, 1, 2)
         """
-        return len(self.elements)
+        return len(self._elements)
 
     def _get_context(self):
         """Answers the self._context if it is defined. Otherwise search
@@ -521,7 +554,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         return self.get(eIdOrName)
 
     def __setitem__(self, eId, e):
-        if not e in self.elements:
+        if not e in self._elements:
             self.appendElement(e)
         self._eIds[eId] = e
 
@@ -537,6 +570,69 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         return self._eId
     eId = property(_get_eId)
 
+    # Attributes that are kept in the document element index.
+
+    def _get_name(self):
+        """Optional name of the element, used by searches such as
+        self.getElementByName() and self.deepFind().
+
+        >>> from pagebot.document import Document
+        >>> doc = Document()
+        >>> e = Element(name='Old', parent=doc[1])
+        >>> e.name = 'New'
+        >>> doc[1].getElementByName('Old') is None, doc[1].getElementByName('New') is e
+        (True, True)
+        """
+        return self._name
+    def _set_name(self, name):
+        self._name = name
+        self.updateElementIndex()
+    name = property(_get_name, _set_name)
+
+    def _get_sId(self):
+        return self._sId
+    def _set_sId(self, sId):
+        self._sId = sId
+        self.updateElementIndex()
+    sId = property(_get_sId, _set_sId)
+
+    def _get_cssId(self):
+        return self._cssId
+    def _set_cssId(self, cssId):
+        self._cssId = cssId
+        self.updateElementIndex()
+    cssId = property(_get_cssId, _set_cssId)
+
+    def _get_cssClass(self):
+        return self._cssClass
+    def _set_cssClass(self, cssClass):
+        self._cssClass = cssClass
+        self.updateElementIndex()
+    cssClass = property(_get_cssClass, _set_cssClass)
+
+    def _get_elementIndex(self):
+        """Answers the ElementIndex of the document that self is part of.
+        Answers None if self is not placed in a document.
+
+        >>> from pagebot.document import Document
+        >>> doc = Document()
+        >>> e = Element(parent=doc[1])
+        >>> e.elementIndex is doc.elementIndex, Element().elementIndex
+        (True, None)
+        """
+        doc = self.doc
+        if doc is None:
+            return None
+        return doc.elementIndex
+    elementIndex = property(_get_elementIndex)
+
+    def updateElementIndex(self):
+        """Updates the entry of self in the document element index, after
+        one of the indexed attributes changed."""
+        elementIndex = self.elementIndex
+        if elementIndex is not None:
+            elementIndex.update(self)
+
     def _get_elements(self):
         """Property to get / set elements to parent self. Answers a copy of the
         list, not self._elements itself, to avoid problems if iterations on the
@@ -562,6 +658,36 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
 
     elements = property(_get_elements, _set_elements)
 
+    def iterElements(self):
+        """Answers an iterator over the child elements, without copying the
+        list on every call, as self.elements does. The iteration runs on a
+        tuple snapshot that is only rebuilt after the child elements changed,
+        so it is safe if the children of self change during the iteration.
+        Used by the recursive tree walkers, such as prepare, build and solve.
+
+        >>> e1, e2, e3 = Element(), Element(), Element()
+        >>> e = Element(elements=(e1, e2))
+        >>> list(e.iterElements()) == [e1, e2]
+        True
+        >>> for child in e.iterElements():
+        ...     i = e.appendElement(e3)
+        >>> list(e.iterElements()) == [e1, e2, e3]
+        True
+        >>> removed = e.removeElement(e1)
+        >>> list(e.iterElements()) == [e2, e3]
+        True
+        """
+        if self._elementsSnapshot is None:
+            self._elementsSnapshot = tuple(self._elements)
+        return iter(self._elementsSnapshot)
+
+    def elementsChanged(self):
+        """Called when self._elements is altered, to reset the snapshot that
+        is used by self.iterElements(). Marks self as changed, so the
+        conditions of the children are solved again."""
+        self._elementsSnapshot = None
+        self.markDirty()
+
     # Answers the x-ref dictionary with elements by their e.eIds
     def _get_elementIds(self):
         """Answers the list with child.eId
@@ -698,9 +824,22 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         """
         if self.name == name:
             return self
-        for e in self.elements:
+        elementIndex = self.elementIndex
+        if elementIndex is not None:
+            found = elementIndex.find(self, name, (NAME,))
+            # Otherwise scan, names can be derived without updating the index.
+            if found:
+                return found[0]
+        return self._getElementByName(name)
+
+    def _getElementByName(self, name):
+        """Recursive search by name in the element tree, in case self is not
+        part of the document element index."""
+        if self.name == name:
+            return self
+        for e in self.iterElements():
             # Don't search on next page yet.
-            found = e.getElementByName(name)
+            found = e._getElementByName(name)
             if found is not None:
                 return found
         return None
@@ -714,11 +853,11 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         file already exists, then ignore, just continue the broadcast towards
         the child elements. Default behavior is to do nothing. Inheriting
         Element classes can redefine."""
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare(view)
 
     def prepare_flat(self, view):
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare_flat(view)
 
     def getPosition(self, view, origin):
@@ -776,7 +915,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         default e.build(view, origin)."""
         hook = 'build_' + view.context.b.PB_ID
 
-        for e in self.elements:
+        for e in self.iterElements():
             if not e.show:
                 continue
             if hasattr(e, hook):
@@ -789,7 +928,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
     #   I N D E S I G N  S U P P O R T
 
     def prepare_inds(self, view):
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare_inds(view)
 
     def build_inds(self, view, origin, **kwargs):
@@ -800,7 +939,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         p = pointOffset(self.origin, origin)
         p2D = point2D(self._applyAlignment(p)) # Ignore z-axis for now.
         # Inheriting Elements should add their context call here.
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_inds(view, p2D, **kwargs)
 
     #   H T M L  /  S C S S / S A S S  S U P P O R T
@@ -814,7 +953,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         build_html. Default behavior is to do nothing other than recursively
         broadcast to all child element. Inheriting Element classes can
         redefine."""
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare_html(view)
 
     def prepare_zip(self, view):
@@ -822,7 +961,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         for build_zip. Default behavior is to do nothing other than
         recursively broadcast to all child element. Inheriting Element classes
         can redefine."""
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare_zip(view)
 
     '''
@@ -830,7 +969,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         """Build the scss variables for this element."""
         b = self.context.b
         b.build_scss(self, view)
-        for e in self.elements:
+        for e in self.iterElements():
             if e.show:
                 e.build_scss(view)
     '''
@@ -841,7 +980,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         for a single page."""
         if cssList is None:
             cssList = []
-        for e in self.elements:
+        for e in self.iterElements():
             if e.show:
                 e.build_css(view, cssList)
         return cssList
@@ -1143,13 +1282,25 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         assert name or pattern
         if result is None:
             result = []
-        for e in self.elements:
+        if pattern is None:
+            elementIndex = self.elementIndex
+            if elementIndex is not None:
+                found = elementIndex.find(self, name, (CSSID, NAME))
+                # Otherwise scan, values can be derived without updating the
+                # index.
+                if found:
+                    result += found
+                    return result
+        return self._deepFindAll(name, pattern, result)
+
+    def _deepFindAll(self, name, pattern, result):
+        for e in self.iterElements():
             # Simple pattern match
             if pattern is not None and pattern in e.name:
                 result.append(e)
             elif name is not None and name in (e.cssId, e.name):
                 result.append(e)
-            e.deepFindAll(name, pattern, result)
+            e._deepFindAll(name, pattern, result)
         return result
 
     def findAll(self, name=None, pattern=None, cls=None, result=None):
@@ -1182,7 +1333,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         assert name or pattern or cls
         result = []
 
-        for e in self.elements:
+        for e in self.iterElements():
             if cls is not None and (cls == e.__class__.__name__ or isinstance(e, cls)):
                  result.append(e)
                 # Simple pattern match
@@ -1235,14 +1386,25 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         True
         """
         assert name or pattern or cls
-        for e in self.elements:
+        if pattern is None and cls is None:
+            elementIndex = self.elementIndex
+            if elementIndex is not None:
+                found = elementIndex.find(self, name, (CLASSNAME, CSSID, NAME))
+                # Otherwise scan, values can be derived without updating the
+                # index.
+                if found:
+                    return found[0]
+        return self._deepFind(name, pattern, cls)
+
+    def _deepFind(self, name, pattern, cls):
+        for e in self.iterElements():
             if cls is not None and (cls == e.__class__.__name__ or isinstance(e, cls)):
                  return e
             if pattern is not None and pattern in e.name: # Simple pattern match
                 return e
             if name is not None and name in (e.__class__.__name__, e.cssId, e.name):
                 return e
-            found = e.deepFind(name, pattern)
+            found = e._deepFind(name, pattern, None)
             if found is not None:
                 return found
         return None
@@ -1287,7 +1449,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         """
         assert name or pattern or cls
 
-        for e in self.elements:
+        for e in self.iterElements():
             if cls is not None:
                 if e.__class__.__name__ == cls:
                     return e
@@ -1304,14 +1466,35 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
     def findBysId(self, sId):
         """If defined, the system self.sId can be used to recursively find self
         or a child. Answers None if nothing can be found that is exactly
-        matching."""
+        matching.
+
+        >>> from pagebot.document import Document
+        >>> doc = Document()
+        >>> e1 = Element(parent=doc[1], sId=123)
+        >>> e2 = Element(parent=e1, sId=456)
+        >>> doc[1].findBysId(456) is e2, e1.findBysId(123) is e1
+        (True, True)
+        >>> Element(elements=[Element(sId=789)]).findBysId(789).sId
+        789
+        """
         if sId is not None:
             if self.sId == sId:
                 return self
-            for e in self.elements:
-                found = e.findBysId(sId)
+            elementIndex = self.elementIndex
+            if elementIndex is not None:
+                found = elementIndex.find(self, sId, (SID,))
                 if found is not None:
-                    return found
+                    return (found or [None])[0]
+            return self._findBysId(sId)
+        return None
+
+    def _findBysId(self, sId):
+        if self.sId == sId:
+            return self
+        for e in self.iterElements():
+            found = e._findBysId(sId)
+            if found is not None:
+                return found
         return None
 
     def clearElements(self):
@@ -1328,7 +1511,13 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         >>> len(e)
         0
         """
+        elementIndex = self.elementIndex
+        if elementIndex is not None:
+            for e in self._elements:
+                elementIndex.remove(e)
         self._elements = []
+        self._elementsSnapshot = None
+        self._siblingIndex = None
         self._eIds = {}
 
     def clear(self):
@@ -1337,7 +1526,12 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
 
     def copy(self, parent=None):
         """Answers a full copy of self, where the "unique" fields are set to
-        default. Also perform a deep copy on all child elements.
+        default. Also copies all child elements. The copy is added to
+        `parent` if defined. It shares the values that cannot change in place
+        (units, strings, fonts), the context, the template and the condition
+        instances with self. The style, the
+        condition list and other mutable attributes are copied, so changing
+        the copy does not change self. See self._copyValue().
 
         >>> e1 = Element(name='Child', w=100)
         >>> e = Element(name='Parent', elements=[e1], w=200)
@@ -1352,24 +1546,52 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         (True, True, True)
         >>> e.copy().eId != e.eId
         True
+        >>> copyE.style is e.style, copyE.style['w'] is e.style['w']
+        (False, True)
+        >>> copyE['Child'].w = 50 # Changing the copy does not change self.
+        >>> e['Child'].w, copyE['Child'].w
+        (100pt, 50pt)
         """
-        # Deep-copies the element. Set the parent (if defined) and iterate
-        # through the child tree to make a e.eId unique.
-
-        savedElements = self._elements # Avoid deep copy on child elements
-        self._elements = []
-        copied = copy.deepcopy(self)
-        self._elements = savedElements
+        copied = self.__class__.__new__(self.__class__)
+        memo = {id(self): copied}
+        for name, value in self.__dict__.items():
+            copied.__dict__[name] = self._copyValue(name, value, memo)
 
         # Set some attributes on the copy
         copied._eId = uniqueID()
+        copied._parent = None # Not a child of the parent of self.
+        copied._elements = []
+        copied._elementsSnapshot = None
+        copied._siblingIndex = None
+        copied._eIds = {}
+        copied._cssCache = {}
+        copied._style.owner = weakref.ref(copied)
+        copied._solveDirty = True
 
         if parent is not None:
             copied.parent = parent
-        for e in self.elements:
+        for e in self.iterElements():
             copied.appendElement(e.copy())
         return copied
 
+    def _copyValue(self, name, value, memo):
+        """Answers the value of attribute `name` for a copy of self. Shared
+        attributes and values that cannot change in place are answered as
+        is. The style is copied by copyStyleValues(), the condition list
+        shares the condition instances. Other values are deep copied with
+        `memo`. Inheriting classes can redefine this method to copy their
+        own attributes."""
+        if name in self.COPY_SHARED_ATTRIBUTES or name in self.COPY_RESET_ATTRIBUTES:
+            return value
+        if isSharedStyleValue(value):
+            return value
+        if name == '_style':
+            return copyStyleValues(value)
+        if name == '_conditions':
+            # Condition instances are multi-purpose, only copy the list.
+            return list(value)
+        return copy.deepcopy(value, memo)
+
     #   C H I L D  E L E M E N T  P O S I T I O N S
 
     def getElementsAtPoint(self, point):
@@ -1392,7 +1614,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         elements = []
         # Add z if tuple is only (x,y)
         px, py, pz = point3D(point)
-        for e in self.elements:
+        for e in self.iterElements():
             ex, ey, ez = e.xyz
             if (ex == px or px is None) and \
                     (ey == py or py is None) and \
@@ -1414,7 +1636,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         ((20pt, 30pt, 0pt), (20pt, 40pt, 0pt))
         """
         elements = {}
-        for e in self.elements:
+        for e in self.iterElements():
             if e.eId:
                 elements[e.eId] = e.xyz
         return elements
@@ -1437,7 +1659,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         (True, True)
         """
         positions = {}
-        for e in self.elements:
+        for e in self.iterElements():
             # Point needs to be tuple to be used a key.
             rxyz = rv(e.xyz)
             if rxyz not in positions:
@@ -1511,11 +1733,63 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
     # Answers the cascaded style value, looking up the chain of ancestors,
     # until style value is defined.
 
+    def _get_style(self):
+        """Answers the local style dictionary of self. A Style instance is
+        kept as it is, so the caller can keep changing it. A plain dictionary
+        is copied into a Style, that keeps track of changes for the cached
+        self.css() values. Later changes to the plain dictionary don't change
+        self then: change self.style instead, or set a Style to keep sharing
+        it. A Style that belongs to another element is copied too.
+
+        >>> from pagebot.style import Style
+        >>> e = Element(fontSize=pt(12))
+        >>> child = Element(parent=e)
+        >>> child.css('fontSize')
+        12pt
+        >>> style = dict(fontSize=pt(24))
+        >>> e.style = style
+        >>> e.style is style, e.style.__class__.__name__, child.css('fontSize')
+        (False, 'Style', 24pt)
+        >>> style = Style(fontSize=pt(30))
+        >>> e.style = style
+        >>> style['fontSize'] = pt(36) # Changes by the caller are tracked.
+        >>> e.style is style, child.css('fontSize')
+        (True, 36pt)
+        >>> Element(style=style).style is style # Copied by makeStyle().
+        False
+        >>> other = Element()
+        >>> other.style = style # Owned by e.
+        >>> other.style is style
+        False
+        """
+        return self._style
+
+    def _set_style(self, style):
+        if isinstance(style, Style):
+            owner = style.owner and style.owner()
+            if owner is not None and owner is not self:
+                style = Style(style)
+        else:
+            style = Style(style or {})
+        self._style = style
+        self._style.owner = weakref.ref(self)
+        self._cssCache = {}
+        self.markDirty()
+        # Only the children inherit from the style of self.
+        if self._elements:
+            touchStyle()
+
+    style = property(_get_style, _set_style)
+
     def css(self, name, default=None):
         """In case we are looking for a plain css value, cascading from the
         main ancestor styles of self, then follow the parent links until
         document or root, if self does not contain the requested value.
 
+        Resolved values are cached in self. The cache is validated by the
+        generation counters in pagebot.style, that change when a style key,
+        a parent or a document style changes.
+
         >>> from pagebot.toolbox.units import em
         >>> from pagebot.document import Document
         >>> doc = Document()
@@ -1528,12 +1802,42 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         >>> e = Element(fontSize=pt(24), leading=em(1.4))
         >>> e.css('leading'), round(e.css('leading').pt) # Show unit and rendered compared to
         (1.4em, 17)
-        """
-        if name in self.style and self.style[name] is not None:
-            return self.style[name]
-        if self.parent is not None:
-            return self.parent.css(name, default)
-        return default
+        >>> # Cached values follow changes in the parent tree.
+        >>> child = Element(parent=e)
+        >>> child.css('fontSize')
+        24pt
+        >>> e.fontSize = pt(36)
+        >>> child.css('fontSize')
+        36pt
+        >>> child.style['fontSize'] = pt(10)
+        >>> child.css('fontSize')
+        10pt
+        >>> doc.applyStyle(dict(fontSize=pt(18)))
+        >>> child.parent = page
+        >>> del child.style['fontSize']
+        >>> child.css('fontSize')
+        18pt
+        >>> child.css('xyz', 'Default')
+        'Default'
+        """
+        generation = STYLE_GENERATIONS[STYLE_TREE], STYLE_GENERATIONS.get(name)
+        cached = self._cssCache.get(name)
+
+        if cached is not None and cached[0] == generation:
+            value = cached[1]
+        else:
+            value = self._style.get(name)
+            if value is None:
+                parent = self.parent
+                if parent is not None:
+                    value = parent.css(name, NO_STYLE_VALUE)
+                else:
+                    value = NO_STYLE_VALUE
+            self._cssCache[name] = generation, value
+
+        if value is NO_STYLE_VALUE:
+            return default
+        return value
 
     def checkStyleArgs(self, d):
         """Fix style values where necessary.
@@ -1594,7 +1898,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         (Color(r=0.1, g=0.2, b=0.3), 12pt, 1.4em, 'left')
         """
         flattenedStyle = {} # Create a dict with all keys from root style and values from self.css()
-        for key in getRootStyle():
+        for key in getRootStyleNames():
             flattenedStyle[key] = self.css(key)
         return flattenedStyle
 
@@ -1776,12 +2080,31 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         element to a parent, because the original parent would not know that
         the element disappeared. Call self.appendElement(e), which will call
         this method. """
+        elementIndex = self.elementIndex
+        if elementIndex is not None:
+            elementIndex.remove(self)
+
         if parent is not None:
-            parent = weakref.ref(parent)
+            elementIndex = parent.elementIndex
+            parent = weakref.ref(parent, parentReleased)
+        else:
+            elementIndex = None
 
         # Can be None if self needs to be unlinked from a parent tree. E.g.
         # when it is moved.
         self._parent = parent
+        self.resetCssCache()
+
+        if elementIndex is not None:
+            elementIndex.add(self)
+
+    def resetCssCache(self):
+        """Invalidates the cached css values of self. If self has child
+        elements, then all cached css values are invalidated, as the children
+        cascade through self."""
+        self._cssCache = {}
+        if self._elements:
+            touchStyle()
 
     def _get_parent(self):
         """Answers the parent of the element, if it exists, by weakref
@@ -1797,14 +2120,20 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
             #assert not self in parent.ancestors, '[%s.%s] Cannot set one of the children "%s" as parent.' % (self.__class__.__name__, self.name, parent)
             parent.appendElement(self)
         else:
-            self._parent = None
+            # Detach from the current parent, as removeElement does. This also
+            # removes self and its child elements from the element index.
+            removeElement = getattr(self.parent, 'removeElement', None)
+            if removeElement is not None:
+                removeElement(self)
+            else: # No parent, or a document that keeps pages by number.
+                self.setParent(None)
     parent = property(_get_parent, _set_parent)
 
     def _get_siblings(self):
         """Answers all elements that share self.parent, not including self in
         the list."""
         siblings = []
-        for e in self.parent.elements:
+        for e in self.parent.iterElements():
             if not e is self:
                 siblings.append(e)
         return siblings
@@ -4415,10 +4744,10 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         """
         x1 = y1 = z1 = XXXL
         x2 = y2 = z2 = -XXXL
-        if not self.elements:
+        if not self._elements:
             # No element, answers vacuum block (x, y, z), (w, h, d)
             return pt(0, 0, 0), pt(0, 0, 0)
-        for e in self.elements:
+        for e in self.iterElements():
             x1 = min(x1, e.left)
             x2 = max(x2, e.right)
             y1 = min(y1, e.mBottom)
@@ -4449,10 +4778,10 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         subtracting their paddings. Sizes cannot become nextive."""
         x1 = y1 = z1 = XXXL
         x2 = y2 = z2 = -XXXL
-        if not self.elements:
+        if not self._elements:
             # No element, answers vacuum block (x, y, z), (w, h, d)
             return pt(0, 0, 0), pt(0, 0, 0)
-        for e in self.elements:
+        for e in self.iterElements():
             x1 = max(x1, e.left + e.pl)
             x2 = min(x2, e.right - e.pl)
             y1 = max(y1, e.bottom + e.pb)
@@ -4480,7 +4809,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         """Answers (minX, minY, maxX, maxY, minZ, maxZ) for all element origins."""
         minX = minY = minZ = XXXL
         maxX = maxY = maxZ = -XXXL
-        for e in self.elements:
+        for e in self.iterElements():
             minX = min(minX, e.x)
             maxX = max(maxX, e.x)
             minY = min(minY, e.y)
@@ -4614,15 +4943,20 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         projection between (self.mLeft, self.mRight). Note that the y may be
         outside the parent box. Only elements with identical z-value are
         compared. Comparison of available space, includes the margins of the
-        elements."""
-        y = self.parent.h
-        for e in self.parent.elements:
-            if previousOnly and e is self: # Only look at siblings that are previous in the list.
-                break
-            if abs(e.z - self.z) > tolerance or e.mRight < self.mLeft or self.mRight < e.mLeft:
-                continue # Not equal z-layer or not in window of vertical projection.
-            y = min(y, e.mBottom)
-        return y
+        elements. The siblings are found in self.parent.siblingIndex, so
+        floating all children of a parent does not compare all pairs.
+
+        >>> parent = Element(w=500, h=500, xAlign=LEFT, yAlign=BOTTOM)
+        >>> e1 = Element(x=0, y=400, w=100, h=100, parent=parent)
+        >>> e2 = Element(x=300, y=300, w=100, h=200, parent=parent)
+        >>> e3 = Element(x=50, y=0, w=100, h=100, parent=parent)
+        >>> e3.getFloatSideTop(), e2.getFloatSideTop(), e1.getFloatSideTop()
+        (400pt, 500pt, 500pt)
+        >>> e1.w = 400 # Now also above e2.
+        >>> e2.getFloatSideTop(), e1.getFloatSideTop(previousOnly=False) # And e3.
+        (400pt, 0pt)
+        """
+        return self.parent.siblingIndex.getFloatSideTop(self, previousOnly, tolerance)
 
     def getFloatSideBottom(self, previousOnly=True, tolerance=0):
         """Answers the max y that can float to bottom, without overlapping
@@ -4630,15 +4964,16 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         vertical projection of (self.mLeft, self.mRight). Note that the y may
         be outside the parent box. Only elements with identical z-value are
         compared. Comparison of available space, includes the margins of the
-        elements."""
-        y = 0
-        for e in self.parent.elements: # All elements that share self.parent, except self.
-            if previousOnly and e is self: # Only look at siblings that are previous in the list.
-                break
-            if abs(e.z - self.z) > tolerance or e.mRight < self.mLeft or self.mRight < e.mLeft:
-                continue # Not equal z-layer or not in window of vertical projection.
-            y = max(y, e.mTop)
-        return y
+        elements.
+
+        >>> parent = Element(w=500, h=500, xAlign=LEFT, yAlign=BOTTOM)
+        >>> e1 = Element(x=0, y=0, w=100, h=100, parent=parent)
+        >>> e2 = Element(x=50, y=300, w=100, h=100, parent=parent)
+        >>> e3 = Element(x=50, y=200, w=100, h=100, z=1, parent=parent)
+        >>> e2.getFloatSideBottom(), e3.getFloatSideBottom(), e3.getFloatSideBottom(tolerance=1)
+        (100pt, 0, 400pt)
+        """
+        return self.parent.siblingIndex.getFloatSideBottom(self, previousOnly, tolerance)
 
     def getFloatSideLeft(self, previousOnly=True, tolerance=0):
         """Answers the max `x` that can float to the left, without overlapping
@@ -4646,21 +4981,16 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         horizontal projection of `(self.mTop, self.mBottom)`. Note that the `x`
         may be outside the parent box. Only elements with identical z-value are
         compared. Comparison of available space, includes the margins of the
-        elements."""
-        x = 0
-
-        # All elements that share self.parent, except self.
-        for e in self.parent.elements:
-            # Only look at siblings that are previous in the list.
-            if previousOnly and e is self:
-                break
-            if abs(e.z - self.z) > tolerance:
-                continue # Not equal z-layer
-
-            if e.mBottom >= self.mTop or self.mBottom >= e.mTop:
-                continue
-            x = max(e.mRight, x)
-        return x
+        elements.
+
+        >>> parent = Element(w=500, h=500, xAlign=LEFT, yAlign=BOTTOM)
+        >>> e1 = Element(x=0, y=0, w=100, h=100, parent=parent)
+        >>> e2 = Element(x=300, y=50, w=100, h=100, parent=parent)
+        >>> e3 = Element(x=300, y=100, w=100, h=100, parent=parent)
+        >>> e2.getFloatSideLeft(), e3.getFloatSideLeft() # Touching e1 is not overlapping.
+        (100pt, 400pt)
+        """
+        return self.parent.siblingIndex.getFloatSideLeft(self, previousOnly, tolerance)
 
     def getFloatSideRight(self, previousOnly=True, tolerance=0):
         """Answers the max Y that can float to the right, without overlapping
@@ -4668,17 +4998,15 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         vertical projection of (self.mLeft, self.mRight). Note that the y may
         be outside the parent box. Only elements with identical z-value are
         compared. Comparison of available space, includes the margins of the
-        elements."""
-        x = self.parent.w
-        for e in self.parent.elements: # All elements that share self.parent, except self.
-            if previousOnly and e is self: # Only look at siblings that are previous in the list.
-                break
-            if abs(e.z - self.z) > tolerance:
-                continue # Not equal z-layer
-            if e.mBottom >= self.mTop or self.mBottom >= e.mTop:
-                continue
-            x = min(e.mLeft, x)
-        return x
+        elements.
+
+        >>> parent = Element(w=500, h=500, xAlign=LEFT, yAlign=BOTTOM)
+        >>> e1 = Element(x=400, y=0, w=100, h=100, parent=parent)
+        >>> e2 = Element(x=0, y=50, w=100, h=100, parent=parent)
+        >>> e2.getFloatSideRight(), e1.getFloatSideRight()
+        (400pt, 500pt)
+        """
+        return self.parent.siblingIndex.getFloatSideRight(self, previousOnly, tolerance)
 
     # Private alignment, scale and rotation functions.
 
@@ -4770,7 +5098,7 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         elif languages is None:
             languages = [self.language or DEFAULT_LANGUAGE]
         self._spellCheckWords(languages, unknown, minLength)
-        for e in self.elements:
+        for e in self.iterElements():
             e.spellCheck(languages, unknown, minLength)
         return unknown
 
@@ -4780,9 +5108,121 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
         """Recursively composes Publication, Pages and Elements to build the
         document of a publication. Default behavior is to just pass it on to
         the chidren."""
-        for e in self.elements:
+        for e in self.iterElements():
             e.compose(doc, publication)
 
+    def _get_conditions(self):
+        """Answers the list of conditions of self. Can be None. Setting the
+        conditions marks self to be solved again.
+
+        >>> from pagebot.conditions import Left2Left
+        >>> e = Element(conditions=Left2Left())
+        >>> e.conditions
+        [Left2Left]
+        """
+        return self._conditions
+
+    def _set_conditions(self, conditions):
+        self._conditions = conditions
+        self.markDirty()
+
+    conditions = property(_get_conditions, _set_conditions)
+
+    def markDirty(self):
+        """Marks self as changed since the last Document.solve(), together
+        with the elements that depend on self in the solve graph of the
+        document. An incremental solve only solves the conditions of dirty
+        elements. Changes of the style, position, size, child elements,
+        text and conditions call this method, changes made to content in
+        place (e.g. adding to self.bs) need to call it explicitly.
+
+        >>> from pagebot.document import Document
+        >>> from pagebot.conditions import Left2Left, Float2Left
+        >>> doc = Document(w=300, h=300)
+        >>> page = doc[1]
+        >>> e1 = Element(w=50, parent=page, conditions=[Left2Left()])
+        >>> e2 = Element(w=50, parent=page, conditions=[Float2Left()])
+        >>> score = doc.solve()
+        >>> e1.isDirty, e2.isDirty, page.isDirty
+        (False, False, False)
+        >>> e1.w = 60 # e2 floats against e1, so it depends on it.
+        >>> e1.isDirty, e2.isDirty, page.isDirty
+        (True, True, False)
+
+        Elements that are not solved themselves, such as hidden elements, are
+        not dirty after solving and still mark their dependents.
+
+        >>> from pagebot.conditions import Top2Top
+        >>> doc = Document(w=300, h=300)
+        >>> page = doc[1]
+        >>> e1 = Element(w=50, h=300, parent=page, show=False)
+        >>> e2 = Element(w=50, parent=page, conditions=[Top2Top(), Float2Left()])
+        >>> score = doc.solve()
+        >>> e1.isDirty, e2.x
+        (False, 50pt)
+        >>> e1.w = 120
+        >>> score = doc.solve(incremental=True)
+        >>> e2.x
+        120pt
+        """
+        # The box of self may have changed, as well as the boxes of the
+        # children, if they depend on the size or style of self.
+        siblingIndex = getattr(self.parent, '_siblingIndex', None)
+        if siblingIndex is not None:
+            siblingIndex.invalidate(self)
+        self._siblingIndex = None
+        self._solveDirty = True
+        doc = self.doc
+        if doc is not None:
+            graph = doc.solveGraph
+            # Walk the dependents in the solve graph, without recursion. Also
+            # if self was dirty already, but only if elements were solved
+            # since the last walk, otherwise all dependents are still dirty.
+            if graph.dependents and self._solveDirtyWalk != graph.solved:
+                self._solveDirtyWalk = graph.solved
+                todo = [self]
+                seenSiblings = {}
+                while todo:
+                    for e in graph.getDependents(todo.pop(), seenSiblings):
+                        if not e._solveDirty:
+                            e._solveDirty = True
+                            e._markDirtyAncestors()
+                            todo.append(e)
+        self._markDirtyAncestors()
+
+    def _markDirtyAncestors(self):
+        """Lets the ancestors of self know that they have dirty descendants."""
+        parent = self.parent
+        while parent is not None and not parent._solveDirtyDescendants:
+            parent._solveDirtyDescendants = True
+            parent = parent.parent
+
+    def _get_isDirty(self):
+        """Answers True if self needs to be solved again. See
+        self.markDirty()."""
+        return self._solveDirty
+    isDirty = property(_get_isDirty)
+
+    def _get_siblingIndex(self):
+        """Answers the SiblingIndex with the margin boxes of the child
+        elements of self, used by the float queries of the children. The
+        index is made on first use and kept until the style or the child
+        elements of self change.
+
+        >>> e = Element(w=500, h=500)
+        >>> e1 = Element(x=20, w=100, parent=e)
+        >>> index = e.siblingIndex
+        >>> index is e.siblingIndex, len(index)
+        (True, 1)
+        >>> e2 = Element(parent=e)
+        >>> index is e.siblingIndex, len(e.siblingIndex)
+        (False, 2)
+        """
+        if self._siblingIndex is None:
+            self._siblingIndex = SiblingIndex(self)
+        return self._siblingIndex
+    siblingIndex = property(_get_siblingIndex)
+
     def evaluate(self, score=None):
         """Evaluates the content of element `e` with all the conditions."""
         if score is None:
@@ -4795,34 +5235,94 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
              condition.evaluate(self, score)
 
         # Also works if showing element is not a container.
-        for e in self.elements:
+        for e in self.iterElements():
             if e.show:
                 e.evaluate(score)
 
         return score
 
-    def solve(self, score=None):
+    def solve(self, score=None, incremental=False):
         """Evaluates the content of element e with the all the conditions. The
         view is passed as an argument because it (or its builder) may be needed
         to solve specific text conditions, such as the run length of text and
-        overflow of text boxes."""
+        overflow of text boxes. If `incremental` is True, then only the
+        elements that are marked dirty (see self.markDirty) are solved, and
+        only the subtrees that contain them are visited.
+
+        >>> from pagebot.document import Document
+        >>> from pagebot.conditions import Right2Right
+        >>> doc = Document(w=300, h=300)
+        >>> page = doc[1]
+        >>> e1 = Element(w=50, parent=page, conditions=[Right2Right()])
+        >>> e2 = Element(w=50, parent=page, conditions=[Right2Right()])
+        >>> doc.solve().result
+        2
+        >>> doc.solve(incremental=True).result # Nothing changed.
+        0
+        >>> e1.w = 100
+        >>> doc.solve(incremental=True).result, e1.x, e2.x
+        (1, 164pt, 214pt)
+        """
         if score is None:
             score = Score()
+        if incremental and not self._solveDirty and not self._solveDirtyDescendants:
+            return score
+        # Reset before solving, so changes during solving mark again.
+        self._solveDirtyDescendants = False
 
         # Can be None or empty list. Skip in case there are no conditions in
         # the style.
         if self.conditions:
-            for condition in self.conditions:
-                condition.solve(self, score)
+            if not incremental or self._solveDirty:
+                # Changes that the conditions make to self don't need solving
+                # again, but do mark the elements that depend on self.
+                self._solveDirty = False
+                doc = self.doc
+                if doc is not None:
+                    doc.solveGraph.solved += 1
+                dependencies = []
+                for condition in self.conditions:
+                    if score.timing is None:
+                        condition.solve(self, score)
+                    else:
+                        t = perf_counter()
+                        condition.solve(self, score)
+                        score.addTiming(condition, perf_counter() - t)
+                    dependencies += condition.getDependencies(self)
+                if doc is not None:
+                    doc.solveGraph.setDependencies(self, dependencies)
+
+            # The child elements are not solved.
+            for e in self.iterElements():
+                e._clearDirty()
 
         else:
             # Also works if showing element is not a container.
-            for e in self.elements:
+            for e in self.iterElements():
                 if e.show:
-                    e.solve(score)
+                    e.solve(score, incremental)
+                else:
+                    e._clearDirty()
 
+        self._solveDirty = False
         return score
 
+    def _clearDirty(self):
+        """Marks self and its descendants as solved, for elements that
+        self.solve() skips. Otherwise they stay dirty and changes to them
+        don't mark their dependents."""
+        if not self._solveDirty and not self._solveDirtyDescendants:
+            return
+        todo = [self]
+        while todo:
+            e = todo.pop()
+            if e._solveDirty or e._solveDirtyDescendants:
+                e._solveDirty = e._solveDirtyDescendants = False
+                todo.extend(e.iterElements())
+        doc = self.doc
+        if doc is not None:
+            doc.solveGraph.solved += 1
+
     def _get_viewFrameStrokeWidth(self):
         """Answers local setting of frame stroke width, used if self.showFrame
         is True. Note that this is independent from the element border
@@ -4968,8 +5468,8 @@ class Element(Alignments, ClipPath, Conditions, Flow, Imaging, Shrinking,
             # instances are multi-purpose.
             self.conditions = copy.copy(template.conditions)
 
-            for e in template.elements:
-                self.appendElement(e.copy(parent=self))
+            for e in template.iterElements():
+                e.copy(parent=self)
 
     template = property(_get_template, _set_template)
 if __name__ == '__main__':
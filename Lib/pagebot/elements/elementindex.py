@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     elementindex.py
+#
+#     Index of the elements on the pages of a document, by name, cssId,
+#     cssClass, class name, eId and sId. The Document owns the index. Elements
+#     update it incrementally when they change parent or one of the indexed
+#     attributes. Searches such as Element.getElementByName(), deepFind() and
+#     findBysId() then don't need to scan the whole element tree.
+#
+
+NAME = 'name'
+CSSID = 'cssId'
+CSSCLASS = 'cssClass'
+CLASSNAME = 'className'
+EID = 'eId'
+SID = 'sId'
+
+INDEX_KINDS = (NAME, CSSID, CSSCLASS, CLASSNAME, EID, SID)
+
+def getIndexValue(e, kind):
+    """Answers the value of element `e` for the index kind."""
+    if kind == CLASSNAME:
+        return e.__class__.__name__
+    return getattr(e, kind, None)
+
+class ElementIndex:
+    """Keeps the elements of the registered pages of a document by their
+    (kind, value) keys, both per page and for the whole document.
+
+    >>> from pagebot.document import Document
+    >>> from pagebot.elements.element import Element
+    >>> doc = Document(autoPages=2)
+    >>> page1, page2 = doc[1], doc[2]
+    >>> e1 = Element(name='Box', parent=page1)
+    >>> e2 = Element(name='Box', cssId='Id2', parent=page2)
+    >>> e3 = Element(name='Inner', sId=123, parent=e2)
+    >>> index = doc.elementIndex
+    >>> index.getElements(NAME, 'Box') == [e1, e2]
+    True
+    >>> index.getElements(NAME, 'Box', page2) == [e2]
+    True
+    >>> index.getElements(SID, 123) == [e3]
+    True
+    >>> e3.name = 'Other'
+    >>> index.getElements(NAME, 'Inner'), index.getElements(NAME, 'Other') == [e3]
+    ([], True)
+    >>> removed = page2.removeElement(e2)
+    >>> index.getElements(NAME, 'Box') == [e1], index.getElements(SID, 123)
+    (True, [])
+    """
+    def __init__(self):
+        # Key is page.eId, value is dict with {(kind, value): {e.eId: e}}. The
+        # buckets are ordered dictionaries, so elements are answered in the
+        # order of indexing, while removing an element does not need a scan.
+        self.pageKeys = {}
+        # Key is (kind, value), value is {e.eId: e} of elements in all pages.
+        self.docKeys = {}
+        # Key is e.eId, value is (page.eId, keys) as they are stored.
+        self.entries = {}
+
+    def __repr__(self):
+        return '<%s pages=%d elements=%d>' % (self.__class__.__name__,
+                len(self.pageKeys), len(self.entries))
+
+    def __contains__(self, e):
+        return e.eId in self.entries
+
+    def getKeys(self, e):
+        """Answers the list of (kind, value) keys for element `e`. Values that
+        are None or that cannot be used as key are skipped."""
+        keys = []
+        for kind in INDEX_KINDS:
+            value = getIndexValue(e, kind)
+            if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                keys.append((kind, value))
+        return keys
+
+    def getIndexedPage(self, e):
+        """Answers the registered page that contains element `e`, searching
+        up the parent tree. Answers None if `e` is not on a registered page
+        (e.g. it is part of a template or not placed in the document)."""
+        while e is not None:
+            if getattr(e, 'isPage', False) and e.eId in self.pageKeys:
+                return e
+            e = e.parent
+        return None
+
+    def addPage(self, page):
+        """Registers the page and all of its child elements."""
+        if page.eId not in self.pageKeys:
+            self.pageKeys[page.eId] = {}
+            self._addTree(page, page.eId)
+
+    def removePage(self, page):
+        """Unregisters the page and all of its child elements."""
+        if page.eId in self.pageKeys:
+            self.remove(page)
+            del self.pageKeys[page.eId]
+
+    def add(self, e, parent=None):
+        """Adds element `e` and its child elements, if `e` is on a registered
+        page. Otherwise ignore the call. The optional `parent` is used if
+        `e.parent` is not set (yet)."""
+        if e.eId in self.entries:
+            return
+        page = self.getIndexedPage(parent or e)
+        if page is not None:
+            self._addTree(e, page.eId)
+
+    def _addKeys(self, e, pageKeys, keys):
+        for key in keys:
+            for indexKeys in (pageKeys, self.docKeys):
+                keyElements = indexKeys.get(key)
+                if keyElements is None:
+                    keyElements = indexKeys[key] = {}
+                keyElements[e.eId] = e
+
+    def _removeKeys(self, e, pageKeys, keys):
+        for key in keys:
+            for indexKeys in (pageKeys, self.docKeys):
+                keyElements = indexKeys.get(key)
+                if keyElements is not None:
+                    keyElements.pop(e.eId, None)
+                    if not keyElements:
+                        del indexKeys[key]
+
+    def _addTree(self, e, pageId):
+        keys = self.getKeys(e)
+        self._addKeys(e, self.pageKeys[pageId], keys)
+        self.entries[e.eId] = pageId, keys
+        for child in e.iterElements():
+            if child.eId not in self.entries:
+                self._addTree(child, pageId)
+
+    def remove(self, e):
+        """Removes element `e` and its child elements from the index."""
+        entry = self.entries.pop(e.eId, None)
+        if entry is None:
+            return
+        pageId, keys = entry
+        self._removeKeys(e, self.pageKeys.get(pageId, {}), keys)
+        for child in e.iterElements():
+            self.remove(child)
+
+    def update(self, e):
+        """Updates the keys of element `e`, after one of the indexed attributes
+        changed. Child elements are not affected."""
+        entry = self.entries.get(e.eId)
+        if entry is None:
+            return
+        pageId, keys = entry
+        newKeys = self.getKeys(e)
+        if newKeys == keys:
+            return
+        pageKeys = self.pageKeys[pageId]
+        self._removeKeys(e, pageKeys, keys)
+        self._addKeys(e, pageKeys, newKeys)
+        self.entries[e.eId] = pageId, newKeys
+
+    def getElements(self, kind, value, page=None):
+        """Answers the list of elements with `value` for index `kind`, in the
+        order of indexing. If `page` is defined, only answer elements on that
+        page."""
+        if page is None:
+            keys = self.docKeys
+        else:
+            keys = self.pageKeys.get(page.eId, {})
+        return list(keys.get((kind, value), {}).values())
+
+    def find(self, scope, value, kinds=(NAME,), includeScope=False):
+        """Answers the list of elements in the tree of `scope` that match
+        `value` for any of the index `kinds`, in the depth-first order of the
+        tree, as a recursive search would find them. Answers None if `scope`
+        is not on a registered page, so the caller needs to search the tree
+        itself."""
+        page = self.getIndexedPage(scope)
+        if page is None:
+            return None
+
+        candidates = {} # Ordered set of the matching elements, by eId.
+        for kind in kinds:
+            for e in self.pageKeys[page.eId].get((kind, value), {}).values():
+                # Ignore entries of attributes that changed without update.
+                if e.eId not in candidates and getIndexValue(e, kind) == value:
+                    candidates[e.eId] = e
+
+        found = []
+        childIndices = {} # Shared by the tree paths of all candidates.
+        for e in candidates.values():
+            if e is scope:
+                if includeScope:
+                    found.append(((), e))
+                continue
+            treePath = self.getTreePath(scope, e, childIndices)
+            if treePath is not None:
+                found.append((treePath, e))
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0])
+        return [e for _, e in found]
+
+    def getTreePath(self, scope, e, childIndices=None):
+        """Answers the tuple of child indices from `scope` down to `e`. Answers
+        None if `e` is not in the tree of `scope`. The optional dictionary
+        `childIndices` keeps the {child.eId: index} of the parents on the way,
+        so the paths of multiple elements don't scan the same child lists."""
+        if childIndices is None:
+            childIndices = {}
+        treePath = []
+        while e is not scope:
+            parent = e.parent
+            if parent is None or parent.isPage and parent is not scope and \
+                    parent.eId in self.pageKeys:
+                return None
+            indices = childIndices.get(parent.eId)
+            if indices is None:
+                indices = {child.eId: i for i, child in enumerate(getattr(parent, '_elements', ()))}
+                childIndices[parent.eId] = indices
+            index = indices.get(e.eId)
+            if index is None:
+                return None
+            treePath.append(index)
+            e = parent
+        treePath.reverse()
+        return tuple(treePath)
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
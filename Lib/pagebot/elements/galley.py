@@ -72,6 +72,7 @@ class Galley(Element):
             # Possibly add to self again, will move it to the top of the
             # element stack.
         self._elements.append(e)
+        self.elementsChanged()
         # Set parent of element without calling this method again.
         e.setParent(self)
         # Store the element by unique element id, if it is defined.
@@ -91,7 +92,7 @@ class Galley(Element):
         if w and h:
             return w, h
         # No fixed size set. Calculate required size from contained elements.
-        for e in self.elements:
+        for e in self.iterElements():
             ew, eh = e.getSize()
             w = max(w, ew)
             h += eh
@@ -147,7 +148,7 @@ class Galley(Element):
         # Don't call self.buildElements, we want to track the vertical
         # positions.
         gy = 0
-        for e in self.elements:
+        for e in self.iterElements():
             if not e.show:
                 continue
             # Find space and do more composition.
@@ -182,7 +183,7 @@ class Column(Galley):
         # None.
         b.div(cssClass=self.cssClass or self.__class__.__name__.lower(), cssId=self.cssId)
 
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_html(view, path, **kwargs)
 
         b._div()
@@ -74,6 +74,7 @@ class GlyphPath(BezierPaths):
     def _set_w(self, w):
         # If self._h is set too, do disproportioan sizing. Otherwise set to 0 or None.
         self._w = units(w or DEFAULT_WIDTH)
+        self.markDirty()
     w = property(_get_w, _set_w)
 
     def _get_h(self):
@@ -91,6 +92,7 @@ class GlyphPath(BezierPaths):
         # If self._w is set too, do disproportional sizing. Otherwise set to 0
         # or None.
         self._h = units(h or DEFAULT_HEIGHT)
+        self.markDirty()
     h = property(_get_h, _set_h)
 
     def build(self, view, origin=ORIGIN, **kwargs):
@@ -163,10 +163,29 @@ class Image(Element):
         return self.w, self.h
 
     def _set_size(self, size):
+        """Sets the size, without making it proportional. Marks self to be
+        solved again, as self._w and self._h are set directly.
+
+        >>> from pagebot import getContext
+        >>> from pagebot.document import Document
+        >>> from pagebot.filepaths import getResourcesPath
+        >>> from pagebot.elements.element import Element
+        >>> imagePath = getResourcesPath() + '/images/peppertom.png'
+        >>> doc = Document(w=500, h=500, context=getContext())
+        >>> page = doc[1]
+        >>> img = Image(imagePath, x=0, y=400, w=100, h=100, parent=page)
+        >>> e3 = Element(x=50, y=0, w=100, h=100, parent=page)
+        >>> e3.getFloatSideTop()
+        400pt
+        >>> img.size = (30, 100, 0) # No longer above e3.
+        >>> e3.getFloatSideTop()
+        500pt
+        """
         # Reset to original size by single None value.
         if size is None:
             size = None, None, None
         self._w, self._h, self.d = units(point3D(size))
+        self.markDirty()
 
     size = property(_get_size, _set_size)
 
@@ -201,6 +220,7 @@ class Image(Element):
             w = units(w)
         self._w = w # Width is lead, height is undefined.
         self._h = None
+        self.markDirty()
     w = property(_get_w, _set_w)
 
     def _get_h(self):
@@ -234,6 +254,7 @@ class Image(Element):
             h = units(h)
         self._w = None # Height is lead, width is undefined.
         self._h = h
+        self.markDirty()
 
     h = property(_get_h, _set_h)
 
@@ -358,7 +379,7 @@ class Image(Element):
         child elements."""
         self._scaleImage(view)
 
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare_html(view)
 
     def build_html(self, view, path, **kwargs):
@@ -375,7 +396,7 @@ class Image(Element):
         b.div(cssClass='caption')
 
         # Draw captions if there are any.
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_html(view, path, **kwargs)
         # .caption
         b._div()
@@ -393,7 +414,7 @@ class Image(Element):
                 alpha=self._getAlpha(), w=self.w, h=self.h,
                 scaleType=self.scaleType, e=self)
 
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_flat(view, p2D)
         '''
 
@@ -409,7 +430,7 @@ class Image(Element):
         context.image(self.path, p2D, pageNumber=self.index,
                 alpha=self._getAlpha(), w=self.w, h=self.h,
                 scaleType=self.scaleType, e=self)
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_inds(view, p2D)
 
     def prepare(self, view):
@@ -419,7 +440,7 @@ class Image(Element):
         file already exists, then ignore, just continue the broadcast towards
         the child elements."""
         self._scaleImage(view)
-        for e in self.elements:
+        for e in self.iterElements():
             e.prepare(view)
 
     def build(self, view, origin=ORIGIN, **kwargs):
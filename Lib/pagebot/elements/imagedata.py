@@ -69,6 +69,7 @@ class ImageData(Element):
         return self._w
     def _set_w(self, w):
         self._w = w
+        self.markDirty()
     w = property(_get_w, _set_w)
 
     def _get_h(self):
@@ -77,6 +78,7 @@ class ImageData(Element):
         return self._h
     def _set_h(self, h):
         self._h = h
+        self.markDirty()
     h = property(_get_h, _set_h)
 
     def _get_iw(self):
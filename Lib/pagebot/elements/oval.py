@@ -50,7 +50,7 @@ class Oval(Element):
         p = pointOffset(self.origin, origin)
         px, py = p2D = point2D(self._applyAlignment(p)) # Ignore z-axis for now.
         context.oval(px, py, e=self)
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_inds(view, p2D)
 
 if __name__ == '__main__':
@@ -164,6 +164,7 @@ class Page(Element):
 
     def _set_name(self, name):
         self._name = name
+        self.updateElementIndex()
 
     name = property(_get_name, _set_name)
 
@@ -409,7 +410,7 @@ class Page(Element):
         page elements, which at that time can use the full document style
         settings by e.css(...)."""
         doc.appendPage(self)
-        for e in self.elements:
+        for e in self.iterElements():
             e.compose(doc, publication)
 
     #   D R A W B O T  &  F L A T  S U P P O R T
@@ -640,7 +641,7 @@ class Page(Element):
         else:
             b.body()
 
-            for e in self.elements:
+            for e in self.iterElements():
                 e.build_html(view, path)
 
             self.write_javascript(view)
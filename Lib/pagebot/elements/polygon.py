@@ -39,6 +39,7 @@ class Polygon(Element):
         p = units(point2D(p))
         assert p is not None
         self.points.append(p)
+        self.markDirty()
 
     def _get_w(self):
         return self.box[2]
@@ -109,6 +110,7 @@ class Polygon(Element):
         for point in self.points:
             points.append((point[0] + dx, point[1] + dy))
         self.points = points
+        self.markDirty()
 
     def _set_scale(self, sx, sy=None):
         """
@@ -137,6 +139,7 @@ class Polygon(Element):
             points.append((px, py))
 
         self.points = points
+        self.markDirty()
 
     def _get_box(self):
         """ Get the (x, y, w, h) box of all points.
@@ -74,7 +74,7 @@ class Rect(Element):
         px, py = p2D = point2D(self._applyAlignment(p))
         context.rect(px, py, e=self)
 
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_inds(view, p2D)
 
 if __name__ == '__main__':
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     siblingindex.py
+#
+#     Spatial index of the margin boxes of the child elements of a parent,
+#     used by Element.getFloatSideTop(), getFloatSideBottom(),
+#     getFloatSideLeft() and getFloatSideRight(). The boxes are kept in two
+#     lists, sorted on mLeft and on mBottom. Together with the largest width
+#     and height of the boxes, a binary search then answers the candidate
+#     siblings that overlap a horizontal or vertical projection, instead of
+#     testing all siblings. The parent owns the index and drops it when its
+#     own style or child elements change. Element.markDirty() marks the box of
+#     a moved or resized child as stale, to be updated on the next query.
+#
+from bisect import bisect_left, bisect_right, insort
+
+from pagebot.toolbox.units import upt
+
+# Slack of the candidate range, so rounding of the box widths and heights
+# never excludes an overlapping box.
+ROUNDING_SLACK = 0.001
+
+class SiblingIndex:
+    """Keeps the margin boxes of the child elements of a parent. The float
+    queries answer the same values as scanning all siblings.
+
+    >>> from pagebot.elements.element import Element
+    >>> from pagebot.constants import LEFT, BOTTOM
+    >>> parent = Element(w=500, h=500, xAlign=LEFT, yAlign=BOTTOM)
+    >>> e1 = Element(x=0, y=400, w=100, h=100, parent=parent)
+    >>> e2 = Element(x=300, y=300, w=100, h=200, parent=parent)
+    >>> e3 = Element(x=50, y=0, w=100, h=100, parent=parent)
+    >>> index = SiblingIndex(parent)
+    >>> index.getFloatSideTop(e3) # Only e1 overlaps the projection of e3.
+    400pt
+    >>> index.getFloatSideLeft(e2), index.getFloatSideRight(e1)
+    (100pt, 500pt)
+    >>> e3.x = 250 # Now below e2 only.
+    >>> parent.siblingIndex.getFloatSideTop(e3)
+    300pt
+    """
+    def __init__(self, parent):
+        # Key is eId of a child element, value is its order in parent.elements
+        self.orders = {}
+        # Child elements in the order of parent.elements
+        self.elements = []
+        # Per order the box (z, mLeft, mRight, mBottom, mTop) as unit values
+        # and the same values in pt, for comparison and sorting.
+        self.boxes = []
+        self.ptBoxes = []
+        # Sorted lists of (mLeft, order) and (mBottom, order) in pt.
+        self.xIndex = []
+        self.yIndex = []
+        # Upper bounds of the widths and heights of the boxes in the index.
+        self.maxWidth = 0
+        self.maxHeight = 0
+        # Orders of the elements that changed since their box was indexed.
+        self.stale = set()
+
+        for order, e in enumerate(parent.iterElements()):
+            self.orders[e.eId] = order
+            self.elements.append(e)
+            self.boxes.append(None)
+            self.ptBoxes.append(None)
+            self._addBox(order)
+        self.xIndex.sort()
+        self.yIndex.sort()
+
+    def __repr__(self):
+        return '<%s %d elements>' % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.elements)
+
+    def _addBox(self, order, sort=False):
+        e = self.elements[order]
+        box = (e.z, e.mLeft, e.mRight, e.mBottom, e.mTop)
+        z, mLeft, mRight, mBottom, mTop = ptBox = tuple(upt(v) for v in box)
+        self.boxes[order] = box
+        self.ptBoxes[order] = ptBox
+        self.maxWidth = max(self.maxWidth, mRight - mLeft)
+        self.maxHeight = max(self.maxHeight, mTop - mBottom)
+        if sort:
+            insort(self.xIndex, (mLeft, order))
+            insort(self.yIndex, (mBottom, order))
+        else:
+            self.xIndex.append((mLeft, order))
+            self.yIndex.append((mBottom, order))
+
+    def _removeBox(self, order):
+        _, mLeft, _, mBottom, _ = self.ptBoxes[order]
+        del self.xIndex[bisect_left(self.xIndex, (mLeft, order))]
+        del self.yIndex[bisect_left(self.yIndex, (mBottom, order))]
+
+    def invalidate(self, e):
+        """Marks the box of child element `e` as changed. Answers False if
+        `e` is not in the index."""
+        order = self.orders.get(e.eId)
+        if order is None:
+            return False
+        self.stale.add(order)
+        return True
+
+    def update(self):
+        """Updates the boxes of the changed elements."""
+        for order in self.stale:
+            self._removeBox(order)
+            self._addBox(order, sort=True)
+        self.stale.clear()
+
+    def _getCandidates(self, e, horizontal, previousOnly, tolerance):
+        """Answers the sorted orders of the siblings in the same z-layer as
+        `e`, that may overlap the horizontal (mLeft, mRight) or vertical
+        (mBottom, mTop) projection of `e`, together with the pt values of
+        that projection."""
+        self.update()
+        selfOrder = self.orders.get(e.eId)
+        z = upt(e.z)
+        if horizontal:
+            index, maxSize = self.xIndex, self.maxWidth
+            start, end = upt(e.mLeft), upt(e.mRight)
+        else:
+            index, maxSize = self.yIndex, self.maxHeight
+            start, end = upt(e.mBottom), upt(e.mTop)
+        lo = bisect_left(index, (start - maxSize - ROUNDING_SLACK,))
+        hi = bisect_right(index, (end + ROUNDING_SLACK, len(self.elements)))
+        orders = []
+        for _, order in index[lo:hi]:
+            if previousOnly and selfOrder is not None and order >= selfOrder:
+                continue
+            if abs(self.ptBoxes[order][0] - z) > tolerance:
+                continue
+            orders.append(order)
+        orders.sort()
+        return orders, start, end
+
+    def getFloatSideTop(self, e, previousOnly=True, tolerance=0):
+        """Answers the value of e.getFloatSideTop(), the minimal mBottom of
+        the siblings that overlap the vertical projection of `e`, or the
+        height of the parent."""
+        y = e.parent.h
+        orders, mLeft, mRight = self._getCandidates(e, True, previousOnly, tolerance)
+        for order in orders:
+            _, left, right, _, _ = self.ptBoxes[order]
+            if right < mLeft or mRight < left:
+                continue
+            y = min(y, self.boxes[order][3])
+        return y
+
+    def getFloatSideBottom(self, e, previousOnly=True, tolerance=0):
+        """Answers the value of e.getFloatSideBottom(), the maximal mTop of
+        the siblings that overlap the vertical projection of `e`, or 0."""
+        y = 0
+        orders, mLeft, mRight = self._getCandidates(e, True, previousOnly, tolerance)
+        for order in orders:
+            _, left, right, _, _ = self.ptBoxes[order]
+            if right < mLeft or mRight < left:
+                continue
+            y = max(y, self.boxes[order][4])
+        return y
+
+    def getFloatSideLeft(self, e, previousOnly=True, tolerance=0):
+        """Answers the value of e.getFloatSideLeft(), the maximal mRight of
+        the siblings that overlap the horizontal projection of `e`, or 0."""
+        x = 0
+        orders, mBottom, mTop = self._getCandidates(e, False, previousOnly, tolerance)
+        for order in orders:
+            _, _, _, bottom, top = self.ptBoxes[order]
+            if bottom >= mTop or mBottom >= top:
+                continue
+            x = max(self.boxes[order][2], x)
+        return x
+
+    def getFloatSideRight(self, e, previousOnly=True, tolerance=0):
+        """Answers the value of e.getFloatSideRight(), the minimal mLeft of
+        the siblings that overlap the horizontal projection of `e`, or the
+        width of the parent."""
+        x = e.parent.w
+        orders, mBottom, mTop = self._getCandidates(e, False, previousOnly, tolerance)
+        for order in orders:
+            _, _, _, bottom, top = self.ptBoxes[order]
+            if bottom >= mTop or mBottom >= top:
+                continue
+            x = min(self.boxes[order][1], x)
+        return x
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -38,6 +38,7 @@ class Template(Page):
         if parent is not None:
             parent = weakref.ref(parent)
         self._parent = parent
+        self.resetCssCache()
     parent = property(_get_parent, _set_parent)
 
     def draw(self, origin, view):
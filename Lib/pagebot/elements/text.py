@@ -22,7 +22,6 @@
 #     hyphenated, wrapped and aligned.
 
 import re
-from copy import deepcopy
 
 from pagebot.constants import *
 from pagebot.contexts.basecontext.babelstring import BabelString
@@ -140,6 +139,7 @@ class Text(Element, TextConditions, TextAlignments):
             bs = BabelString(bs, self.style, w=self.w, h=self.h, context=self.context)
         assert isinstance(bs, BabelString)
         self._bs = bs
+        self.markDirty()
 
     bs = property(_get_bs, _set_bs)
 
@@ -374,9 +374,10 @@ class Text(Element, TextConditions, TextAlignments):
         self._restoreScale(view)
         self.drawMeta(view, origin)
 
-    def copy(self, parent=None):
-        """Answers a full copy of `self`, where the "unique" fields are set to
-        default. Also performs a deep copy on all child elements.
+    def _copyValue(self, name, value, memo):
+        """Answers the value of attribute `name` for a copy of `self`. The
+        BabelString is copied by bs.copy(), sharing the strings and
+        immutable style values of the runs.
 
         >>> from pagebot.toolbox.color import blackColor, noColor
         >>> from pagebot.toolbox.units import pt
@@ -389,29 +390,55 @@ class Text(Element, TextConditions, TextAlignments):
         >>> bs = context.newString('Hello world', style)
         >>> t = Text(bs, name='Child', w=100, parent=page)
         >>> copyE = t.copy() # Copy the element attribute, including the string of self.
-        >>> copyE.bs
-        $Hello worl...$
+        >>> copyE.bs, copyE.bs is t.bs, copyE.bs.runs[0].s is t.bs.runs[0].s
+        ($Hello worl...$, False, True)
         """
-        e = Element.copy(self, parent=parent)
-        e.bs = deepcopy(self.bs) # Copy the string separately.
-        return e
+        if name == '_bs' and value is not None:
+            return value.copy()
+        return Element._copyValue(self, name, value, memo)
 
     def append(self, bs, style=None):
-        """Appends to the current BabelString instance self.bs."""
+        """Appends to the current BabelString instance self.bs. Marks self
+        to be solved again, as the string changes in place.
+
+        >>> from pagebot import getContext
+        >>> from pagebot.document import Document
+        >>> context = getContext()
+        >>> doc = Document(w=300, h=300, context=context)
+        >>> t = Text('ABC', w=100, parent=doc[1])
+        >>> score = doc.solve()
+        >>> t.isDirty
+        False
+        >>> t.append('D')
+        >>> t.bs.s, t.isDirty
+        ('ABCD', True)
+        """
         if not isinstance(bs, BabelString):
             bs = BabelString(str(bs), style, context=self.context)
         if self.bs is None:
             self.bs = bs
         else:
-            self.bs += bs
+            self.bs.extend(bs)
             self._textLines = None # Force new rendering on self.textLines call.
+            self.markDirty()
 
     def appendMarker(self, markerId, arg=None):
         """Appends a marker at the end of the last BabelString.runs[-1].
         This can be used by page composers to see what the status of a certain
         text has become, after rendering textLines.
+
+        >>> from pagebot import getContext
+        >>> from pagebot.document import Document
+        >>> context = getContext()
+        >>> doc = Document(w=300, h=300, context=context)
+        >>> t = Text('ABC', w=100, parent=doc[1])
+        >>> score = doc.solve()
+        >>> t.appendMarker('chapter', 1)
+        >>> len(t.bs.getMarkerRuns('chapter')), t.isDirty
+        (1, True)
         """
-        self.bs.appendMarker(markerId, arg)
+        self.bs.addMarker(markerId, arg)
+        self.markDirty()
 
     def getTextSize(self, bs=None, w=None):
         """Figures out what the width and height of the text self.bs is, with
@@ -898,7 +925,7 @@ class Text(Element, TextConditions, TextAlignments):
         p = pointOffset(self.origin, origin)
         p2D = point2D(self._applyAlignment(p)) # Ignore z-axis for now.
         context.textBox(self.bs, p2D, e=self)
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_inds(view, p2D)
 
     #   B U I L D  H T M L
@@ -924,7 +951,7 @@ class Text(Element, TextConditions, TextAlignments):
             # Get HTML from BabelString in HtmlString context.
             b.addHtml(html)
 
-        for e in self.elements:
+        for e in self.iterElements():
             e.build_html(view, origin, **kwargs)
 
         if hasContent:
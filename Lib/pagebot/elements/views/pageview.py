@@ -16,6 +16,8 @@
 #
 
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from random import random
 from datetime import datetime
 from math import atan2, radians, degrees, cos, sin
@@ -30,10 +32,30 @@ from pagebot.constants import (TOP, RIGHT, BOTTOM, LEFT, QUIRE_SPREAD,
     GRID_COL_BG, GRID_ROW_BG, GRID_SQR_BG, BASE_LINE, BASE_LINE_BG,
     BASE_INDEX_LEFT, BASE_Y_LEFT, BASE_INDEX_RIGHT, BASE_Y_RIGHT,
     BASE_INSIDE, DEFAULT_BASELINE_COLOR, DEFAULT_BASELINE_WIDTH,
-    ECI_GrayConL, COLORBAR_LEFT, COLORBAR_RIGHT)
+    ECI_GrayConL, COLORBAR_LEFT, COLORBAR_RIGHT, FILETYPE_GIF)
 from pagebot.toolbox.units import pt, upt, pointOffset, point2D
 from pagebot.toolbox.transformer import *
 
+HAS_FORK = 'fork' in multiprocessing.get_all_start_methods()
+# Document view and build parameters of the processes forked by
+# PageView.buildParallel()
+PARALLEL_BUILD = {}
+
+def _buildPagesInProcess(indices):
+    """Builds and saves the pages at `indices` of the sorted pages in a forked
+    process. Answers the list of results of context.savePage()."""
+    view = PARALLEL_BUILD['view']
+    context = view.context
+    w, h = PARALLEL_BUILD['size']
+    sortedPages = PARALLEL_BUILD['sortedPages']
+    results = []
+    for index in indices:
+        context.newDrawing(w=w, h=h)
+        view.buildPage(sortedPages[index][1][0], w, h, **PARALLEL_BUILD['kwargs'])
+        results.append(context.savePage(PARALLEL_BUILD['path'],
+            PARALLEL_BUILD['leading'] + index, PARALLEL_BUILD['fileType']))
+    return results
+
 class PageView(BaseView):
     """The PageView contains the set of Quire instances to export the pages as
     documents. A View is just another kind of container, kept by a Document to
@@ -82,9 +104,11 @@ class PageView(BaseView):
 
         return sortedPages
 
-    def build(self, path=None, pageSelection=None, multiPage=True, **kwargs):
+    def build(self, path=None, pageSelection=None, multiPage=True, workers=None, **kwargs):
         """Draw the selected pages. pageSelection is an optional set of
-        y-pageNumbers to draw.
+        y-pageNumbers to draw. If `workers` is defined, then pages of file
+        types that the context can save one by one (e.g. PNG, JPG, SVG and GIF
+        in FlatContext) are built in that number of processes, 0 is all cores.
 
         >>> from pagebot.document import Document
         >>> from pagebot.constants import BusinessCard, A4, QUIRE_QUARTO
@@ -139,59 +163,19 @@ class PageView(BaseView):
             for page in pages:
                 page.prepare(self)
 
-        for pn, pages in sortedPages:
-            '''
-            Creates a new DrawBot viewport page to draw template + page, if not
-            already done. In case the document is oversized, then make all
-            pages the size of the document, so the pages can draw their crop
-            marks. Otherwise make DrawBot pages of the size of each page.  Size
-            depends on the size of the larges pages + optional document
-            padding.
-            '''
-            # TODO: make this work for pages that share the same page number
-            page = pages[0]
-
-            # Copy from main (w, h), since they may be altered, from the
-            # orgiinal document size.
-            pw, ph = w, h
-
-            origin = self.pl, self.pb, pt(0)
-
-            # Make page in context, actual page may be smaller if showing
-            # cropmarks.
-            self.context.newPage(w=pw, h=ph)
-
-            # If page['frameDuration'] is set and saving as movie or animated
-            # gif, then set the global frame duration. Set the duration of
-            # this page, in case exporting GIF
-            self.context.frameDuration(page.frameDuration)
-
-            # View may have a background defined. Build with page bleed, if it
-            # is defined.
-            fillColor = self.style.get('fill', noColor)
-
-            if fillColor is not noColor:
-                bt, br, bb, bl = page.bleed
-                self.context.fill(fillColor)
-                self.context.rect(x=page.bleedLeft, y=page.bleedBottom,
-                        w=pw+br+bl, h=ph+bt+bb)
-
-            # If there is meta info requested for the background,
-            # draw it.
-            self.drawPageMetaInfoBackground(page, origin)
-
-            # Because self already adjusts the origin, scale, etc. we don't use
-            # the page.build, but we call its child elements build.
-            page.buildChildElements(self, origin, **kwargs)
+        folder = path2ParentPath(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
 
-            # If there is meta info request for the foreground, draw it.
-            self.drawPageMetaInfo(page, origin)
+        # Build the pages in worker processes, if requested and possible.
+        workers = self.getBuildWorkerCount(workers, path, len(sortedPages), multiPage)
+        if workers > 1:
+            self.buildParallel(path, sortedPages, w, h, workers, **kwargs)
+            return
 
-            # Self.infoElements now may have collected elements needed info to
-            # be drawn, after all drawing is done. So the info boxes don't get
-            # covered by regular page content.
-            for e in self.elementsNeedingInfo.values():
-                self._drawElementsNeedingInfo(e)
+        for pn, pages in sortedPages:
+            # TODO: make this work for pages that share the same page number
+            self.buildPage(pages[0], w, h, **kwargs)
 
         '''
         Export the document to fileName for all pages in sequential order. If
@@ -207,10 +191,6 @@ class PageView(BaseView):
         MyBuilder(document).export(fileName), the builder is responsible to
         query the document, pages, elements and styles.
         '''
-        folder = path2ParentPath(path)
-        if folder and not os.path.exists(folder):
-            os.mkdir(folder)
-
         # FIXME:
         #  - "fileName" is undefined
         #  - "frameDuration" is a method or a CSS value ?
@@ -220,6 +200,127 @@ class PageView(BaseView):
 
         self.context.saveDrawing(path, multiPage=multiPage)
 
+    def buildPage(self, page, w, h, **kwargs):
+        """Draws `page` on a new page of size (w, h) in the context, with the
+        view background, the page meta info and the child elements of the page.
+        """
+        '''
+        Creates a new DrawBot viewport page to draw template + page, if not
+        already done. In case the document is oversized, then make all
+        pages the size of the document, so the pages can draw their crop
+        marks. Otherwise make DrawBot pages of the size of each page.  Size
+        depends on the size of the larges pages + optional document
+        padding.
+        '''
+        # Copy from main (w, h), since they may be altered, from the
+        # orgiinal document size.
+        pw, ph = w, h
+
+        origin = self.pl, self.pb, pt(0)
+
+        # Make page in context, actual page may be smaller if showing
+        # cropmarks.
+        self.context.newPage(w=pw, h=ph)
+
+        # If page['frameDuration'] is set and saving as movie or animated
+        # gif, then set the global frame duration. Set the duration of
+        # this page, in case exporting GIF
+        self.context.frameDuration(page.frameDuration)
+
+        # View may have a background defined. Build with page bleed, if it
+        # is defined.
+        fillColor = self.style.get('fill', noColor)
+
+        if fillColor is not noColor:
+            bt, br, bb, bl = page.bleed
+            self.context.fill(fillColor)
+            self.context.rect(x=page.bleedLeft, y=page.bleedBottom,
+                    w=pw+br+bl, h=ph+bt+bb)
+
+        # Info of the elements of other pages is not drawn on this page, so
+        # the result does not depend on the order in which pages are built.
+        self.elementsNeedingInfo = {}
+
+        # If there is meta info requested for the background,
+        # draw it.
+        self.drawPageMetaInfoBackground(page, origin)
+
+        # Because self already adjusts the origin, scale, etc. we don't use
+        # the page.build, but we call its child elements build.
+        page.buildChildElements(self, origin, **kwargs)
+
+        # If there is meta info request for the foreground, draw it.
+        self.drawPageMetaInfo(page, origin)
+
+        # Self.infoElements now may have collected elements needed info to
+        # be drawn, after all drawing is done. So the info boxes don't get
+        # covered by regular page content.
+        for e in self.elementsNeedingInfo.values():
+            self._drawElementsNeedingInfo(e)
+
+    def getBuildWorkerCount(self, workers, path, pageCount, multiPage=True):
+        """Answers the number of worker processes to build `pageCount` pages
+        to `path`. If `workers` is 0, then all cores are used. Answers 1 if
+        the context cannot save the pages of this file type one by one, if
+        the pages are saved into one file or if processes cannot be forked.
+
+        >>> from pagebot.document import Document
+        >>> from pagebot.contexts import getContext
+        >>> doc = Document(w=100, h=100, autoPages=3, context=getContext('Flat'))
+        >>> view = doc.view
+        >>> view.getBuildWorkerCount(2, '_export/Pages.png', 3) == (2 if HAS_FORK else 1)
+        True
+        >>> view.getBuildWorkerCount(4, '_export/Pages.pdf', 3), view.getBuildWorkerCount(4, '_export/Pages.png', 3, False)
+        (1, 1)
+        >>> view.getBuildWorkerCount(None, '_export/Pages.png', 3)
+        1
+        """
+        if workers is None or not HAS_FORK:
+            return 1
+        fileType = path.split('.')[-1].lower()
+        if fileType not in self.context.PARALLEL_PAGE_TYPES:
+            return 1
+        if fileType != FILETYPE_GIF and not multiPage:
+            return 1
+        if not workers:
+            workers = os.cpu_count() or 1
+        return max(1, min(workers, pageCount))
+
+    def buildParallel(self, path, sortedPages, w, h, workers, **kwargs):
+        """Builds and saves the pages in `workers` processes. Each process is
+        forked from the prepared document, so it has its own copy of the
+        document and the context, and nothing but page indices and saved
+        file paths (or GIF frames) has to be pickled. Results are merged in
+        page order, and file names are the same as building in one process.
+        """
+        context = self.context
+        fileType = path.split('.')[-1].lower()
+
+        # Pages that the context made with self.newDrawing() are saved
+        # first, as when saving the drawing in one process.
+        leading = context.pageCount()
+        results = [context.savePage(path, n, fileType, n) for n in range(leading)]
+        durations = [None] * leading
+
+        indices = list(range(len(sortedPages)))
+        chunkSize = max(1, len(indices) // (workers * 4))
+        chunks = [indices[n:n+chunkSize] for n in range(0, len(indices), chunkSize)]
+
+        PARALLEL_BUILD.update(view=self, path=path, fileType=fileType,
+            sortedPages=sortedPages, size=(w, h), leading=leading, kwargs=kwargs)
+        try:
+            with ProcessPoolExecutor(max_workers=workers,
+                    mp_context=multiprocessing.get_context('fork')) as executor:
+                for chunkResults in executor.map(_buildPagesInProcess, chunks):
+                    results += chunkResults
+        finally:
+            PARALLEL_BUILD.clear()
+
+        if fileType == FILETYPE_GIF:
+            for pn, pages in sortedPages:
+                durations.append(pages[0].frameDuration)
+            context.saveFrames(results, path, durations)
+
     #   D R A W I N G  P A G E  M E T A  I N F O
 
     def drawPageMetaInfo(self, page, origin, path=None):
@@ -1276,7 +1377,7 @@ class PageView(BaseView):
             self.drawBefore(self, view, p)
 
         self.drawElementFrame(view, p) # In case the view itself is used on a page.
-        for page in self.elements:
+        for page in self.iterElements():
             page.build(view, p, **kwargs)
 
         if self.drawAfter is not None: # Call if defined
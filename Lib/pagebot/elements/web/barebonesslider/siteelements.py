@@ -37,12 +37,14 @@ class SlideShowBase(Column):
         return self._cssId or self.CSS_ID or self.__class__.__name__
     def _set_cssId(self, cssId):
         self._cssId = cssId
+        self.updateElementIndex()
     cssId = property(_get_cssId, _set_cssId)
 
     def _get_cssClass(self):
         return self._cssClass or self.cssId.lower()
     def _set_cssClass(self, cssClass):
         self._cssClass = cssClass
+        self.updateElementIndex()
     cssClass = property(_get_cssClass, _set_cssClass)
 
     def showCssIdClass(self, view):
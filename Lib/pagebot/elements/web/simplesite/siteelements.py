@@ -35,6 +35,7 @@ class SiteColumn(Column):
         return self._cssId or self.__class__.__name__
     def _set_cssId(self, cssId):
         self._cssId = cssId
+        self.updateElementIndex()
     cssId = property(_get_cssId, _set_cssId)
 
     def getCssId(self, label=None):
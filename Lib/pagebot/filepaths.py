@@ -59,6 +59,29 @@ def getExportPath():
 
     return path
 
+def getCachePath():
+    """Answers the path of the folder where PageBot keeps persistent caches,
+    such as the font catalog. The PAGEBOT_CACHE environment variable overrides
+    the default ~/.cache/pagebot. The folder is created if it does not exist.
+    Answers None if it cannot be created, then caches stay in memory.
+
+    >>> cachePath = os.environ.get('PAGEBOT_CACHE')
+    >>> os.environ['PAGEBOT_CACHE'] = '/proc/nope/pagebot' # Not writable.
+    >>> getCachePath() is None
+    True
+    >>> _ = os.environ.pop('PAGEBOT_CACHE') if cachePath is None else os.environ.update(PAGEBOT_CACHE=cachePath)
+    """
+    path = os.environ.get('PAGEBOT_CACHE')
+    if not path:
+        path = os.environ.get('XDG_CACHE_HOME') or '%s/.cache' % HOME
+        path = '%s/%s' % (path, 'pagebot')
+    try:
+        # Parallel workers may create the folder at the same time.
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
 def getMampPath():
     return getContextMampPath()
 
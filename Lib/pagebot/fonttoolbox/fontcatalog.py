@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     fontcatalog.py
+#
+#     Persistent catalog of the font info of font files, stored as JSON in the
+#     PageBot cache folder. Entries are keyed by font path and checked on file
+#     modification time and size, so only changed font files are opened again.
+#     This way getFamilyPaths(), findFonts() and Font.match() can find fonts
+#     without opening all font files in every new process.
+#
+import os
+import json
+from threading import RLock
+
+from fontTools.ttLib import TTFont, TTLibError
+
+from pagebot.constants import FONT_ITALIC_MATCHES
+from pagebot.filepaths import getCachePath
+from pagebot.fonttoolbox.objects.fontinfo import FontInfo
+from pagebot.toolbox.transformer import path2FontName, path2FamilyName
+
+FONT_CATALOG_VERSION = 1
+FONT_CATALOG_NAME = 'fontcatalog.json'
+FONT_CATALOG = None # Shared instance, answered by getFontCatalog()
+FONT_CATALOG_LOCK = RLock()
+
+def getFileStat(path):
+    """Answers the (mtime, size) tuple of the file at `path`. Answers None if
+    the file does not exist.
+
+    >>> getFileStat('/NonExisting/Font.ttf') is None
+    True
+    """
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+    except (OSError, TypeError, ValueError):
+        return None
+
+def unicodes2Ranges(unicodes):
+    """Answers the sorted list of [first, last] ranges of the `unicodes`, as
+    compact storage of the cmap coverage.
+
+    >>> unicodes2Ranges([65, 66, 67, 97, 32, 98])
+    [[32, 32], [65, 67], [97, 98]]
+    """
+    ranges = []
+    for u in sorted(unicodes):
+        if ranges and ranges[-1][1] == u - 1:
+            ranges[-1][1] = u
+        else:
+            ranges.append([u, u])
+    return ranges
+
+def isItalicInfo(fontPath, styleName, italicAngle):
+    """Answers 1 if the font should be considered italic, judged on the
+    `italicAngle` or alternative italic names in the file name or the
+    `styleName`. Otherwise answer 0. Same rules as Font.isItalic().
+
+    >>> isItalicInfo('/fonts/Roboto-Regular.ttf', 'Regular', -12)
+    1
+    >>> isItalicInfo('/fonts/Roboto-BoldItalic.ttf', 'BoldItalic', 0)
+    1
+    >>> isItalicInfo('/fonts/Roboto-Bold.ttf', 'Bold', 0)
+    0
+    """
+    if italicAngle:
+        return 1
+    fontName = path2FontName(fontPath) or ''
+    for altName in FONT_ITALIC_MATCHES:
+        if altName in fontName or altName in (styleName or ''):
+            return 1
+    return 0
+
+def scanFont(fontPath):
+    """Opens the font file and answers the catalog entry dictionary with its
+    font info. Answers None if it cannot be read as a font.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> entry = scanFont(getTestFontsPath() + '/google/roboto/Roboto-BlackItalic.ttf')
+    >>> entry['familyName'], entry['styleName'], entry['weightClass'], entry['italic']
+    ('Roboto', 'BlackItalic', 900, 1)
+    >>> entry['cmap'][0]
+    [0, 0]
+    >>> entry = scanFont(getTestFontsPath() + '/fontbureau/Amstelvar-Roman-VF.ttf')
+    >>> entry['axes']
+    {'opsz': [0.0, 0.0, 1.0]}
+    """
+    try:
+        ttFont = TTFont(fontPath, lazy=True)
+    except (TTLibError, OSError):
+        return None
+    try:
+        info = FontInfo(ttFont)
+        entry = dict(familyName=info.familyName, styleName=info.styleName)
+        for name in ('weightClass', 'widthClass', 'italicAngle', 'unitsPerEm'):
+            try:
+                entry[name] = getattr(info, name)
+            except (KeyError, AttributeError): # Missing table
+                entry[name] = None
+        entry['italic'] = isItalicInfo(fontPath, entry['styleName'], entry['italicAngle'])
+        axes = {}
+        if 'fvar' in ttFont:
+            for axis in ttFont['fvar'].axes:
+                axes[axis.axisTag] = [axis.minValue, axis.defaultValue, axis.maxValue]
+        entry['axes'] = axes
+        cmap = None
+        if 'cmap' in ttFont:
+            cmap = ttFont['cmap'].getBestCmap()
+        entry['cmap'] = unicodes2Ranges(cmap or ())
+    except (TTLibError, KeyError, ValueError, AssertionError):
+        return None
+    finally:
+        ttFont.close()
+    return entry
+
+class FontCatalog:
+    """Persistent catalog of font info by font path. Entries are stored with
+    the modification time and size of the font file. The font file is only
+    opened again if one of them changed.
+
+    >>> import tempfile
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> catalogPath = tempfile.mkdtemp() + '/fontcatalog.json'
+    >>> bungeePath = getTestFontsPath() + '/djr/bungee'
+    >>> paths = [bungeePath + '/' + fileName for fileName in sorted(os.listdir(bungeePath)) if fileName.endswith('.ttf')]
+    >>> catalog = FontCatalog(catalogPath)
+    >>> catalog.update(paths) # Number of opened font files.
+    5
+    >>> catalog.update(paths) # Nothing changed.
+    0
+    >>> catalog = FontCatalog(catalogPath) # Read again from file.
+    >>> catalog.update(paths), len(catalog)
+    (0, 5)
+    >>> catalog.getEntry(paths[0])['familyName']
+    'Bungee'
+    >>> catalog.hasUnicodes(paths[0], 'ABC'), catalog.hasUnicodes(paths[0], 'ABC一')
+    (True, False)
+    >>> catalog.getFamilyPaths(paths)['Bungee'] == paths
+    True
+    >>> catalog.update(paths[1:], prune=True), len(catalog) # Remove other entries
+    (0, 4)
+
+    If the cache folder cannot be created, the catalog is kept in memory.
+
+    >>> cachePath = os.environ.get('PAGEBOT_CACHE')
+    >>> os.environ['PAGEBOT_CACHE'] = '/proc/nope/pagebot' # Not writable.
+    >>> catalog = FontCatalog()
+    >>> catalog.path is None, catalog.update(paths), catalog.save()
+    (True, 5, False)
+    >>> _ = os.environ.pop('PAGEBOT_CACHE') if cachePath is None else os.environ.update(PAGEBOT_CACHE=cachePath)
+    """
+    def __init__(self, path=None):
+        if path is None:
+            cachePath = getCachePath()
+            if cachePath is not None: # Otherwise the catalog is memory only.
+                path = cachePath + '/' + FONT_CATALOG_NAME
+        self.path = path
+        self.entries = {} # Key is font path, value is entry dictionary.
+        self.changed = False
+        self.load()
+
+    def __repr__(self):
+        return '<%s %d fonts>' % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, fontPath):
+        return fontPath in self.entries
+
+    def load(self):
+        """Reads the catalog from self.path. Ignores the file if it does not
+        exist, cannot be read or has a different version."""
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == FONT_CATALOG_VERSION:
+            self.entries = data.get('fonts') or {}
+            self.changed = False
+
+    def save(self):
+        """Writes the catalog to self.path, if it changed. The file is
+        replaced at once, so other processes never read a half written file.
+        Answers True if it was written."""
+        if not self.changed or self.path is None:
+            return False
+        data = dict(version=FONT_CATALOG_VERSION, fonts=self.entries)
+        tmpPath = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            with open(tmpPath, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmpPath, self.path)
+        except OSError:
+            # Cache folder not writable, keep the catalog in memory only.
+            return False
+        self.changed = False
+        return True
+
+    def isCurrent(self, fontPath):
+        """Answers if there is an entry for `fontPath` that matches the
+        modification time and size of the file."""
+        entry = self.entries.get(fontPath)
+        return entry is not None and tuple(entry['stat']) == getFileStat(fontPath)
+
+    def scan(self, fontPath):
+        """Opens the font file and stores its info, with the current file stat.
+        Answers the entry."""
+        fileStat = getFileStat(fontPath)
+        if fileStat is None: # File disappeared.
+            self.entries.pop(fontPath, None)
+            self.changed = True
+            return None
+        entry = scanFont(fontPath)
+        if entry is None: # Remember bad font files too, to avoid opening them again.
+            entry = dict(valid=False)
+        else:
+            entry['valid'] = True
+        entry['stat'] = list(fileStat)
+        with FONT_CATALOG_LOCK:
+            self.entries[fontPath] = entry
+            self.changed = True
+        return entry
+
+    def update(self, fontPaths, prune=False, save=True):
+        """Scans the font files of `fontPaths` that are new or changed. If
+        `prune` is True, then remove all other entries. Save the catalog if
+        it changed and `save` is True. Answers the number of scanned font
+        files."""
+        scanned = 0
+        fontPaths = list(fontPaths)
+        for fontPath in fontPaths:
+            if not self.isCurrent(fontPath):
+                self.scan(fontPath)
+                scanned += 1
+        if prune:
+            fontPaths = set(fontPaths)
+            with FONT_CATALOG_LOCK:
+                for fontPath in list(self.entries):
+                    if fontPath not in fontPaths:
+                        del self.entries[fontPath]
+                        self.changed = True
+        if save:
+            self.save()
+        return scanned
+
+    def getEntry(self, fontPath, scan=True):
+        """Answers the entry dictionary with the font info of `fontPath`.
+        If there is no current entry and `scan` is True, then open the font
+        file. Answers None if `fontPath` is not a valid font."""
+        if self.isCurrent(fontPath):
+            entry = self.entries[fontPath]
+        elif scan:
+            entry = self.scan(fontPath)
+        else:
+            entry = None
+        if entry is None or not entry.get('valid'):
+            return None
+        return entry
+
+    def isInvalid(self, fontPath):
+        """Answers True if there is a current entry for `fontPath` that is not
+        a valid font. Unknown or changed files answer False, without opening
+        them.
+
+        >>> import tempfile
+        >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+        >>> folder = tempfile.mkdtemp()
+        >>> badPath = folder + '/Bad.ttf'
+        >>> with open(badPath, 'w') as f:
+        ...     _ = f.write('Not a font')
+        >>> fontPath = getTestFontsPath() + '/djr/bungee/Bungee-Regular.ttf'
+        >>> catalog = FontCatalog(folder + '/fontcatalog.json')
+        >>> catalog.isInvalid(badPath), catalog.isInvalid(fontPath)
+        (False, False)
+        >>> catalog.update([badPath, fontPath])
+        2
+        >>> catalog.isInvalid(badPath), catalog.isInvalid(fontPath)
+        (True, False)
+        """
+        return self.isCurrent(fontPath) and not self.entries[fontPath].get('valid')
+
+    def hasUnicodes(self, fontPath, unicodes):
+        """Answers if the font of `fontPath` has all `unicodes` in its cmap.
+        The `unicodes` can be a string or a list of code points."""
+        entry = self.getEntry(fontPath)
+        if entry is None:
+            return False
+        ranges = entry['cmap']
+        for u in unicodes:
+            if isinstance(u, str):
+                u = ord(u)
+            for first, last in ranges:
+                if first <= u <= last:
+                    break
+            else:
+                return False
+        return True
+
+    def getFamilyPaths(self, fontPaths, useFontInfo=True, useFileName=True):
+        """Answers the dictionary {familyName: [fontPath, ...]} of `fontPaths`,
+        as getFamilyPaths() constructs it, without opening the font files of
+        current entries."""
+        familyPaths = {}
+        for fontPath in fontPaths:
+            familyName = None
+            if useFontInfo:
+                entry = self.getEntry(fontPath)
+                if entry is not None:
+                    familyName = entry['familyName']
+            if not familyName and useFileName:
+                familyName = path2FamilyName(fontPath)
+            if familyName is not None:
+                if familyName not in familyPaths:
+                    familyPaths[familyName] = []
+                familyPaths[familyName].append(fontPath)
+        return familyPaths
+
+def getFontCatalog():
+    """Answers the shared FontCatalog instance, read from the PageBot cache
+    folder.
+
+    >>> getFontCatalog() is getFontCatalog()
+    True
+    """
+    global FONT_CATALOG
+    with FONT_CATALOG_LOCK:
+        if FONT_CATALOG is None:
+            FONT_CATALOG = FontCatalog()
+    return FONT_CATALOG
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     instancecache.py
+#
+#     Content addressed cache of the variable font instances that
+#     makeInstance() generates. The key is the hash of the source font file,
+#     the normalized location and the instancing options, so equivalent
+#     locations share one instance file and instances of a changed source font
+#     are never used again. Instance files are stored in the PageBot cache
+#     folder as instances/<key>/<instanceName>.ttf, the least recently used
+#     are removed if the folder exceeds INSTANCE_CACHE_MAX_BYTES. On top of
+#     that, the Font objects of recently used instances are kept in memory.
+#
+import os
+import shutil
+import hashlib
+import tempfile
+from collections import OrderedDict
+from threading import RLock
+
+from fontTools.ttLib import TTFont, TTLibError
+
+from pagebot.filepaths import getCachePath
+
+# Changes if the instances that makeInstance() generates are different.
+INSTANCE_CACHE_VERSION = 1
+INSTANCE_CACHE_FOLDER = 'instances'
+INSTANCE_CACHE_MAX_BYTES = 512 * 1024 * 1024 # Size of the instance files.
+# Key is (cacheKey, lazy), value is Font. Ordered from least to most recently
+# used.
+INSTANCE_FONT_CACHE = OrderedDict()
+INSTANCE_FONT_CACHE_SIZE = 32
+INSTANCE_CACHE_LOCK = RLock()
+# Key is source font path, value is ((mtime, size), hash of the file content).
+SOURCE_HASHES = {}
+
+def getSourceHash(path):
+    """Answers the hex SHA-1 hash of the content of the font file at `path`.
+    The hash is only calculated again if the modification time or size of the
+    file changed.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> path = getTestFontsPath() + '/fontbureau/RobotoDelta-VF.ttf'
+    >>> len(getSourceHash(path)), getSourceHash(path) == getSourceHash(path)
+    (40, True)
+    """
+    stat = os.stat(path)
+    fileStat = stat.st_mtime, stat.st_size
+    entry = SOURCE_HASHES.get(path)
+    if entry is not None and entry[0] == fileStat:
+        return entry[1]
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    sourceHash = h.hexdigest()
+    SOURCE_HASHES[path] = fileStat, sourceHash
+    return sourceHash
+
+def getFontAxes(path):
+    """Answers the dictionary with (minValue, defaultValue, maxValue) by axis
+    tag, as read from the fvar table of the font at `path`. Answers None if
+    the font cannot be read or has no fvar table.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> axes = getFontAxes(getTestFontsPath() + '/fontbureau/RobotoDelta-VF.ttf')
+    >>> axes['wght']
+    (100.0, 400.0, 900.0)
+    >>> getFontAxes(getTestFontsPath() + '/djr/bungee/Bungee-Regular.ttf') is None
+    True
+    """
+    try:
+        ttFont = TTFont(path, lazy=True)
+    except (TTLibError, OSError):
+        return None
+    try:
+        if 'fvar' not in ttFont:
+            return None
+        return {a.axisTag: (a.minValue, a.defaultValue, a.maxValue) for a in ttFont['fvar'].axes}
+    finally:
+        ttFont.close()
+
+def normalizeInstanceLocation(location, axes):
+    """Answers the location as sorted tuple of (tag, value), without the axes
+    that are not in `axes` and without the axes at their default value.
+    Values are rounded to 4 decimals, integral values are answered as int.
+    The `axes` dictionary has (minValue, defaultValue, maxValue) by tag. If
+    `axes` is None (unknown), then all tags are kept.
+
+    >>> axes = dict(wght=(100, 400, 900), wdth=(75, 100, 125))
+    >>> normalizeInstanceLocation({'wght': 400.0, 'wdth': 80, 'XXXX': 1}, axes)
+    (('wdth', 80),)
+    >>> normalizeInstanceLocation({'wght': 500.0}, axes) == normalizeInstanceLocation({'wght': 500}, axes)
+    True
+    >>> normalizeInstanceLocation({'wdth': 87.500001}, axes)
+    (('wdth', 87.5),)
+    >>> normalizeInstanceLocation({'wght': 400.0, 'wdth': 80}, None)
+    (('wdth', 80), ('wght', 400))
+    """
+    items = []
+    for tag, value in sorted((location or {}).items()):
+        if value is None or (axes is not None and tag not in axes):
+            continue
+        value = round(float(value), 4)
+        if axes is not None and value == axes[tag][1]:
+            continue
+        if value == int(value):
+            value = int(value)
+        items.append((tag, value))
+    return tuple(items)
+
+def getInstanceName(location):
+    """Answers the name of the instance at the normalized `location`, to be
+    added to the file name and the style name of the instance.
+
+    >>> getInstanceName((('opsz', 8), ('wght', 512.5)))
+    '-opsz8-wght512.5'
+    """
+    return ''.join('-%s%s' % (tag, value) for tag, value in location)
+
+def getInstanceCacheKey(sourceHash, location, options=None):
+    """Answers the cache key of the instance of the source font with
+    `sourceHash`, at normalized `location`, with the instancing `options`
+    dictionary. The values of the options must have a stable repr().
+
+    >>> key = getInstanceCacheKey('abc', (('wght', 500),))
+    >>> len(key), key == getInstanceCacheKey('abc', (('wght', 500),), {})
+    (40, True)
+    >>> key == getInstanceCacheKey('abd', (('wght', 500),))
+    False
+    >>> key == getInstanceCacheKey('abc', (('wght', 600),)) # Same axes, other values.
+    False
+    """
+    options = tuple(sorted((options or {}).items()))
+    data = repr((INSTANCE_CACHE_VERSION, sourceHash, tuple(location), options))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def getInstanceCachePath():
+    """Answers the path of the folder with the cached instance files. If the
+    PageBot cache folder cannot be created, a folder in the temporary
+    directory is used instead.
+
+    >>> cachePath = os.environ.get('PAGEBOT_CACHE')
+    >>> os.environ['PAGEBOT_CACHE'] = '/proc/nope/pagebot' # Not writable.
+    >>> getInstanceCachePath().startswith(tempfile.gettempdir())
+    True
+    >>> _ = os.environ.pop('PAGEBOT_CACHE') if cachePath is None else os.environ.update(PAGEBOT_CACHE=cachePath)
+    """
+    cachePath = getCachePath()
+    if cachePath is None:
+        cachePath = tempfile.gettempdir() + '/pagebot'
+    return cachePath + '/' + INSTANCE_CACHE_FOLDER
+
+def getInstanceFilePath(key, fileName, folder=None):
+    """Answers the path of the instance file for `key`."""
+    return '%s/%s/%s' % (folder or getInstanceCachePath(), key, fileName)
+
+def getCachedInstancePath(key, folder=None):
+    """Answers the path of the cached instance file for `key` and marks it as
+    most recently used. Answers None if it does not exist."""
+    entryPath = '%s/%s' % (folder or getInstanceCachePath(), key)
+    try:
+        fileNames = os.listdir(entryPath)
+    except OSError:
+        return None
+    for fileName in fileNames:
+        if fileName.endswith('.ttf'):
+            try:
+                os.utime(entryPath)
+            except OSError:
+                pass
+            return entryPath + '/' + fileName
+    return None
+
+def pruneInstanceCache(maxSize=None, folder=None, keep=None):
+    """Removes the least recently used instance files until the total size of
+    the folder is smaller than `maxSize` bytes, default is
+    INSTANCE_CACHE_MAX_BYTES. The entry of key `keep` is never removed.
+    Answers the number of removed instances.
+
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> for key in ('a', 'b', 'c'):
+    ...     os.makedirs(folder + '/' + key)
+    ...     with open(getInstanceFilePath(key, 'Font.ttf', folder), 'wb') as f:
+    ...         _ = f.write(b'x' * 100)
+    ...     os.utime(folder + '/' + key, (ord(key), ord(key)))
+    >>> pruneInstanceCache(250, folder, keep='a'), sorted(os.listdir(folder))
+    (1, ['a', 'c'])
+    >>> pruneInstanceCache(0, folder), os.listdir(folder)
+    (2, [])
+    """
+    if maxSize is None:
+        maxSize = INSTANCE_CACHE_MAX_BYTES
+    folder = folder or getInstanceCachePath()
+    entries = []
+    totalSize = 0
+    try:
+        keys = os.listdir(folder)
+    except OSError:
+        return 0
+    for key in keys:
+        entryPath = folder + '/' + key
+        try:
+            size = sum(os.path.getsize(entryPath + '/' + fileName) for fileName in os.listdir(entryPath))
+            entries.append((os.path.getmtime(entryPath), key, size))
+        except OSError:
+            continue
+        totalSize += size
+    removed = 0
+    for _, key, size in sorted(entries):
+        if totalSize <= maxSize:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(folder + '/' + key, ignore_errors=True)
+        with INSTANCE_CACHE_LOCK:
+            for fontKey in [fontKey for fontKey in INSTANCE_FONT_CACHE if fontKey[0] == key]:
+                del INSTANCE_FONT_CACHE[fontKey]
+        totalSize -= size
+        removed += 1
+    return removed
+
+def getCachedInstanceFont(key, lazy=True):
+    """Answers the Font of the instance with `key` from memory and marks it as
+    most recently used. Answers None if it is not cached or if its file was
+    removed."""
+    with INSTANCE_CACHE_LOCK:
+        font = INSTANCE_FONT_CACHE.get((key, lazy))
+        if font is None:
+            return None
+        if not os.path.exists(font.path):
+            del INSTANCE_FONT_CACHE[(key, lazy)]
+            return None
+        INSTANCE_FONT_CACHE.move_to_end((key, lazy))
+        return font
+
+def cacheInstanceFont(key, font, lazy=True):
+    """Stores the Font of the instance with `key` in memory, removing the
+    least recently used instances if the cache is full."""
+    with INSTANCE_CACHE_LOCK:
+        if INSTANCE_FONT_CACHE_SIZE <= 0:
+            return
+        INSTANCE_FONT_CACHE[(key, lazy)] = font
+        INSTANCE_FONT_CACHE.move_to_end((key, lazy))
+        while len(INSTANCE_FONT_CACHE) > INSTANCE_FONT_CACHE_SIZE:
+            INSTANCE_FONT_CACHE.popitem(last=False)
+
+def clearInstanceCache(files=False, folder=None):
+    """Removes all instance Font objects from memory. If `files` is True, then
+    remove all instance files too."""
+    with INSTANCE_CACHE_LOCK:
+        INSTANCE_FONT_CACHE.clear()
+    if files:
+        pruneInstanceCache(0, folder)
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
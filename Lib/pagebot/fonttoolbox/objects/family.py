@@ -18,8 +18,8 @@
 #
 import os
 from pagebot.fonttoolbox.fontpaths import getFontPaths
+from pagebot.fonttoolbox.fontcatalog import getFontCatalog
 from pagebot.fonttoolbox.objects.font import Font, getFont
-from pagebot.toolbox.transformer import path2FamilyName
 
 FAMILY_PATHS = {} # Cached family name --> [fontPath, fontPath, ...]
 FAMILIES = {} # Cached family name --> Family instance
@@ -30,7 +30,9 @@ def getFamilyPaths(useFontInfo=True, useFileName=True, force=False):
     context.
 
     The flag useFontInfo defines if the familyName, styleName) should be taken
-    from the font.info or just guessed from the font file name.
+    from the font.info or just guessed from the font file name. The font info
+    is read from the persistent font catalog, so only new or changed font
+    files are opened.
 
     >>> familyPaths = getFamilyPaths()
     >>> len(familyPaths['Roboto'])
@@ -45,21 +47,12 @@ def getFamilyPaths(useFontInfo=True, useFileName=True, force=False):
 
     # If forced or not initialized yet.
     if not FAMILY_PATHS:
-        for fontPath in getFontPaths().values():
-            familyName = None
-
-            if useFontInfo:
-                font = getFont(fontPath)
-                if font is not None:
-                    familyName = font.info.familyName
-
-            if not familyName and useFileName:
-                familyName = path2FamilyName(fontPath)
-
-            if familyName is not None:
-                if familyName not in FAMILY_PATHS:
-                    FAMILY_PATHS[familyName] = []
-                FAMILY_PATHS[familyName].append(fontPath)
+        fontPaths = list(getFontPaths().values())
+        catalog = getFontCatalog()
+        if useFontInfo:
+            catalog.update(fontPaths) # Only scans new or changed font files.
+        FAMILY_PATHS.update(catalog.getFamilyPaths(fontPaths,
+            useFontInfo=useFontInfo, useFileName=useFileName))
 
     return FAMILY_PATHS
 
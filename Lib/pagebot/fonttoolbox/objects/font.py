@@ -22,6 +22,8 @@
 #     with the PageBot style dictionary, which hold style parameters.
 #
 import os
+from collections import OrderedDict
+from threading import RLock, get_ident
 
 from fontTools.ttLib import TTFont, TTLibError
 from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
@@ -34,10 +36,131 @@ from pagebot.contributions.adobe.kerndump.getKerningPairsFromOTF import OTFKernR
 from pagebot.toolbox.transformer import path2FontName, path2Extension, asFormatted
 from pagebot.fonttoolbox.analyzers.fontanalyzer import FontAnalyzer
 from pagebot.fonttoolbox.fontpaths import getFontPaths
+from pagebot.fonttoolbox.fontcatalog import getFontCatalog
+from pagebot.fonttoolbox.varinstancer import (hasNumPy, getVariableFontArrays,
+    getInstanceGlyphNames, getAdvanceWidths, instantiateMetrics, setGlyphCoordinates,
+    getGlyphCoordinatesAndControls)
+from pagebot.fonttoolbox.instancecache import (getSourceHash, getFontAxes, normalizeInstanceLocation,
+    getInstanceName, getInstanceCacheKey, getInstanceFilePath, getCachedInstancePath,
+    getCachedInstanceFont, cacheInstanceFont, pruneInstanceCache)
 from pagebot.fonttoolbox.objects.glyph import Glyph
 from pagebot.fonttoolbox.objects.fontinfo import FontInfo
 from pagebot.toolbox.units import RelativeUnit, Unit, upt, isUnit
 
+# Process-wide cache of Font instances answered by getFont() and findFont().
+# Key is (path, lazy, location), value is (Font, fileStat). Ordered from least
+# to most recently used.
+FONT_CACHE = OrderedDict()
+FONT_CACHE_SIZE = 64 # Maximum number of cached Font instances, 0 disables.
+FONT_CACHE_STATS = dict(hits=0, misses=0, evictions=0)
+FONT_CACHE_LOCK = RLock()
+
+def getFontCacheKey(path, lazy=True, location=None):
+    """Answers the key of the Font cache for `path`, `lazy` and `location`.
+
+    >>> getFontCacheKey('/fonts/Roboto-Regular.ttf', location=dict(wght=700, opsz=12))
+    ('/fonts/Roboto-Regular.ttf', True, (('opsz', 12), ('wght', 700)))
+    """
+    if location:
+        location = tuple(sorted(location.items()))
+    else:
+        location = None
+    return path, lazy, location
+
+def _getFileStat(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+    except (OSError, TypeError, ValueError):
+        return None
+
+def _getCachedFont(key):
+    """Answers the cached Font instance for `key` and marks it as most
+    recently used. Answers None if it is not cached or if the font file
+    changed since it was read."""
+    with FONT_CACHE_LOCK:
+        entry = FONT_CACHE.get(key)
+        if entry is None:
+            return None
+        font, fileStat = entry
+        if fileStat != _getFileStat(key[0]):
+            del FONT_CACHE[key] # File changed or disappeared, read it again.
+            return None
+        FONT_CACHE.move_to_end(key)
+        FONT_CACHE_STATS['hits'] += 1
+        return font
+
+def _cacheFont(key, font):
+    """Stores the `font` in the cache, removing the least recently used
+    fonts if the cache is full."""
+    with FONT_CACHE_LOCK:
+        if FONT_CACHE_SIZE <= 0:
+            return
+        FONT_CACHE[key] = font, _getFileStat(key[0])
+        FONT_CACHE.move_to_end(key)
+        while len(FONT_CACHE) > FONT_CACHE_SIZE:
+            FONT_CACHE.popitem(last=False)
+            FONT_CACHE_STATS['evictions'] += 1
+
+def clearFontCache():
+    """Removes all Font instances from the cache and resets the statistics.
+    Fonts answered before stay valid, but next calls to getFont() will read
+    the font files again.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> path = getTestFontsPath() + '/google/roboto/Roboto-Black.ttf'
+    >>> font = getFont(path)
+    >>> clearFontCache()
+    >>> getFontCacheStats()['size']
+    0
+    >>> getFont(path) is font
+    False
+    """
+    with FONT_CACHE_LOCK:
+        FONT_CACHE.clear()
+        for name in FONT_CACHE_STATS:
+            FONT_CACHE_STATS[name] = 0
+
+def setFontCacheSize(size):
+    """Sets the maximum number of Font instances in the cache. Least recently
+    used fonts are removed if the cache is larger. Size 0 disables caching.
+    Answers the previous size.
+
+    >>> previous = setFontCacheSize(1)
+    >>> f1 = findFont('Roboto-Regular')
+    >>> f2 = findFont('Roboto-Bold')
+    >>> getFontCacheStats()['size']
+    1
+    >>> setFontCacheSize(previous)
+    1
+    """
+    global FONT_CACHE_SIZE
+    with FONT_CACHE_LOCK:
+        previous = FONT_CACHE_SIZE
+        FONT_CACHE_SIZE = max(0, size)
+        while len(FONT_CACHE) > FONT_CACHE_SIZE:
+            FONT_CACHE.popitem(last=False)
+            FONT_CACHE_STATS['evictions'] += 1
+    return previous
+
+def getFontCacheStats():
+    """Answers a dictionary with the number of cache hits, misses and
+    evictions, and the current and maximum size of the Font cache.
+
+    >>> clearFontCache()
+    >>> f = findFont('Roboto-Regular')
+    >>> f is findFont('Roboto-Regular')
+    True
+    >>> stats = getFontCacheStats()
+    >>> stats['hits'], stats['misses'], stats['size']
+    (1, 1, 1)
+    """
+    with FONT_CACHE_LOCK:
+        stats = dict(FONT_CACHE_STATS)
+        stats['size'] = len(FONT_CACHE)
+        stats['maxSize'] = FONT_CACHE_SIZE
+    return stats
+
 def asFontPath(fontPath):
     """Answers if the path is a font path. Check if there is a matching
     problem by lower case/upper case. If matching then answer the real path.
@@ -82,10 +205,12 @@ def asFontPath(fontPath):
         pass
     return None
 
-def getFont(fontOrPath, lazy=True):
-    """Answers the Font instance, that connects to the fontPath. Note that
-    there is no check if there is already anothe Font created on that path,
-    as for PageBot purposes it is most likely for reading only.
+def getFont(fontOrPath, lazy=True, location=None):
+    """Answers the Font instance, that connects to the fontPath. Fonts are
+    cached by (path, lazy, location), so the same instance is answered for
+    the same font file, with its parsed tables and glyphs. As for PageBot
+    purposes fonts are most likely for reading only. The cached font is read
+    again if the file changed. Use clearFontCache() to release the fonts.
 
     >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
     >>> fontPath = getTestFontsPath()
@@ -97,23 +222,44 @@ def getFont(fontOrPath, lazy=True):
     >>> # Answer the same font, if it is already one.
     >>> font == getFont(font)
     True
+    >>> font is getFont(path) # Answered from the cache
+    True
+    >>> font is getFont(path, lazy=False)
+    False
     """
     if isinstance(fontOrPath, Font):
         return fontOrPath
 
-    fontOrPath = asFontPath(fontOrPath) # Find the real path, case corrected.
-    if not fontOrPath:
-        return None
+    if isinstance(fontOrPath, str):
+        key = getFontCacheKey(fontOrPath, lazy, location)
+        font = _getCachedFont(key)
+        if font is not None:
+            return font
 
-    try:
-        return Font(fontOrPath, lazy=lazy)
-    except TTLibError:
-        # Could not open font, due to bad font file.
+    path = asFontPath(fontOrPath) # Find the real path, case corrected.
+    if not path:
         return None
 
+    pathKey = getFontCacheKey(path, lazy, location)
+    font = _getCachedFont(pathKey)
+    if font is None:
+        try:
+            font = Font(path, lazy=lazy, location=location)
+        except TTLibError:
+            # Could not open font, due to bad font file.
+            return None
+        with FONT_CACHE_LOCK:
+            FONT_CACHE_STATS['misses'] += 1
+        _cacheFont(pathKey, font)
+
+    if path != fontOrPath: # Also keep the font under the requested path.
+        _cacheFont(key, font)
+    return font
+
 def findFonts(pattern, lazy=True):
     """Answers a list of Font instances where the pattern fits the font path.
-    If pattern is a list, all parts should have a match.
+    If pattern is a list, all parts should have a match. Files that the font
+    catalog knows as invalid fonts are skipped without opening them.
 
 
     # TODO: make case insensitive
@@ -129,6 +275,7 @@ def findFonts(pattern, lazy=True):
     [<Font RobotoCondensed-BoldItalic>]
     """
     fontPaths = getFontPaths()
+    catalog = getFontCatalog()
     fonts = []
 
     if not isinstance(pattern, (list, tuple)):
@@ -140,8 +287,12 @@ def findFonts(pattern, lazy=True):
              if not match in fontPath:
                 found = False
                 break
-        if found:
-            fonts.append(findFont(fontPath, lazy=lazy))
+        # Only skip files known to be invalid, others are opened once by
+        # findFont(), instead of scanning them for the catalog too.
+        if found and not catalog.isInvalid(fontPaths[fontPath]):
+            font = findFont(fontPath, lazy=lazy)
+            if font is not None:
+                fonts.append(font)
     return fonts
 
 def findFont(fontPath, default=None, lazy=True):
@@ -172,7 +323,7 @@ def findFont(fontPath, default=None, lazy=True):
         if font is not None:
             return font
 
-    font = getFont(fontPath)
+    font = getFont(fontPath, lazy=lazy)
     if font is not None:
         return font
 
@@ -332,8 +483,7 @@ def getInstance2(vf, location=None, dstPath=None, name=None,
     instanceFileName = '.'.join(vf.path.split('/')[-1].split('.')[:-1]) + instanceName + '.ttf'
 
     targetDirectory = getInstancePath()
-    if not os.path.exists(targetDirectory):
-        os.makedirs(targetDirectory)
+    os.makedirs(targetDirectory, exist_ok=True)
     path = targetDirectory + instanceFileName
 
     if cached and os.path.exists(path):
@@ -398,12 +548,16 @@ def getInstance(pathOrFont, location, dstPath=None, styleName=None,
     return instance
 
 def makeInstance(pathOrVarFont, location, dstPath=None, normalize=True, cached=True,
-        lazy=True, kerning=None):
+        lazy=True, kerning=None, vectorized=None):
     """Instantiate an instance of a variable font at the specified location.
 
     Keyword arguments:
     - varfilename -- a variable font file path
     - location -- a dictionary of axis tag and value {"wght": 0.75, "wdth": -0.5}
+    - dstPath -- optional path of the instance file. Default None stores the
+      instance in the content addressed instance cache, see instancecache.py.
+    - vectorized -- calculate the glyph coordinates with NumPy arrays, see
+      varinstancer.py. Default None uses NumPy if it is installed.
 
     >>> vf = findFont('RobotoDelta-VF')
     >>> print(vf)
@@ -417,32 +571,64 @@ def makeInstance(pathOrVarFont, location, dstPath=None, normalize=True, cached=T
     True
     >>> len(instance['H'].points)
     12
+    >>> makeInstance(vf, dict(wght=500.0)) is makeInstance(vf.path, dict(wght=500, wdth=100))
+    True
+    >>> makeInstance(vf, dict(wght=500)).path == makeInstance(vf, dict(wght=600)).path
+    False
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> instance = makeInstance(vf.path, dict(wght=300), dstPath=folder + '/Instance.ttf', cached=False)
+    >>> os.listdir(folder) # Written at once, without temporary file left.
+    ['Instance.ttf']
     """
-    # make a custom file name from the location e.g.
-    # VariableFont-wghtXXX-wdthXXX.ttf
-    instanceName = ""
-
     if isinstance(pathOrVarFont, Font):
         pathOrVarFont = pathOrVarFont.path
 
+    cacheKey = None
+    if dstPath is None:
+        # Content addressed instance, see instancecache.py. Equivalent
+        # locations answer the same instance, e.g. {'wght': 400.0} and
+        # {'wght': 400}, and axes at their default value are ignored. The
+        # axes come from the font catalog, without opening the font. If the
+        # catalog does not know them, then from the fvar table of the font.
+        # If these are unknown too, then all tags are part of the key.
+        entry = getFontCatalog().getEntry(pathOrVarFont)
+        axes = (entry or {}).get('axes') or getFontAxes(pathOrVarFont)
+        location = normalizeInstanceLocation(location, axes)
+        # Make a custom file name from the location e.g.
+        # VariableFont-wghtXXX-wdthXXX.ttf
+        instanceName = getInstanceName(location)
+        options = {}
+        if kerning:
+            options['kerning'] = tuple(sorted(kerning.items()))
+        cacheKey = getInstanceCacheKey(getSourceHash(pathOrVarFont), location, options)
+        location = dict(location)
+        if cached:
+            instance = getCachedInstanceFont(cacheKey, lazy)
+            if instance is None:
+                instancePath = getCachedInstancePath(cacheKey)
+                if instancePath is not None:
+                    instance = Font(instancePath, lazy=lazy)
+                    cacheInstanceFont(cacheKey, instance, lazy)
+            if instance is not None:
+                return instance
+        fileName = '.'.join(pathOrVarFont.split('/')[-1].split('.')[:-1]) + instanceName + '.ttf'
+        dstPath = getInstanceFilePath(cacheKey, fileName)
+        # Other processes may make the same instance at the same time.
+        os.makedirs(os.path.dirname(dstPath), exist_ok=True)
+    else:
+        # make a custom file name from the location e.g.
+        # VariableFont-wghtXXX-wdthXXX.ttf
+        instanceName = ""
+        for k, v in sorted(location.items()):
+            # TODO better way to normalize the location name to (0, 1000)
+            v = min(v, 1000)
+            v = max(v, 0)
+            instanceName += "-%s%s" % (k, v)
+
     varFont = Font(pathOrVarFont, lazy=lazy)
     ttFont = varFont.ttFont
 
-    for k, v in sorted(location.items()):
-        # TODO better way to normalize the location name to (0, 1000)
-        v = min(v, 1000)
-        v = max(v, 0)
-        instanceName += "-%s%s" % (k, v)
-
-    if dstPath is None:
-        targetFileName = '.'.join(varFont.path.split('/')[-1].split('.')[:-1]) + instanceName + '.ttf'
-        targetDirectory = getInstancePath()
-        if not targetDirectory.endswith('/'):
-            targetDirectory += '/'
-        if not os.path.exists(targetDirectory):
-            os.makedirs(targetDirectory)
-        dstPath = targetDirectory + targetFileName
-
     # Instance does not exist as file. Create it.
     if not cached or not os.path.exists(dstPath):
         # Set the instance name IDs in the name table
@@ -476,35 +662,37 @@ def makeInstance(pathOrVarFont, location, dstPath=None, normalize=True, cached=T
         loc = normalizeLocation(location, axes)
         # Location is normalized now.
 
-        gvar = ttFont['gvar']
-        glyf = ttFont['glyf']
-
-        # get list of glyph names in gvar sorted by component depth.
-        glyphNames = sorted(
-            gvar.variations.keys(),
-            key=lambda name: (
-                glyf[name].getCompositeMaxpValues(glyf).maxComponentDepth
-                if glyf[name].isComposite() else 0,
-                name))
-
-        for glyphName in glyphNames:
-            variations = gvar.variations[glyphName]
-            coordinates, _ = glyf.getCoordinatesAndControls(glyphName, ttFont)
-            origCoords, endPts = None, None
-
-            for var in variations:
-                scalar = supportScalar(loc, var.axes)#, ot=True)
-                if not scalar:
-                    continue
-                delta = var.coordinates
-                if None in delta:
-                    if origCoords is None:
-                        origCoords, control = glyf.getCoordinatesAndControls(glyphName, ttFont)
-                        endPts = control[1] if control[0] >= 1 else list(range(len(control[1])))
-                    delta = iup_delta(delta, origCoords, endPts)
-                coordinates += GlyphCoordinates(delta) * scalar
-
-            glyf.setCoordinates(glyphName, coordinates, ttFont)
+        if vectorized is None:
+            vectorized = hasNumPy()
+        defaultAdvances = getAdvanceWidths(ttFont)
+
+        if vectorized:
+            getVariableFontArrays(ttFont, varFont.path).instantiate(ttFont, loc)
+        else:
+            gvar = ttFont['gvar']
+            glyf = ttFont['glyf']
+
+            for glyphName in getInstanceGlyphNames(ttFont):
+                variations = gvar.variations[glyphName]
+                coordinates, _ = getGlyphCoordinatesAndControls(glyf, glyphName, ttFont)
+                origCoords, endPts = None, None
+
+                for var in variations:
+                    scalar = supportScalar(loc, var.axes)#, ot=True)
+                    if not scalar:
+                        continue
+                    delta = var.coordinates
+                    if None in delta:
+                        if origCoords is None:
+                            origCoords, control = getGlyphCoordinatesAndControls(glyf, glyphName, ttFont)
+                            endPts = control[1] if control[0] >= 1 else list(range(len(control[1])))
+                        delta = iup_delta(delta, origCoords, endPts)
+                    coordinates += GlyphCoordinates(delta) * scalar
+
+                setGlyphCoordinates(glyf, glyphName, coordinates, ttFont)
+
+        # Apply HVAR advance widths and MVAR font metrics.
+        instantiateMetrics(ttFont, loc, defaultAdvances)
 
         # Interpolate cvt.
 
@@ -530,10 +718,22 @@ def makeInstance(pathOrVarFont, location, dstPath=None, normalize=True, cached=T
             for pair, value in kerning.items():
                 varFont.kerning[pair] = value
 
-        varFont.save(dstPath)
+        # Replace at once, so other processes and threads never read a half
+        # written file. The temporary file name is unique for each writer.
+        tmpPath = '%s.%d.%d.tmp' % (dstPath, os.getpid(), get_ident())
+        try:
+            varFont.save(tmpPath)
+            os.replace(tmpPath, dstPath)
+        finally:
+            if os.path.exists(tmpPath): # Failed to save or replace.
+                os.remove(tmpPath)
 
     # Answer instance.
-    return Font(dstPath, lazy=lazy)
+    instance = Font(dstPath, lazy=lazy)
+    if cacheKey is not None:
+        cacheInstanceFont(cacheKey, instance, lazy)
+        pruneInstanceCache(keep=cacheKey)
+    return instance
 
 class Font:
     """Storage of font information while composing the pages.
@@ -719,7 +919,7 @@ class Font:
         """
         if isinstance(weight, (float, int)): # Comparing by numbers
             # Compare the weight as number as max difference to what we already have.
-            w = self.info.weightClass
+            w = self.getInfoValue('weightClass')
             if w in FONT_WEIGHT_MATCHES.get(weight, []):
                 return 1.0 # Exact match
         else: # Comparing by string
@@ -763,7 +963,7 @@ class Font:
         """
         if isinstance(width, (float, int)):
             # Compare the width as number as max difference to what we already have.
-            w = self.info.widthClass
+            w = self.getInfoValue('widthClass')
             if w <= 100: # Normalize to 1000
                 w *= 100
             if w in FONT_WIDTH_MATCHES.get(width, []):
@@ -792,16 +992,41 @@ class Font:
         >>> font.isItalic()
         0
         """
-        if self.info.italicAngle:
+        if self.getInfoValue('italicAngle'):
             return 1
         for altName in FONT_ITALIC_MATCHES:
             if altName in path2FontName(self.path) or altName in self.info.styleName:
                 return 1.0
         return 0
 
+    def getInfoValue(self, name):
+        """Answers the value of self.info.<name>, such as weightClass,
+        widthClass and italicAngle. If the value was not read from the font
+        tables yet, then answer it from the font catalog, if it has a current
+        entry for self.path. That way matching fonts does not need to parse
+        the OS/2 and post tables of all fonts.
+
+        >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+        >>> path = getTestFontsPath() + '/google/roboto/Roboto-Black.ttf'
+        >>> entry = getFontCatalog().getEntry(path)
+        >>> font = Font(path)
+        >>> font.getInfoValue('weightClass'), 'weightClass' in font.info.__dict__
+        (900, False)
+        >>> font.info.weightClass = 800 # Values in self.info have priority.
+        >>> font.getInfoValue('weightClass')
+        800
+        """
+        if name not in self.info.__dict__ and self.location is None:
+            entry = getFontCatalog().getEntry(self.path, scan=False)
+            if entry is not None and entry.get(name) is not None:
+                return entry[name]
+        return getattr(self.info, name)
+
     def match(self, name=None, weight=None, width=None, italic=None):
         """Answers a value between 0 and 1 to the amount that self matches the
-        defined parameters. Only defined values count in the matching.
+        defined parameters. Only defined values count in the matching. Font
+        info values are taken from the font catalog if possible, see
+        self.getInfoValue().
 
         >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
         >>> path = getTestFontsPath() + '/google/roboto/Roboto-Black.ttf'
@@ -125,6 +125,8 @@ class FontInfo:
         >>> font = getFont(path)
         >>> font.info.styleName
         'Black'
+        >>> from pagebot.fonttoolbox.objects.font import Font
+        >>> font = Font(path) # Own instance, getFont() answers a shared one.
         >>> font.info.styleName = 'Bold'
         >>> font.info.styleName
         'Bold'
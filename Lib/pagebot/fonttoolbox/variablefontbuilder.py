@@ -28,7 +28,8 @@ from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
 from fontTools.varLib.models import supportScalar, normalizeLocation
 from fontTools.varLib.mutator import iup_delta
 
-from pagebot.fonttoolbox.objects.font import getFont
+from pagebot.fonttoolbox.objects.font import getFont, makeInstance
+from pagebot.fonttoolbox.varinstancer import VariableAdvances
 from pagebot.toolbox.color import blackColor
 
 DEBUG = False
@@ -59,8 +60,81 @@ def getVariableAxisFonts(varFont, axisName, normalize=True, cached=False,
         return minInstance, maxInstance
     return varFont, varFont
 
+def interpolateLocation(location1, location2, t, axes=None):
+    """Answers the location at `t` between `location1` (t = 0) and `location2`
+    (t = 1). Axes that are only in one of the locations use the default value
+    from `axes` for the other location, if defined.
+
+    >>> interpolateLocation(dict(wdth=50, wght=400), dict(wdth=150), 0.5, dict(wght=(100, 400, 900)))
+    {'wdth': 100.0, 'wght': 400.0}
+    """
+    location = {}
+    for tag in sorted(set(location1) | set(location2)):
+        default = None
+        if axes is not None and tag in axes:
+            default = axes[tag][1]
+        v1 = location1.get(tag, default)
+        v2 = location2.get(tag, default)
+        if v1 is None or v2 is None:
+            location[tag] = v1 if v2 is None else v2
+        else:
+            location[tag] = v1 + (v2 - v1) * t
+    return location
+
+def solveVariableWidth(getWidth, w, tolerance=0.5, maxIterations=20):
+    """Answers the report dictionary of the search for t in (0, 1) where the
+    monotonic function getWidth(t) answers width `w` within `tolerance`. The
+    search is a secant (regula falsi) iteration, that always keeps the
+    solution between two evaluated values, halving the weight of a side that
+    is kept twice (Illinois), so it converges on non-linear widths too. If `w`
+    is outside the range, then the nearest extreme is answered as not
+    converged.
+
+    >>> report = solveVariableWidth(lambda t: 100 + 200 * t * t, 150, tolerance=0.01)
+    >>> round(report['t'], 3), report['converged'], report['evaluations'] < 10
+    (0.5, True, True)
+    >>> report = solveVariableWidth(lambda t: 100 + 200 * t, 400)
+    >>> report['t'], report['width'], report['converged']
+    (1, 300, False)
+    """
+    t0, t1 = 0, 1
+    f0 = getWidth(t0) - w
+    f1 = getWidth(t1) - w
+    report = dict(evaluations=2, iterations=0, converged=False)
+    if abs(f0) <= tolerance or abs(f1) <= tolerance or f0 * f1 > 0:
+        # Solved at one of the extremes, or w is out of range.
+        if abs(f0) <= abs(f1):
+            t, f = t0, f0
+        else:
+            t, f = t1, f1
+        report.update(t=t, width=f + w, error=f, converged=abs(f) <= tolerance)
+        return report
+
+    side = 0
+    t, f = t0, f0
+    for iteration in range(1, maxIterations + 1):
+        t = (t0 * f1 - t1 * f0) / (f1 - f0)
+        f = getWidth(t) - w
+        report['evaluations'] += 1
+        report['iterations'] = iteration
+        if abs(f) <= tolerance or abs(t1 - t0) < 1e-9:
+            break
+        if f * f1 > 0: # Replace the t1 side.
+            t1, f1 = t, f
+            if side == -1:
+                f0 /= 2
+            side = -1
+        else: # Replace the t0 side.
+            t0, f0 = t, f
+            if side == 1:
+                f1 /= 2
+            side = 1
+    report.update(t=t, width=f + w, error=f, converged=abs(f) <= tolerance)
+    return report
+
 def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
-        wideLocation, fixedSize=True, tracking=None, cached=True, lazy=True):
+        wideLocation, fixedSize=True, tracking=None, cached=True, lazy=True,
+        tolerance=0.5, maxIterations=20):
     """Answers the font instance that makes string s width on the given width
     *w* for the given *fontSize*.  The *condensedLocation* dictionary defines
     the most condensed font instance (optionally including the opsz) and the
@@ -71,6 +145,14 @@ def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
     interpolation may not be enough, as the width axis may contain non-linear
     masters.
 
+    All axes in the two locations are interpolated, so e.g. [wght] and [opsz]
+    can change together with [wdth]. The iterations don't make instances. They
+    calculate the string width from the advance widths of the variable font
+    (see varinstancer.VariableAdvances), corrected for kerning and tracking
+    by the measured widths of the two extreme instances. Only the fitting
+    instance is made. The answered "report" tells the number of iterations,
+    if it converged within *tolerance* and the final error.
+
     If the requested w outside of what is possible with two locations, then
     interations are performed to change the size. Again this cannot be done by
     simple interpolation, as the [opsz] also changes the width.  It one of the
@@ -79,6 +161,12 @@ def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
     # TODO: Adjusting by size change (if requested width is not possible with
     # the width limits of the font)
     # TODO: is not yet implemented.
+    style = dict(fontSize=fontSize, textFill=blackColor)
+    if tracking is not None:
+        style['tracking'] = tracking
+
+    def newString(font):
+        return context.newString(s, style=dict(style, font=font.path))
 
     # Get the instances for the extreme width locations. This allows the
     # calling function to define the actual range of the [wdth] axis to be
@@ -89,16 +177,8 @@ def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
     condensedFont = getVarFontInstance(varFont, condensedLocation, cached=cached, lazy=lazy)
     wideFont = getVarFontInstance(varFont, wideLocation, cached=cached, lazy=lazy)
     # Calculate the widths of the string using these two instances.
-    condensedString = context.newString(s,
-                                    style=dict(font=condensedFont.path,
-                                               fontSize=fontSize,
-                                               tracking=tracking,
-                                               textFill=blackColor))
-    wideString = context.newString(s,
-                               style=dict(font=wideFont.path,
-                                          fontSize=fontSize,
-                                          tracking=tracking,
-                                          textFill=blackColor))
+    condensedString = newString(condensedFont)
+    wideString = newString(wideFont)
 
     # Calculate the widths of the strings.
     # TODO: Handle if these lines would wrap on the given width. In that case
@@ -106,6 +186,7 @@ def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
     # to make the first wrapped line fit the width.
     condensedWidth, _ = context.textSize(condensedString)
     wideWidth, _ = context.textSize(wideString)
+    report = dict(evaluations=0, iterations=0, converged=False)
 
     # Check if the requested with is inside the boundaries of the font width axis
     # Requested width is smaller than was was possible using the extreme value
@@ -121,21 +202,27 @@ def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
         bs = wideString
         location = wideLocation
     else:
-        # Inside the selected [wdth] range, now interpolation the fitting location.
-        # TODO: Check if the width of the new string is within tolerance of the
-        # request width.  This may not be the case if the range of the [wdth]
-        # is interpolating in a non-linear way.  In that case we may need to do
-        # a number of iterations.
-        widthRange = wideLocation['wdth'] - condensedLocation['wdth']
-        location = copy.copy(condensedLocation)
-        assert wideWidth != condensedWidth # Avoid division by zero.
-        location['wdth'] += widthRange*(w-condensedWidth)/(wideWidth-condensedWidth)
+        # Inside the selected range, solve the fitting location on the
+        # advance widths of the variable font. The difference with the
+        # measured widths of the extremes (kerning, tracking) is interpolated.
+        advances = VariableAdvances(varFont.ttFont)
+        def getLocation(t):
+            return interpolateLocation(condensedLocation, wideLocation, t, varFont.axes)
+        condensedOffset = condensedWidth - advances.getTextWidth(s, condensedLocation, fontSize)
+        wideOffset = wideWidth - advances.getTextWidth(s, wideLocation, fontSize)
+        def getWidth(t):
+            offset = condensedOffset + (wideOffset - condensedOffset) * t
+            return advances.getTextWidth(s, getLocation(t), fontSize) + offset
+
+        report = solveVariableWidth(getWidth, w, tolerance=tolerance, maxIterations=maxIterations)
+        location = getLocation(report['t'])
         font = getVarFontInstance(varFont, location, cached=cached, lazy=lazy)
-        bs = context.newString(s,
-                               style=dict(font=font.path,
-                                          fontSize=fontSize,
-                                          tracking=tracking,
-                                          textFill=blackColor))
+        bs = newString(font)
+
+    width = bs.textSize[0]
+    report['width'] = width
+    report['error'] = width - w
+    report['converged'] = abs(width - w) <= tolerance
 
     # Answer the dictionary with calculated data, so the calling function can
     # reuse it, without the need to new expensive recalculations.
@@ -149,8 +236,9 @@ def fitVariableWidth(context, varFont, s, w, fontSize, condensedLocation,
                 wideLocation=wideLocation,
                 font=font,
                 bs=bs,
-                width=bs.textSize[0],
-                location=location)
+                width=width,
+                location=location,
+                report=report)
 
 def getConstrainedLocation(font, location):
     """Answers the location with applied min/max values for each axis. Don't
@@ -183,10 +271,9 @@ def getVarFontInstance(fontOrPath, location, styleName=None, normalize=True,
         varFont = fontOrPath
     if varFont is None: # Could not read the Variable Font on that path.
         return None
-    path = generateInstance(varFont.path, location, targetDirectory=getInstancePath(),
-                                      normalize=normalize, cached=cached, lazy=lazy)
+    # Instances are shared through the content addressed instance cache.
+    instance = makeInstance(varFont.path, location, normalize=normalize, cached=cached, lazy=lazy)
     # Answer the generated Variable Font instance. Add [opsz] value if is defined in the location, otherwise None.
-    instance = getFont(path, lazy=lazy)
     instance.info.opticalSize = location.get('opsz')
     instance.info.location = location
     instance.info.varStyleName = styleName
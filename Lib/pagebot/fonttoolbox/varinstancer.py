@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     varinstancer.py
+#
+#     Vectorized instancing of variable fonts, used by makeInstance() if NumPy
+#     is installed. The glyph coordinates and the gvar deltas (with IUP already
+#     applied) of a variable font are read once and kept as NumPy arrays. An
+#     instance then only needs the scalar of each region for the location and
+#     one array product per glyph. The pure Python glyph loop of makeInstance()
+#     is used if NumPy is not available.
+#
+import os
+import time
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from fontTools.misc.fixedTools import otRound
+from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
+from fontTools.varLib.models import supportScalar, normalizeLocation
+from fontTools.varLib.iup import iup_delta
+from fontTools.varLib.varStore import VarStoreInstancer
+from fontTools.varLib.mvar import MVAR_ENTRIES
+
+# Key is (path, mtime, size) of the variable font, value is VariableFontArrays.
+VARIABLE_FONT_ARRAYS = OrderedDict()
+VARIABLE_FONT_ARRAYS_SIZE = 4
+
+def hasNumPy():
+    """Answers if NumPy is available for vectorized instancing."""
+    return numpy is not None
+
+def setGlyphCoordinates(glyf, glyphName, coordinates, ttFont):
+    """Sets the coordinates, including the 4 phantom points, of the glyph.
+    The glyph bounds and horizontal metrics are updated too. Newer fontTools
+    versions renamed glyf.setCoordinates() to glyf._setCoordinates()."""
+    if hasattr(glyf, '_setCoordinates'):
+        vMetrics = getattr(ttFont.get('vmtx'), 'metrics', None)
+        glyf._setCoordinates(glyphName, coordinates, ttFont['hmtx'].metrics, vMetrics)
+    else:
+        glyf.setCoordinates(glyphName, coordinates, ttFont)
+
+def getGlyphCoordinatesAndControls(glyf, glyphName, ttFont):
+    """Answers the (coordinates, controls) tuple of the glyph, including the 4
+    phantom points. Newer fontTools versions renamed
+    glyf.getCoordinatesAndControls() to glyf._getCoordinatesAndControls()."""
+    if hasattr(glyf, '_getCoordinatesAndControls'):
+        vMetrics = getattr(ttFont.get('vmtx'), 'metrics', None)
+        return glyf._getCoordinatesAndControls(glyphName, ttFont['hmtx'].metrics, vMetrics)
+    return glyf.getCoordinatesAndControls(glyphName, ttFont)
+
+def getInstanceGlyphNames(ttFont):
+    """Answers the list of glyph names in gvar, sorted by component depth, so
+    components are set before the composites that use them."""
+    glyf = ttFont['glyf']
+    return sorted(
+        ttFont['gvar'].variations.keys(),
+        key=lambda name: (
+            glyf[name].getCompositeMaxpValues(glyf).maxComponentDepth
+            if glyf[name].isComposite() else 0,
+            name))
+
+def getAdvanceWidths(ttFont):
+    """Answers the dictionary {glyphName: advance width} of the font,
+    to be used as default for HVAR."""
+    return {glyphName: advance for glyphName, (advance, _) in ttFont['hmtx'].metrics.items()}
+
+def instantiateMetrics(ttFont, loc, defaultAdvances=None):
+    """Applies the HVAR advance width deltas and the MVAR font metrics deltas
+    for the normalized location `loc`. The optional `defaultAdvances` are the
+    advance widths before the glyph coordinates were set, as answered by
+    getAdvanceWidths()."""
+    fvarAxes = ttFont['fvar'].axes
+
+    if 'HVAR' in ttFont and defaultAdvances is not None:
+        hvar = ttFont['HVAR'].table
+        instancer = VarStoreInstancer(hvar.VarStore, fvarAxes, loc)
+        advanceMap = None
+        if hvar.AdvWidthMap is not None:
+            advanceMap = hvar.AdvWidthMap.mapping
+        metrics = ttFont['hmtx'].metrics
+        for glyphId, glyphName in enumerate(ttFont.getGlyphOrder()):
+            if glyphName not in metrics or glyphName not in defaultAdvances:
+                continue
+            if advanceMap is None:
+                varIdx = glyphId # Implicit mapping on glyph id.
+            else:
+                varIdx = advanceMap.get(glyphName)
+                if varIdx is None:
+                    continue
+            _, lsb = metrics[glyphName]
+            metrics[glyphName] = max(0, otRound(defaultAdvances[glyphName] + instancer[varIdx])), lsb
+
+    if 'MVAR' in ttFont:
+        mvar = ttFont['MVAR'].table
+        instancer = VarStoreInstancer(mvar.VarStore, fvarAxes, loc)
+        for record in mvar.ValueRecord:
+            if record.ValueTag not in MVAR_ENTRIES:
+                continue
+            tableTag, itemName = MVAR_ENTRIES[record.ValueTag]
+            if tableTag not in ttFont:
+                continue
+            delta = otRound(instancer[record.VarIdx])
+            if delta:
+                table = ttFont[tableTag]
+                setattr(table, itemName, getattr(table, itemName) + delta)
+
+class VariableFontArrays:
+    """Glyph coordinates and gvar deltas of a variable font as NumPy arrays.
+    Deltas of all glyphs refer to one list of unique regions, so the region
+    scalars only need to be calculated once for a location.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> from fontTools.ttLib import TTFont
+    >>> ttFont = TTFont(getTestFontsPath() + '/fontbureau/DecovarAlpha-VF.subset.ttf')
+    >>> arrays = VariableFontArrays(ttFont)
+    >>> arrays
+    <VariableFontArrays glyphs=28 regions=18>
+    >>> bool(arrays.getScalars({}).any()) # Default location
+    False
+    """
+    def __init__(self, ttFont):
+        glyf = ttFont['glyf']
+        gvar = ttFont['gvar']
+        self.regions = [] # List of axes dictionaries of the variations.
+        regionIndices = {}
+        # List of (glyphName, coordinates, region indices, deltas) tuples.
+        self.glyphs = []
+
+        for glyphName in getInstanceGlyphNames(ttFont):
+            coordinates, controls = getGlyphCoordinatesAndControls(glyf, glyphName, ttFont)
+            endPts = None
+            indices = []
+            deltas = []
+            for var in gvar.variations[glyphName]:
+                key = tuple(sorted((tag, tuple(support)) for tag, support in var.axes.items()))
+                if key not in regionIndices:
+                    regionIndices[key] = len(self.regions)
+                    self.regions.append(var.axes)
+                delta = var.coordinates
+                if None in delta:
+                    if endPts is None:
+                        endPts = controls[1] if controls[0] >= 1 else list(range(len(controls[1])))
+                    delta = iup_delta(delta, coordinates, endPts)
+                indices.append(regionIndices[key])
+                deltas.append(delta)
+            points = numpy.array(coordinates, dtype=numpy.float64).reshape(-1, 2)
+            if deltas:
+                deltas = numpy.array(deltas, dtype=numpy.float64).reshape(len(deltas), -1, 2)
+            else:
+                deltas = None
+            self.glyphs.append((glyphName, points, numpy.array(indices, dtype=numpy.intp), deltas))
+
+    def __repr__(self):
+        return '<%s glyphs=%d regions=%d>' % (self.__class__.__name__,
+            len(self.glyphs), len(self.regions))
+
+    def getScalars(self, loc):
+        """Answers the array with the scalar of each region for the normalized
+        location `loc`."""
+        return numpy.array([supportScalar(loc, axes) for axes in self.regions],
+            dtype=numpy.float64)
+
+    def instantiate(self, ttFont, loc):
+        """Sets the glyph coordinates of `ttFont`, which is a copy of the
+        variable font, to the instance at normalized location `loc`."""
+        scalars = self.getScalars(loc)
+        glyf = ttFont['glyf']
+        for glyphName, points, indices, deltas in self.glyphs:
+            if deltas is not None:
+                glyphScalars = scalars[indices]
+                if glyphScalars.any():
+                    points = points + numpy.tensordot(glyphScalars, deltas, axes=1)
+            setGlyphCoordinates(glyf, glyphName, GlyphCoordinates(points.tolist()), ttFont)
+
+class VariableAdvances:
+    """Advance widths of the glyphs of a variable font at any location,
+    without making an instance. The advances are the hmtx default plus the
+    HVAR deltas, or the gvar deltas of the phantom points if there is no HVAR
+    table, rounded the way makeInstance() rounds them.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> from fontTools.ttLib import TTFont
+    >>> ttFont = TTFont(getTestFontsPath() + '/fontbureau/RobotoDelta_v2-VF.ttf')
+    >>> advances = VariableAdvances(ttFont)
+    >>> advances.getGlyphNames('Hi')
+    ['H', 'i']
+    >>> advances.getAdvances(['H', 'i'], {}), advances.getAdvances(['H', 'i'], dict(wdth=75))
+    ([1458, 500], [1302, 492])
+    >>> advances.getTextWidth('Hi', dict(wdth=75), fontSize=20.48) # (1302 + 492) / 100
+    17.94
+    """
+    def __init__(self, ttFont):
+        self.ttFont = ttFont
+        self.axes = {a.axisTag: (a.minValue, a.defaultValue, a.maxValue) for a in ttFont['fvar'].axes}
+        self.unitsPerEm = ttFont['head'].unitsPerEm
+        self.cmap = ttFont.getBestCmap() or {}
+        self.defaultAdvances = getAdvanceWidths(ttFont)
+        self._phantomDeltas = {} # Key is glyph name, value is list of (axes, delta).
+
+    def __repr__(self):
+        return '<%s axes=%s>' % (self.__class__.__name__, ','.join(sorted(self.axes)))
+
+    def getGlyphNames(self, s):
+        """Answers the list of glyph names of the characters in string `s`,
+        using '.notdef' for missing characters."""
+        return [self.cmap.get(ord(c), '.notdef') for c in s]
+
+    def normalizeLocation(self, location):
+        """Answers the normalized location of the design space `location`,
+        ignoring the axes that are not in the font."""
+        return normalizeLocation({tag: value for tag, value in location.items()
+            if tag in self.axes}, self.axes)
+
+    def _getPhantomDeltas(self, glyphName):
+        deltas = self._phantomDeltas.get(glyphName)
+        if deltas is None:
+            deltas = []
+            if 'gvar' in self.ttFont:
+                for var in self.ttFont['gvar'].variations.get(glyphName, ()):
+                    # Phantom points without explicit delta don't move.
+                    left, right = var.coordinates[-4], var.coordinates[-3]
+                    delta = (right[0] if right else 0) - (left[0] if left else 0)
+                    if delta:
+                        deltas.append((var.axes, delta))
+            self._phantomDeltas[glyphName] = deltas
+        return deltas
+
+    def getAdvances(self, glyphNames, location):
+        """Answers the list of advance widths of `glyphNames` at the design
+        space `location`."""
+        loc = self.normalizeLocation(location)
+        advances = []
+        if 'HVAR' in self.ttFont:
+            hvar = self.ttFont['HVAR'].table
+            instancer = VarStoreInstancer(hvar.VarStore, self.ttFont['fvar'].axes, loc)
+            advanceMap = None
+            if hvar.AdvWidthMap is not None:
+                advanceMap = hvar.AdvWidthMap.mapping
+            for glyphName in glyphNames:
+                advance = self.defaultAdvances.get(glyphName, 0)
+                if advanceMap is None:
+                    varIdx = self.ttFont.getGlyphID(glyphName)
+                else:
+                    varIdx = advanceMap.get(glyphName)
+                if varIdx is not None:
+                    advance = max(0, otRound(advance + instancer[varIdx]))
+                advances.append(advance)
+        else:
+            for glyphName in glyphNames:
+                advance = self.defaultAdvances.get(glyphName, 0)
+                for axes, delta in self._getPhantomDeltas(glyphName):
+                    advance += delta * supportScalar(loc, axes)
+                advances.append(max(0, otRound(advance)))
+        return advances
+
+    def getTextWidth(self, s, location, fontSize):
+        """Answers the sum of the advance widths of string `s` at `location`
+        for `fontSize`, without kerning or tracking."""
+        return sum(self.getAdvances(self.getGlyphNames(s), location)) * fontSize / self.unitsPerEm
+
+def getVariableFontArrays(ttFont, path):
+    """Answers the (cached) VariableFontArrays of the variable font at `path`,
+    for which `ttFont` is an unchanged copy. Answers None if NumPy is not
+    available."""
+    if numpy is None:
+        return None
+    try:
+        stat = os.stat(path)
+        key = path, stat.st_mtime, stat.st_size
+    except (OSError, TypeError):
+        return VariableFontArrays(ttFont) # No file, don't cache.
+    arrays = VARIABLE_FONT_ARRAYS.get(key)
+    if arrays is None:
+        arrays = VARIABLE_FONT_ARRAYS[key] = VariableFontArrays(ttFont)
+        while len(VARIABLE_FONT_ARRAYS) > VARIABLE_FONT_ARRAYS_SIZE:
+            VARIABLE_FONT_ARRAYS.popitem(last=False)
+    else:
+        VARIABLE_FONT_ARRAYS.move_to_end(key)
+    return arrays
+
+def benchmarkMakeInstance(fontPaths=None, steps=10, dstPath=None, verbose=False):
+    """Makes `steps` instances along the first axis of each variable font,
+    with the pure Python and the vectorized glyph loop of makeInstance().
+    Answers the list of (fontName, steps, pythonSeconds, numpySeconds,
+    differentGlyphs) tuples, where differentGlyphs counts the glyphs with
+    different coordinates in the two instances. Default fonts are the test
+    variable fonts.
+
+    >>> from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    >>> path = getTestFontsPath() + '/fontbureau/DecovarAlpha-VF.subset.ttf'
+    >>> (fontName, steps, _, _, differentGlyphs), = benchmarkMakeInstance([path], steps=2)
+    >>> fontName, steps, differentGlyphs
+    ('DecovarAlpha-VF.subset', 2, 0)
+    """
+    from fontTools.ttLib import TTFont
+    from pagebot.fonttoolbox.fontpaths import getTestFontsPath
+    from pagebot.fonttoolbox.objects.font import makeInstance
+
+    if fontPaths is None:
+        folder = getTestFontsPath() + '/fontbureau'
+        fontPaths = [folder + '/' + fileName for fileName in sorted(os.listdir(folder))
+            if fileName.endswith('.ttf')]
+    if dstPath is None:
+        dstPath = '/tmp/PageBot-benchmarkMakeInstance.ttf'
+
+    results = []
+    for fontPath in fontPaths:
+        ttFont = TTFont(fontPath, lazy=True)
+        axis = ttFont['fvar'].axes[0]
+        ttFont.close()
+        fontName = os.path.basename(fontPath).rsplit('.', 1)[0]
+        times = {}
+        coordinates = {}
+        for vectorized in (False, True):
+            VARIABLE_FONT_ARRAYS.clear() # Include preparation of the arrays.
+            t = time.time()
+            instanceCoordinates = []
+            for step in range(steps):
+                value = axis.minValue + (axis.maxValue - axis.minValue) * step / max(1, steps - 1)
+                makeInstance(fontPath, {axis.axisTag: value}, dstPath=dstPath, cached=False,
+                    normalize=True, vectorized=vectorized)
+                instance = TTFont(dstPath)
+                glyf = instance['glyf']
+                instanceCoordinates.append([list(getattr(glyf[glyphName], 'coordinates', ()))
+                    for glyphName in instance.getGlyphOrder()])
+            times[vectorized] = time.time() - t
+            coordinates[vectorized] = instanceCoordinates
+
+        differentGlyphs = 0
+        for glyphs1, glyphs2 in zip(coordinates[False], coordinates[True]):
+            for c1, c2 in zip(glyphs1, glyphs2):
+                if c1 != c2:
+                    differentGlyphs += 1
+        result = fontName, steps, times[False], times[True], differentGlyphs
+        if verbose:
+            print('%s: %d instances, Python %0.2fs, NumPy %0.2fs, %d different glyphs' % result)
+        results.append(result)
+    return results
+
+if __name__ == "__main__":
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
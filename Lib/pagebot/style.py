@@ -19,17 +19,201 @@
 #     used local in an element or string.
 #
 
+import copy
+
 from pagebot.constants import (DISPLAY_INLINE, DEFAULT_LANGUAGE, BASELINE,
         DEFAULT_LEADING, DEFAULT_FRAME_DURATION, LEFT, TOP, BOTTOM, FRONT,
         DEFAULT_FALLBACK_FONT_PATH, DEFAULT_FONT_SIZE, DEFAULT_MARKER_FONT,
         DEFAULT_RESOLUTION_FACTORS, DEFAULT_MININFOPADDING,
         DEFAULT_BASELINE_COLOR, DEFAULT_BASELINE_WIDTH)
 from pagebot.fonttoolbox.fontpaths import getDefaultFontPath
-from pagebot.toolbox.units import pt, em, units, BASELINE_GRID, U, degrees
+from pagebot.fonttoolbox.objects.font import Font
+from pagebot.toolbox.units import pt, em, units, BASELINE_GRID, U, degrees, Unit
 from pagebot.toolbox.color import color, noColor, blackColor
 
 DEFAULTS = ['leading', 'fontSize', 'font']
 
+# Generation counters for cached cascading style lookups, such as
+# Element.css(). Every change to a key in a Style dictionary increments the
+# counter of that key. Changes in the structure of the tree (parents, styles
+# replaced as a whole, document styles) increment the STYLE_TREE counter. A
+# cached value is valid as long as both counters did not change.
+STYLE_TREE = None
+STYLE_GENERATIONS = {STYLE_TREE: 0}
+
+def touchStyle(name=STYLE_TREE):
+    """Invalidates cached style lookups for the key *name*. If *name* is
+    omitted, then all cached style lookups are invalidated.
+
+    >>> generation = getStyleGeneration('fontSize')
+    >>> touchStyle('fontSize')
+    >>> getStyleGeneration('fontSize') == generation + 1
+    True
+    >>> generation = getStyleGeneration()
+    >>> touchStyle()
+    >>> getStyleGeneration() == generation + 1
+    True
+    """
+    STYLE_GENERATIONS[name] = STYLE_GENERATIONS.get(name, 0) + 1
+
+def getStyleGeneration(name=STYLE_TREE):
+    """Answers the current generation counter of style key *name*, or the
+    generation of the tree if *name* is omitted."""
+    return STYLE_GENERATIONS.get(name, 0)
+
+# Style values of these types are immutable or shared resources (fonts), so
+# copies of a style can use the same instances. Units are shared only if they
+# are immutable (see toolbox.units.setMutableUnits).
+SHARED_STYLE_TYPES = (type(None), bool, int, float, complex, str, bytes, Font)
+
+def isSharedStyleValue(value):
+    """Answers True if copies of a style can share `value`, because it cannot
+    be changed in place.
+
+    >>> isSharedStyleValue(pt(12)), isSharedStyleValue((pt(12), 'Bold')), isSharedStyleValue([pt(12)])
+    (True, True, False)
+    >>> from pagebot.toolbox.units import setMutableUnits
+    >>> previous = setMutableUnits(True)
+    >>> isSharedStyleValue(pt(12)), isSharedStyleValue((pt(12), 'Bold'))
+    (False, False)
+    >>> previous = setMutableUnits(previous)
+    """
+    if isinstance(value, SHARED_STYLE_TYPES):
+        return True
+    if isinstance(value, Unit):
+        return value._frozen
+    if isinstance(value, (tuple, frozenset)):
+        for v in value:
+            if not isSharedStyleValue(v):
+                return False
+        return True
+    return False
+
+def copyStyleValues(style):
+    """Answers a copy of the `style` dictionary, of the same class. Values
+    that cannot change in place, such as units, strings and fonts, are shared
+    with `style`. Other values, such as colors and lists, are deep copied.
+    Cheaper than copy.deepcopy(style), while changes to the copy still don't
+    alter `style`.
+
+    >>> style = Style(fontSize=pt(12), textFill=color(1, 0, 0), tabs=[(pt(10), LEFT)])
+    >>> copied = copyStyleValues(style)
+    >>> copied == style, copied.__class__.__name__, copied.owner
+    (True, 'Style', None)
+    >>> copied['fontSize'] is style['fontSize'], copied['tabs'] is style['tabs']
+    (True, False)
+    >>> from pagebot.toolbox.units import setMutableUnits
+    >>> previous = setMutableUnits(True)
+    >>> style = Style(fontSize=pt(12))
+    >>> copied = copyStyleValues(style)
+    >>> copied['fontSize'].v = 20 # Changing the copy leaves the original.
+    >>> copied['fontSize'], style['fontSize']
+    (20pt, 12pt)
+    >>> previous = setMutableUnits(previous)
+    """
+    copied = style.__class__()
+    values = {}
+    memo = {}
+    for name, value in style.items():
+        if not isSharedStyleValue(value):
+            value = copy.deepcopy(value, memo)
+        values[name] = value
+    dict.update(copied, values) # Don't touch the generations, nothing changed.
+    return copied
+
+class Style(dict):
+    """Dictionary of style values that keeps track of changes, so cascading
+    style lookups (e.g. Element.css) can cache their results. If the style
+    belongs to an element, then changes mark the element to be solved again
+    (see Element.markDirty). Behaves as a plain dict otherwise.
+
+    >>> style = Style(fontSize=pt(12))
+    >>> style
+    {'fontSize': 12pt}
+    >>> generation = getStyleGeneration('fontSize')
+    >>> style['fontSize'] = pt(14)
+    >>> getStyleGeneration('fontSize') > generation
+    True
+    >>> generation = getStyleGeneration('fontSize')
+    >>> style['fontSize'] = style['fontSize'] # Same immutable value.
+    >>> getStyleGeneration('fontSize') == generation
+    True
+    >>> generation = getStyleGeneration('leading')
+    >>> style.update(leading=em(1.2))
+    >>> getStyleGeneration('leading') > generation
+    True
+    >>> generation = getStyleGeneration('fontSize')
+    >>> style.pop('fontSize')
+    14pt
+    >>> getStyleGeneration('fontSize') > generation
+    True
+    >>> import copy
+    >>> copied = copy.deepcopy(style)
+    >>> copied, copied.__class__.__name__, copied.owner
+    ({'leading': 1.2em}, 'Style', None)
+    """
+    # Optional weakref to the element that owns this style.
+    owner = None
+
+    def touch(self, name):
+        """Invalidates the cached lookups of key `name` and marks the owner
+        element as changed."""
+        touchStyle(name)
+        if self.owner is not None:
+            e = self.owner()
+            if e is not None:
+                e.markDirty()
+
+    def __setitem__(self, name, value):
+        if name in self and dict.__getitem__(self, name) is value and isSharedStyleValue(value):
+            return # Nothing changed, cached lookups and solve stay valid.
+        dict.__setitem__(self, name, value)
+        self.touch(name)
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        self.touch(name)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __copy__(self):
+        # The copy does not belong to the owner of self.
+        return Style(self)
+
+    def __deepcopy__(self, memo):
+        style = Style()
+        memo[id(self)] = style
+        dict.update(style, copy.deepcopy(dict(self), memo))
+        return style
+
+    def update(self, *args, **kwargs):
+        d = dict(*args, **kwargs)
+        dict.update(self, d)
+        for name in d:
+            self.touch(name)
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def pop(self, name, *args):
+        self.touch(name)
+        return dict.pop(self, name, *args)
+
+    def popitem(self):
+        name, value = dict.popitem(self)
+        self.touch(name)
+        return name, value
+
+    def clear(self):
+        names = list(self)
+        dict.clear(self)
+        for name in names:
+            self.touch(name)
+
 def newStyle(**kwargs):
     return dict(**kwargs)
 
@@ -789,6 +973,24 @@ def getRootStyle(u=None, w=None, h=None, **kwargs):
         rs[name] = value
     return rs
 
+ROOT_STYLE_NAMES = None
+
+def getRootStyleNames():
+    """Answers the tuple of all key names in the root style. The result is
+    cached, as the set of names does not change, while getRootStyle() builds
+    a new dictionary on every call.
+
+    >>> names = getRootStyleNames()
+    >>> 'fontSize' in names, 'leading' in names
+    (True, True)
+    >>> names is getRootStyleNames()
+    True
+    """
+    global ROOT_STYLE_NAMES
+    if ROOT_STYLE_NAMES is None:
+        ROOT_STYLE_NAMES = tuple(getRootStyle().keys())
+    return ROOT_STYLE_NAMES
+
 def css(name, e=None, styles=None, default=None):
     """Answers the named style values. Search in optional style dict first,
     otherwise up the parent tree of styles in element e. Both e and style can
@@ -20,7 +20,8 @@
 #     reflow should become aware of ghost-hyphens)
 #     - Add scanning for combined words by recursively splitting into parts.
 #     - Add statistical hyphenation per language if words or combination of
-#     words fails.
+#     words fails. Words that are not in the dictionary can be hyphenated by
+#     the Liang patterns of getHyphenator(language), see hyphenator.py.
 #
 #     AvaiLable languages
 #     "en"      English
@@ -38,20 +39,43 @@
 #
 
 import os
-import codecs
+from collections import OrderedDict
 from pagebot.constants import DEFAULT_LANGUAGE
 from pagebot.filepaths import getResourcesPath
+from pagebot.toolbox.hyphenator import (Hyphenator, generatePatterns,
+    readWordList, writeWordList, PATTERN_LEVELS)
+from pagebot.toolbox.worddictionary import loadWordDictionary
 
 # Key is language ID (2 letters), value is dictionary of word --> hyphenated.
 languages = {}
+# Key is language ID, value is Hyphenator with the patterns of the language.
+hyphenators = {}
+# Minimal length of the first part when splitting combined words. The second
+# part must be longer.
+COMBINED_MIN_SEGMENT = 4
+# Key is (language, word, minSegment), value is the hyphenated combined word or
+# None, for the last COMBINED_CACHE_SIZE calls of hyphenateCombined().
+COMBINED_CACHE = OrderedDict()
+COMBINED_CACHE_SIZE = 10000
 
 def reset():
-    global languages
+    global languages, hyphenators
     languages = {}
+    hyphenators = {}
+    COMBINED_CACHE.clear()
+
+def getLanguagePath(language, suffix=''):
+    """Answers the path of the language resource file.
+
+    >>> getLanguagePath('pt-BR', '-patterns').endswith('/languages/pt-br-patterns.txt')
+    True
+    """
+    return getResourcesPath() + '/languages/%s%s.txt' % (language.lower(), suffix)
 
 def hyphenatedWords(language=DEFAULT_LANGUAGE):
     """Answers the dictionary of hyphenated words for this language (default is
-    English).
+    English). This is a read-only WordDictionary on the compiled word list,
+    see worddictionary.py.
 
 
     >>> from pagebot.constants import LANGUAGE_EN, LANGUAGE_NL, LANGUAGE_DK, LANGUAGE_PT_BR
@@ -73,30 +97,78 @@ def hyphenatedWords(language=DEFAULT_LANGUAGE):
     """
     if language not in languages:
         # Not initialized yet, try to read.
-        path = getResourcesPath() + '/languages/%s.txt' % language.lower()
+        path = getLanguagePath(language)
 
         if os.path.exists(path):
-            languages[language] = words = {}
-            f = codecs.open(path, mode="r", encoding="utf-8")
-            hyphenatedLines = f.read().split('\n')
-            f.close()
+            # Compiled once into the cache folder, then shared by mmap.
+            languages[language] = loadWordDictionary(path)
+    return languages.get(language)
 
-            for line in hyphenatedLines:
-                if line.startswith('#'):
-                    continue
-                key = line.replace('-','')
+def getHyphenator(language=DEFAULT_LANGUAGE):
+    """Answers the Hyphenator with the Liang patterns of this language (default
+    is English). Words of the dictionary that the patterns don't hyphenate in
+    the same way are its exceptions, so it answers the same as the dictionary
+    for all of its words, without loading it. Answers None if there are no
+    patterns for the language.
 
-                if len(key) == 0:
-                    continue
+    >>> from pagebot.constants import LANGUAGE_EN, LANGUAGE_NL, LANGUAGE_PT_BR
+    >>> h = getHyphenator(LANGUAGE_NL)
+    >>> h.hyphenate('marmerplaatjes'), h.hyphenate('hagelslagroomboterbloemkoolstofzuigerveerpont')
+    ('mar-mer-plaat-jes', 'ha-gel-slag-room-bo-ter-bloem-kool-stof-zui-ger-veer-pont')
+    >>> getHyphenator(LANGUAGE_EN).hyphenate('Tutankhamun')
+    'Tut-ankh-a-mun'
+    >>> getHyphenator(LANGUAGE_PT_BR).hyphenate('cefalorraquidiano')
+    'ce-fa-lor-ra-qui-di-a-no'
+    >>> getHyphenator('xx') is None
+    True
+    """
+    if language not in hyphenators:
+        path = getLanguagePath(language, '-patterns')
+        if not os.path.exists(path):
+            return None
+        exceptions = ()
+        exceptionsPath = getLanguagePath(language, '-exceptions')
+        if os.path.exists(exceptionsPath):
+            exceptions = readWordList(exceptionsPath)
+        hyphenators[language] = Hyphenator(readWordList(path), exceptions)
+    return hyphenators[language]
 
-                words[key] = line
-    return languages.get(language)
+def compilePatterns(language=DEFAULT_LANGUAGE, levels=PATTERN_LEVELS, verbose=False):
+    """Generates the Liang patterns from the dictionary of the language and
+    saves them in the resources, together with the words that the patterns
+    don't hyphenate as the dictionary does. Answers the (patterns, exceptions)
+    tuple of numbers. This takes a few minutes for large dictionaries, so it
+    only needs to run after the word list changed."""
+    lines = []
+    for line in hyphenatedWords(language).values():
+        line = line.strip().lstrip('\ufeff')
+        if line and not line.startswith('#'):
+            lines.append(line)
+    patterns = generatePatterns(lines, levels=levels, verbose=verbose)
+    exceptions = []
+    # The second pass adds the words that now match the lower case spelling
+    # of an exception, as they are written.
+    for _ in range(2):
+        h = Hyphenator(patterns, exceptions)
+        for line in lines:
+            if h.hyphenate(line.replace('-', '')) != line:
+                exceptions.append(line)
+    comment = 'Generated by pagebot.toolbox.hyphenation.compilePatterns() from %s.txt' % language.lower()
+    writeWordList(getLanguagePath(language, '-patterns'), patterns, comment)
+    writeWordList(getLanguagePath(language, '-exceptions'), sorted(exceptions), comment)
+    hyphenators.pop(language, None)
+    return len(patterns), len(exceptions)
 
-def hyphenate(word, language=DEFAULT_LANGUAGE, checkCombined=False):
+def hyphenate(word, language=DEFAULT_LANGUAGE, checkCombined=False, usePatterns=False,
+        minSegment=None):
     """Get the dictionary for the defined language and answer the hyphenated
     word if it exists. If it does not exists and checkCombined flag is True,
     try break the word into parts and check if on or nore of the parts are
-    hyphenated. If all fails, then answer None.
+    hyphenated, see hyphenateCombined(). If all fails, then answer None.
+    If the usePatterns flag is True, then the hyphenation is answered by the
+    patterns of the language, see getHyphenator(), without loading the
+    dictionary. Combined words are only checked then for words that are not
+    exceptions of the patterns.
 
     >>> from pagebot.constants import LANGUAGE_EN, LANGUAGE_NL, LANGUAGE_DK, LANGUAGE_PT_BR
     >>> # E N G L I S H
@@ -127,11 +199,16 @@ def hyphenate(word, language=DEFAULT_LANGUAGE, checkCombined=False):
     'och-tend-jas-kle-ding-han-ger-schroef-draad'
     >>> hyphenate('hagelslagroomboterbloemkoolstofzuigerveerpont', LANGUAGE_NL, True)
     'ha-gel-slag-room-bo-ter-bloem-kool-stof-zui-ger-veer-pont'
-    >>> # Longest in practice. Don't go longer than this, as calculation time exponentioally increases.
+    >>> # Longest in practice. Longer words are fine too, see hyphenateCombined().
     >>> hyphenate('kernenergieadviesbureaugebouwtoegangsdeurknopbedieningspaneeltjes', LANGUAGE_NL, True)
     'kern-ener-gie-ad-vies-bu-reau-ge-bouw-toe-gangs-deur-knop-be-die-nings-pa-neel-tjes'
     >>> hyphenate('housewarmingpartyinvitation', LANGUAGE_NL, True) is None # --> None: no matching in another language.
     True
+    >>> hyphenate('marmerplaats', LANGUAGE_NL, usePatterns=True) # Not in dictionary, hyphenated by patterns.
+    'mar-mer-plaats'
+    >>> _ = languages.pop(LANGUAGE_EN, None)
+    >>> hyphenate('housing', LANGUAGE_EN, usePatterns=True), LANGUAGE_EN in languages # Dictionary not loaded.
+    ('hous-ing', False)
     >>> hyphenate('housewarmingpartyinvitation', LANGUAGE_EN, True) # --> Still works: house-warm-ing-par-ty-in-vi-ta-tion
     'house-warm-ing-par-ty-in-vi-ta-tion'
     >>> # First [100:105] words of the sorted list of all language words in the dictionary.
@@ -167,6 +244,20 @@ def hyphenate(word, language=DEFAULT_LANGUAGE, checkCombined=False):
     # Word: hagelslagroomboterbloemkoolstofzuigerveerpont
     # Hyphenated: ha-gel-slag-room-bo-ter-bloem-kool-stof-zui-ger-veer-pont
 
+    if minSegment is None:
+        minSegment = COMBINED_MIN_SEGMENT
+
+    if usePatterns:
+        # The patterns and their exceptions answer the same as the dictionary
+        # for all of its words, so the dictionary is not loaded.
+        h = getHyphenator(language)
+        if h is not None:
+            if checkCombined and len(word) > minSegment and not h.isException(word):
+                hyphenated = hyphenateCombined(word, language, minSegment)
+                if hyphenated is not None:
+                    return hyphenated
+            return h.hyphenate(word)
+
     hWords = hyphenatedWords(language) or {} # Empty dictionary if the langueage does not exist.
     hyphenated = hWords.get(word)
 
@@ -174,24 +265,78 @@ def hyphenate(word, language=DEFAULT_LANGUAGE, checkCombined=False):
         return hyphenated
 
     # In case the language support combined words, try to find matching parts.
-    if checkCombined and len(word) > 4:
+    if checkCombined and len(word) > minSegment:
         # Checking on combined words (as in 'nl' and 'de').
+        hyphenated = hyphenateCombined(word, language, minSegment)
+        if hyphenated is not None:
+            return hyphenated
+    return None
 
-        for i in range(4, len(word)-4):
-            w1 = word[:i]
-            hw1 = hyphenate(w1, language, True)
+def hyphenateCombined(word, language=DEFAULT_LANGUAGE, minSegment=COMBINED_MIN_SEGMENT, memo=None):
+    """Answers the hyphenated word from the dictionary of the language or,
+    if it does not exist, combined from parts that are in the dictionary,
+    or that are combined words themselves. The
+    first split (from the start of the word) that works is used, with a first
+    part of at least `minSegment` letters and a longer second part. Answers
+    None if there is no such split.
 
-            if hw1 is None:
-                continue
+    Each part (start, end) of the word is solved once and kept in the `memo`
+    dictionary, so there are at most n * n parts, each trying at most n
+    splits, instead of trying all splits again for every part. The results of
+    the last calls are kept in COMBINED_CACHE.
 
-            w2 = word[i:]
-            hw2 = hyphenate(w2, language, True)
+    >>> from pagebot.constants import LANGUAGE_NL
+    >>> hyphenateCombined('marmerplaatsbepaling', LANGUAGE_NL)
+    'mar-mer-plaats-be-pa-ling'
+    >>> hyphenateCombined('marmerplaats', LANGUAGE_NL, minSegment=7) is None
+    True
+    >>> # Stress test: a long compound and a long word without valid split.
+    >>> # Calculation time was exponential before.
+    >>> word = 'kernenergieadviesbureaugebouwtoegangsdeurknopbedieningspaneeltjes' * 4
+    >>> memo = {}
+    >>> hyphenateCombined(word, LANGUAGE_NL, memo=memo).count('-')
+    75
+    >>> len(memo) <= len(word) * len(word)
+    True
+    >>> word = 'kernenergie' + 'q' * 200
+    >>> memo = {}
+    >>> hyphenateCombined(word, LANGUAGE_NL, memo=memo) is None
+    True
+    >>> len(memo) <= len(word) * len(word)
+    True
+    """
+    cacheKey = language, word, minSegment
+    if cacheKey in COMBINED_CACHE:
+        COMBINED_CACHE.move_to_end(cacheKey)
+        return COMBINED_CACHE[cacheKey]
 
-            if hw2 is None:
-                continue
+    hWords = hyphenatedWords(language) or {}
+    if memo is None:
+        memo = {} # Key is (start, end) of the part, value is hyphenated part or None.
 
-            return hw1 + '-' + hw2
-    return None
+    def solve(start, end):
+        key = start, end
+        if key in memo:
+            return memo[key]
+        hyphenated = hWords.get(word[start:end])
+        if hyphenated is None and end - start > minSegment:
+            for index in range(start + minSegment, end - minSegment):
+                hw1 = solve(start, index)
+                if hw1 is None:
+                    continue
+                hw2 = solve(index, end)
+                if hw2 is None:
+                    continue
+                hyphenated = hw1 + '-' + hw2
+                break
+        memo[key] = hyphenated
+        return hyphenated
+
+    hyphenated = solve(0, len(word))
+    COMBINED_CACHE[cacheKey] = hyphenated
+    if len(COMBINED_CACHE) > COMBINED_CACHE_SIZE:
+        COMBINED_CACHE.popitem(last=False)
+    return hyphenated
 
 def words(language=DEFAULT_LANGUAGE):
     """Answers the sorted list of all words in the dictionary for this
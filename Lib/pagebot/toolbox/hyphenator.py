@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     hyphenator.py
+#
+#     Pattern based hyphenation, as described by Frank Liang in "Word
+#     Hy-phen-a-tion by Com-put-er" (1983) and used by TeX. Patterns such as
+#     "a1b" or ".ex3" are matched on all positions of the word. The highest
+#     value between two letters wins, and odd values allow a hyphen there.
+#
+#     The patterns of the PageBot languages are generated from the hyphenated
+#     word lists in resources/languages by generatePatterns(), in the same way
+#     as TeX patgen does. Words of the lists that the patterns don't hyphenate
+#     exactly are stored as exceptions. See hyphenation.compilePatterns().
+#
+import codecs
+
+# Parameters for generatePatterns(), one tuple per level, as used by patgen:
+# (minimal pattern length, maximal pattern length, good weight, bad weight,
+# threshold). Odd levels add hyphens, even levels inhibit them.
+PATTERN_LEVELS = (
+    (1, 3, 1, 2, 6),
+    (2, 4, 1, 1, 3),
+    (3, 5, 1, 2, 3),
+    (4, 6, 1, 1, 2),
+    (5, 7, 1, 1, 2),
+    (6, 8, 1, 1, 2),
+    (7, 9, 1, 1, 2),
+)
+HYPHEN = '-'
+# Maximal number of hyphenated words that a Hyphenator keeps in its cache.
+HYPHENATOR_CACHE_SIZE = 10000
+
+def parsePattern(pattern):
+    """Answers the (letters, values) tuple of the TeX pattern string. The
+    values are bytes with the value of each position between the letters.
+
+    >>> parsePattern('.ex3')
+    ('.ex', b'\\x00\\x00\\x00\\x03')
+    >>> letters, values = parsePattern('a1b')
+    >>> letters, list(values)
+    ('ab', [0, 1, 0])
+    """
+    letters = []
+    values = [0]
+    for c in pattern:
+        if c.isdigit():
+            values[-1] = int(c)
+        else:
+            letters.append(c)
+            values.append(0)
+    return ''.join(letters), bytes(values)
+
+def formatPattern(letters, values):
+    """Answers the TeX pattern string of `letters` and `values`.
+
+    >>> formatPattern('.ex', (0, 0, 0, 3))
+    '.ex3'
+    >>> formatPattern(*parsePattern('a1b'))
+    'a1b'
+    """
+    pattern = []
+    for index, c in enumerate(letters):
+        if values[index]:
+            pattern.append(str(values[index]))
+        pattern.append(c)
+    if values[len(letters)]:
+        pattern.append(str(values[len(letters)]))
+    return ''.join(pattern)
+
+def hyphenated2Positions(hyphenated):
+    """Answers the (word, positions) tuple of the `hyphenated` word, where
+    positions is the tuple with the number of letters before each hyphen.
+
+    >>> hyphenated2Positions('mar-mer-plaat-jes')
+    ('marmerplaatjes', (3, 6, 11))
+    """
+    positions = []
+    letters = []
+    for c in hyphenated:
+        if c == HYPHEN:
+            positions.append(len(letters))
+        else:
+            letters.append(c)
+    return ''.join(letters), tuple(positions)
+
+def positions2Hyphenated(word, positions):
+    """Answers the `word` with hyphens inserted at `positions`.
+
+    >>> positions2Hyphenated('marmerplaatjes', (3, 6, 11))
+    'mar-mer-plaat-jes'
+    """
+    parts = []
+    start = 0
+    for position in positions:
+        parts.append(word[start:position])
+        start = position
+    parts.append(word[start:])
+    return HYPHEN.join(parts)
+
+def readWordList(path):
+    """Answers the list of lines of the word list file, ignoring empty lines
+    and comment lines that start with "#"."""
+    f = codecs.open(path, mode='r', encoding='utf-8-sig')
+    lines = f.read().split('\n')
+    f.close()
+    result = []
+    for line in lines:
+        line = line.strip().lstrip('\ufeff')
+        if line and not line.startswith('#'):
+            result.append(line)
+    return result
+
+def readPatterns(path):
+    """Answers the list of pattern strings in the file at `path`."""
+    return readWordList(path)
+
+def writeWordList(path, lines, comment=None):
+    """Writes the `lines` to the file at `path`, with an optional `comment`
+    line on top."""
+    f = codecs.open(path, mode='w', encoding='utf-8')
+    if comment:
+        f.write('# %s\n' % comment)
+    for line in lines:
+        f.write(line + '\n')
+    f.close()
+
+class Hyphenator:
+    """Hyphenates words by Liang patterns. The patterns are compiled into a
+    trie, stored as one dictionary with all pattern prefixes as keys, so
+    matching on a position stops as soon as no pattern can follow. Lookup
+    time is linear in the length of the word times the length of the longest
+    pattern. Exceptions are words with fixed hyphenation, that overrule the
+    patterns. Results are cached by word.
+
+    >>> h = Hyphenator(('1ba', 'a1b', 'a2bc'), exceptions=('ab-ba-ca',))
+    >>> h.hyphenate('abab'), h.hyphenate('Abba'), h.hyphenate('abcab') # Inhibited by a2bc
+    ('a-ba-b', 'A-b-ba', 'abca-b')
+    >>> h.hyphenate('abbaca') # Exception
+    'ab-ba-ca'
+    >>> h.positions('ababab'), h.positions('ababab', leftMin=2, rightMin=2)
+    ((1, 3, 5), (3,))
+    >>> h.hyphenate('xyz'), h.hyphenate('')
+    ('xyz', '')
+    """
+    def __init__(self, patterns=None, exceptions=None, leftMin=1, rightMin=1,
+            cacheSize=None):
+        # Key is pattern letters or a prefix of them. Value is bytes with the
+        # values between the pattern letters or None for a prefix.
+        self.trie = {}
+        self.maxLength = 0
+        # Key is word as written in the exception, value is tuple of hyphen
+        # positions. Other spellings are matched on their lower case.
+        self.exceptions = {}
+        self.leftMin = leftMin
+        self.rightMin = rightMin
+        if cacheSize is None:
+            cacheSize = HYPHENATOR_CACHE_SIZE
+        self.cacheSize = cacheSize
+        self._cache = {}
+        for pattern in patterns or ():
+            self.addPattern(pattern)
+        for hyphenated in exceptions or ():
+            self.addException(hyphenated)
+
+    def __repr__(self):
+        return '<%s patterns=%d exceptions=%d>' % (self.__class__.__name__,
+            sum(1 for values in self.trie.values() if values is not None),
+            len(self.exceptions))
+
+    def addPattern(self, pattern):
+        """Adds the TeX `pattern` string to the trie."""
+        letters, values = parsePattern(pattern)
+        for index in range(1, len(letters)):
+            self.trie.setdefault(letters[:index], None)
+        self.trie[letters] = values
+        self.maxLength = max(self.maxLength, len(letters))
+        self._cache = {}
+
+    def addException(self, hyphenated):
+        """Adds the `hyphenated` word as exception to the patterns."""
+        word, positions = hyphenated2Positions(hyphenated)
+        self.exceptions[word] = positions
+        self._cache = {}
+
+    def isException(self, word):
+        """Answers True if `word` has a fixed hyphenation that overrules the
+        patterns.
+
+        >>> h = Hyphenator(('1ba',), exceptions=('ab-ba-ca',))
+        >>> h.isException('abbaca'), h.isException('Abbaca'), h.isException('abab')
+        (True, True, False)
+        """
+        return word in self.exceptions or word.lower() in self.exceptions
+
+    def getValues(self, word):
+        """Answers the list of pattern values for all positions in `word`,
+        as Liang defines them, including the positions of the word
+        boundaries.
+
+        >>> Hyphenator(('1ba', 'a1b')).getValues('abab')
+        [0, 0, 1, 0, 1, 0, 0]
+        """
+        w = '.' + word.lower() + '.'
+        if len(w) != len(word) + 2: # Lower case changed the length.
+            w = '.' + word + '.'
+        values = [0] * (len(w) + 1)
+        trie = self.trie
+        maxLength = self.maxLength
+        size = len(w)
+        for start in range(size):
+            for end in range(start + 1, min(start + maxLength, size) + 1):
+                patternValues = trie.get(w[start:end], 0)
+                if patternValues == 0: # Not a pattern or prefix of one.
+                    break
+                if patternValues is not None:
+                    for index, value in enumerate(patternValues):
+                        if value > values[start + index]:
+                            values[start + index] = value
+        return values
+
+    def positions(self, word, leftMin=None, rightMin=None):
+        """Answers the tuple of hyphen positions in `word`, as the number of
+        letters before each hyphen."""
+        if leftMin is None:
+            leftMin = self.leftMin
+        if rightMin is None:
+            rightMin = self.rightMin
+        positions = self.exceptions.get(word)
+        if positions is None:
+            positions = self.exceptions.get(word.lower())
+        if positions is None:
+            values = self.getValues(word)
+            # Position k is between word[k-1] and word[k], that is values[k+1].
+            positions = tuple(k for k in range(1, len(word)) if values[k + 1] % 2)
+        return tuple(k for k in positions if k >= leftMin and len(word) - k >= rightMin)
+
+    def hyphenate(self, word):
+        """Answers the `word` with hyphens on all positions that the
+        exceptions or the patterns allow. Answers the word unchanged if there
+        are no hyphen positions."""
+        hyphenated = self._cache.get(word)
+        if hyphenated is None:
+            hyphenated = positions2Hyphenated(word, self.positions(word))
+            if len(self._cache) >= self.cacheSize:
+                # Remove the oldest entry.
+                del self._cache[next(iter(self._cache))]
+            self._cache[word] = hyphenated
+        return hyphenated
+
+def generatePatterns(hyphenatedWords, levels=PATTERN_LEVELS, verbose=False):
+    """Answers the sorted list of pattern strings that hyphenate the list of
+    `hyphenatedWords` as well as possible, similar to the TeX patgen program.
+    For each level and pattern length, candidate patterns are counted on all
+    positions where the current patterns are wrong (good) and on all
+    positions where they would make the result wrong (bad). Candidates with
+    good * goodWeight - bad * badWeight >= threshold are selected. Words with
+    other characters than letters and quotes are skipped.
+
+    >>> words = ('ba-by', 'ba-con', 'ca-bin', 'co-bra', 'cab', 'robe', 'ro-bin')
+    >>> patterns = generatePatterns(words, levels=((1, 2, 1, 1, 1), (1, 3, 1, 1, 1)))
+    >>> h = Hyphenator(patterns)
+    >>> [h.hyphenate(hyphenated.replace('-', '')) == hyphenated for hyphenated in words]
+    [True, True, True, True, True, True, True]
+    """
+    words = {}
+    for hyphenated in hyphenatedWords:
+        word, positions = hyphenated2Positions(hyphenated.lower())
+        if word and not HYPHEN * 2 in hyphenated and \
+                all(c.isalpha() or c == "'" for c in word):
+            words[word] = set(positions)
+    words = sorted(words.items())
+
+    patterns = {} # Key is pattern letters, value is list of values.
+    for level, (minLength, maxLength, goodWeight, badWeight, threshold) in enumerate(levels, 1):
+        hyphenating = level % 2 # Odd levels add hyphens.
+        for length in range(minLength, maxLength + 1):
+            h = Hyphenator([formatPattern(letters, values) for letters, values in patterns.items()])
+            currentValues = [h.getValues(word) for word, _ in words]
+            # First count the good positions, then the bad positions only for
+            # the candidates that can make it.
+            counts = {}
+            for countGood in (True, False):
+                for (word, positions), values in zip(words, currentValues):
+                    w = '.' + word + '.'
+                    for k in range(1, len(word)):
+                        position = k + 1
+                        if values[position] % 2 == hyphenating:
+                            continue # Already as this level would make it.
+                        if ((k in positions) == bool(hyphenating)) != countGood:
+                            continue
+                        for start in range(max(0, position - length), min(position, len(w) - length) + 1):
+                            key = w[start:start + length], position - start
+                            if countGood:
+                                counts[key] = counts.get(key, 0) + 1
+                            elif key in counts:
+                                counts[key][1] += 1
+                if countGood:
+                    counts = {key: [good, 0] for key, good in counts.items()
+                        if good * goodWeight >= threshold}
+            added = 0
+            for (letters, index), (good, bad) in counts.items():
+                if good * goodWeight - bad * badWeight >= threshold:
+                    values = patterns.setdefault(letters, [0] * (len(letters) + 1))
+                    if values[index] < level:
+                        values[index] = level
+                        added += 1
+            if verbose:
+                print('Level %d, length %d: %d patterns added, %d total' % (level, length, added, len(patterns)))
+    return sorted(formatPattern(letters, values) for letters, values in patterns.items())
+
+if __name__ == "__main__":
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
@@ -37,6 +37,12 @@
 #     radian       Radians angle
 #     degrees      Degrees angle
 #
+#     Unit instances are immutable by default: arithmetic and conversions
+#     answer new instances, so values can be shared without copying and
+#     common int values of absolute units are interned. Use
+#     setMutableUnits(True) for the old behavior, where attributes of unit
+#     instances can be changed in place.
+#
 
 import re
 import sys
@@ -53,6 +59,83 @@ U = 6 # Some basic unit grid to use as default.
 EM_FONT_SIZE = U*2 # 12pt
 BASELINE_GRID = U*2+3 # 2.5U = 15pt
 
+# If False, Unit instances cannot be changed after creation. Then they can be
+# shared instead of copied and int values of absolute units are interned.
+MUTABLE_UNITS = False
+# Range of int values that absolute unit makers answer as shared instances.
+INTERNED_VALUES = range(-256, 2049)
+# Key is (unit class, int value), value is the shared immutable instance.
+INTERNED_UNITS = {}
+# Key is unit class, value is dict {slotName: slotDescriptor}.
+UNIT_SLOTS = {}
+# Key is value string, value is maker function, as found by value2Maker().
+VALUE_MAKERS = {}
+MAX_VALUE_MAKERS = 1024
+
+def setMutableUnits(mutable=True):
+    """Sets the mode for Unit instances created from now on. If `mutable` is
+    True, then attributes of unit instances can be changed in place (e.g.
+    u.base = pt(12)) and units() answers copies. Otherwise instances are
+    immutable and can be shared. Answers the previous mode.
+
+    >>> u = pt(20)
+    >>> u.v = 30
+    Traceback (most recent call last):
+    ...
+    AttributeError: Cannot set "v" of immutable unit 20pt
+    >>> setMutableUnits()
+    False
+    >>> u = pt(20)
+    >>> u.v = 30
+    >>> u, pt(20)
+    (30pt, 20pt)
+    >>> setMutableUnits(False)
+    True
+    """
+    global MUTABLE_UNITS
+    previous = MUTABLE_UNITS
+    MUTABLE_UNITS = bool(mutable)
+    return previous
+
+def internedUnit(cls, v):
+    """Answers the shared immutable instance of absolute unit class `cls`
+    for int value `v`. Answers a new instance for other values or if units are
+    mutable.
+
+    >>> internedUnit(Pt, 0) is internedUnit(Pt, 0)
+    True
+    >>> internedUnit(Pt, 0.5) is internedUnit(Pt, 0.5)
+    False
+    >>> pt(0) is pt(0), mm(10) is mm(10), pt(10) is mm(10)
+    (True, True, False)
+    """
+    if v.__class__ is not int or MUTABLE_UNITS or v not in INTERNED_VALUES:
+        return cls(v)
+    key = cls, v
+    u = INTERNED_UNITS.get(key)
+    if u is None:
+        u = INTERNED_UNITS[key] = cls(v)
+    return u
+
+def getUnitSlots(cls):
+    """Answers the dictionary {slotName: slotDescriptor} of all slots of
+    unit class `cls`. Slots are read and written through the descriptors, so
+    properties with the same name (e.g. RelativeUnit.base) are bypassed.
+
+    >>> sorted(getUnitSlots(Pt))
+    ['_frozen', 'base', 'g', 'v']
+    >>> sorted(getUnitSlots(Perc))
+    ['_base', '_frozen', '_g', 'base', 'g', 'v']
+    """
+    slots = UNIT_SLOTS.get(cls)
+    if slots is None:
+        slots = {}
+        for c in cls.__mro__:
+            for name in c.__dict__.get('__slots__', ()):
+                slots[name] = c.__dict__[name]
+        UNIT_SLOTS[cls] = slots
+    return slots
+
 # P O I N T
 
 def point3D(p=None):
@@ -303,6 +386,8 @@ def isUnit(u):
     # FIXME:
     # isinstance(u, Unit) # Does not seem to work correctly for units created
     # in other sources, such as A4.
+    if isinstance(u, Unit):
+        return True
     return hasattr(u, 'v') and hasattr(u, 'g') and hasattr(u, 'base')
 
 def uRound(u, *args):
@@ -385,7 +470,7 @@ class Unit:
         >>> u = perc(15) + 5
         >>> u
         20%
-        >>> u.base = pt(440)
+        >>> u = u.derive(base=pt(440)) # Units are immutable, answer new instance
         >>> u, u.ru, u.rv # Respectively: instance to str, rendered to u.base as 20% of pt(440)
         (20%, 88pt, 88)
         >>> # 3 + px(3) # Gives error.
@@ -432,7 +517,16 @@ class Unit:
         1980pt
         >>> pt(2000) - px(20)
         1980pt
+        >>> u = pt(12)
+        >>> u.v = 13 # Unit instances are immutable, unless setMutableUnits(True)
+        Traceback (most recent call last):
+        ...
+        AttributeError: Cannot set "v" of immutable unit 12pt
+        >>> u.derive(v=13), u
+        (13pt, 12pt)
     """
+    __slots__ = ('v', 'base', 'g', '_frozen')
+
     BASE = None # Default "base reference for relative units. Unused None for absolute units."
 
     isAbsolute = True
@@ -442,13 +536,89 @@ class Unit:
     def __init__(self, v=0, base=None, g=0):
         if not isinstance(v, (int, float)): # Otherwise do a cast first as pt(otherUnit)
             v = pt(v)
-        self.v = v
+        # Set through the slot descriptors, as self.__setattr__ checks on
+        # immutable instances and object.__setattr__ is slower.
+        setUnitV(self, v)
         # Base can be a unit value, ot a dictionary, where self.UNIT is the key.
         # This way units(...) can decide on the type of unit, where the base has multiple entries.
         if base is None:
             base = self.BASE
-        self.base = base # Default base value for reference by relative units.
-        self.g = g # Default gutter for reference by relative units. Ignored by absolute units.
+        if self.isAbsolute:
+            setUnitBase(self, base)
+            setUnitG(self, g) # Ignored by absolute units.
+        else: # Relative units check the base and gutter values by property.
+            cls = self.__class__
+            cls.base.__set__(self, base) # Default base value for reference by relative units.
+            cls.g.__set__(self, g) # Default gutter for reference by relative units.
+        setUnitFrozen(self, not MUTABLE_UNITS)
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError('Cannot set "%s" of immutable unit %s' % (name, self))
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        state = {}
+        for name, slot in getUnitSlots(self.__class__).items():
+            try:
+                state[name] = slot.__get__(self)
+            except AttributeError: # Slot not set.
+                pass
+        return state
+
+    def __setstate__(self, state):
+        slots = getUnitSlots(self.__class__)
+        for name, value in state.items():
+            slots[name].__set__(self, value)
+
+    def __copy__(self):
+        """Answers self if immutable, otherwise a new instance with the same
+        attributes.
+
+        >>> u = pt(12.5)
+        >>> copy(u) is u
+        True
+        """
+        if self._frozen and not MUTABLE_UNITS:
+            return self
+        return self.derive()
+
+    def __deepcopy__(self, memo):
+        """Answers self if immutable, otherwise a new instance with the same
+        attributes. Values of base and gutter are shared.
+
+        >>> from copy import deepcopy
+        >>> u = mm(12.5)
+        >>> deepcopy(u) is u
+        True
+        """
+        return self.__copy__()
+
+    def derive(self, **attrs):
+        """Answers a new instance of the same class, base and gutter with
+        the attributes in `attrs` set. Properties such as `pt` and `base` can
+        be used as well. The new instance is immutable, unless units are in
+        mutable mode.
+
+        >>> u = mm(10)
+        >>> u.derive(v=20), u.derive(pt=72), u
+        (20mm, 25.4mm, 10mm)
+        >>> u = perc(20, base=100)
+        >>> u1 = u.derive(base=pt(440))
+        >>> u1, u1.ru, u.ru
+        (20%, 88pt, 20pt)
+        """
+        u = object.__new__(self.__class__)
+        for slot in getUnitSlots(self.__class__).values():
+            try:
+                slot.__set__(u, slot.__get__(self))
+            except AttributeError: # Slot not set.
+                pass
+        object.__setattr__(u, '_frozen', False)
+        for name, value in attrs.items():
+            setattr(u, name, value)
+        object.__setattr__(u, '_frozen', not MUTABLE_UNITS)
+        return u
 
     def _get_name(self):
         """Answers the unit name.
@@ -473,9 +643,7 @@ class Unit:
         >>> u, ru, ru.v, ru.rv # Did not change original u
         (12.2pt, 12pt, 12, 12)
         """
-        u = copy(self)
-        u.v = int(round(self.v))
-        return u
+        return self.derive(v=int(round(self.v)))
     rounded = property(_get_rounded)
 
     def __repr__(self):
@@ -594,8 +762,7 @@ class Unit:
     def _set_rv(self, v):
         """Set the raw unit value, same as self.v = v for absolute values.
 
-        >>> u = Inch(2)
-        >>> u.rv = 3
+        >>> u = Inch(2).derive(rv=3)
         >>> u.v
         3
         """
@@ -604,11 +771,11 @@ class Unit:
 
     def _get_ru(self):
         """For absolute units the rendering toward units is just a copy of
-        self.
+        self. Immutable units answer self.
 
         >>> u = inch(3)
         >>> u.ru, u == u.ru, u is u.ru
-        (3", True, False)
+        (3", True, True)
         """
         return copy(self)
     ru = property(_get_ru)
@@ -676,9 +843,7 @@ class Unit:
         >>> abs(-pt(2))
         2pt
         """
-        u = copy(self)
-        u.v = abs(u.v)
-        return u
+        return self.derive(v=abs(self.v))
 
     def __eq__(self, u):
         """Answers the boolean result how self compares to rendered u.
@@ -849,17 +1014,16 @@ class Unit:
         3p6
 
         """
-        u0 = copy(self) # Keep values of self
         if isinstance(u, str):
             u = units(u)
             if u is None:
                 raise ValueError('Cannot add "%s" to "%s"' % (self, u))
         if isinstance(u, (int, float)): # One is a scalar, just add
-            u0.v += u
-        elif u0.__class__ == u.__class__:
-            u0.v += u.v # Same class, just add.
+            u0 = self.derive(v=self.v + u)
+        elif self.__class__ == u.__class__:
+            u0 = self.derive(v=self.v + u.v) # Same class, just add.
         elif isUnit(u):
-            u0.pt += u.pt # Adding units, calculate via points
+            u0 = self.derive(pt=self.pt + u.pt) # Adding units, calculate via points
         else:
             raise ValueError('Cannot add "%s" to "%s"' % (self, u))
         return u0
@@ -876,13 +1040,12 @@ class Unit:
         >>> u - mm(10) # Subtract another type of unit
         21.65pt
         """
-        u0 = copy(self) # Keep values of self
         if isinstance(u, (int, float)): # One is a scalar, just subtract
-            u0.v -= u
-        elif u0.__class__ == u.__class__:
-            u0.v -= u.v # Same class, just subtract.
+            u0 = self.derive(v=self.v - u)
+        elif self.__class__ == u.__class__:
+            u0 = self.derive(v=self.v - u.v) # Same class, just subtract.
         elif isUnit(u):
-            u0.pt -= u.pt # Subtracting units, calculate via points
+            u0 = self.derive(pt=self.pt - u.pt) # Subtracting units, calculate via points
         else:
             raise ValueError('Cannot subtract "%s" from "%s"' % (u, self))
         return u0
@@ -909,16 +1072,15 @@ class Unit:
         >>> pt(10) / pt(5)
         2.0
         """
-        u0 = copy(self) # Keep values of self
         if isinstance(u, (int, float)): # One is a scalar, just divide
-            assert u, ('Zero division "%s/%s"' % (u0, u))
-            u0.v /= u # Just divide.
+            assert u, ('Zero division "%s/%s"' % (self, u))
+            u0 = self.derive(v=self.v / u) # Just divide.
         elif isUnit(u):
             upt = u.pt
-            assert upt, ('Zero division "%s/%s"' % (u0, u))
-            u0 = u0.pt / upt # Dividing units, create ratio float number.
+            assert upt, ('Zero division "%s/%s"' % (self, u))
+            u0 = self.pt / upt # Dividing units, create ratio float number.
         else:
-            raise ValueError('Cannot divide "%s" by "%s"' % (u0, u))
+            raise ValueError('Cannot divide "%s" by "%s"' % (self, u))
         return u0
 
     __itruediv__ = __truediv__ = __div__
@@ -931,11 +1093,9 @@ class Unit:
         >>> 185.0 / pt(20)
         9.25pt
         """
-        u0 = copy(self)
         if not self.v:
             raise ValueError('Cannot divide "%s" by "%s"' % (u, self.v))
-        u0.v = u / self.v
-        return u0
+        return self.derive(v=u / self.v)
 
     __rtruediv__ = __rdiv__
 
@@ -960,17 +1120,14 @@ class Unit:
         >>> pt(100) * pt(100)
         10000
         """
-        # Keep original values of self.
-        u0 = copy(self)
-
         if isinstance(u, (int, float)):
             # One is a scalar, just multiply.
-            u0.v *= u
+            u0 = self.derive(v=self.v * u)
         elif isUnit(u) and u.isEm:
-            u0.base = u.r
+            u0 = self.derive(base=u.r)
             u0 = u0.r
         elif self.isEm:
-            u0 = copy(u) * self.v
+            u0 = u * self.v
         else:
             raise ValueError('Cannot multiply "%s" by "%s" of class %s' % (self, u, u.__class__.__name__))
 
@@ -987,14 +1144,18 @@ class Unit:
         >>> -pt(20) - pt(10)
         -30pt
         """
-        u = copy(self) # Keep values of self
-        u.v = -self.v
-        return u
+        return self.derive(v=-self.v)
 
     def byBase(self, base):
         """Not implemented for non-relative units"""
         raise ValueError('Cannot calculate non-relative "%s" unit "%s" by base "%s" ' % (self.__class__.__name__, self.v, base))
 
+# Setters of the slots of all units, used by Unit.__init__.
+setUnitV = Unit.v.__set__
+setUnitBase = Unit.base.__set__
+setUnitG = Unit.g.__set__
+setUnitFrozen = Unit._frozen.__set__
+
 #   Mm
 
 def mm(v, *args, **kwargs):
@@ -1007,10 +1168,9 @@ def mm(v, *args, **kwargs):
             u.append(mm(uv))
         u = tuple(u)
     elif isinstance(v, (int, float)):
-        u = Mm(v)
+        u = internedUnit(Mm, v)
     elif isUnit(v):
-        u = Mm() # New Mm and convert via pt
-        u.pt = v.pt
+        u = Mm(v.pt / Mm.PT_FACTOR) # New Mm and convert via pt
     elif isinstance(v, str):
         v = v.strip().lower()
         if v.endswith(Mm.UNIT):
@@ -1049,6 +1209,8 @@ class Mm(Unit):
     >>> mm(pt(5), p(6), '3"') # Arguments can be a list of other units types.
     (1.76mm, 25.4mm, 76.2mm)
     """
+    __slots__ = ()
+
     PT_FACTOR = MM # mm <---> points
     UNIT = 'mm'
 
@@ -1075,10 +1237,9 @@ def cm(v, *args, **kwargs):
             u.append(cm(uv))
         u = tuple(u)
     elif isinstance(v, (int, float)):
-        u = Cm(v)
+        u = internedUnit(Cm, v)
     elif isUnit(v):
-        u = Cm() # New Cm and convert via pt
-        u.pt = v.pt
+        u = Cm(v.pt / Cm.PT_FACTOR) # New Cm and convert via pt
     elif isinstance(v, str):
         v = v.strip().lower()
         if v.endswith(Cm.UNIT):
@@ -1117,6 +1278,8 @@ class Cm(Unit):
     >>> cm(pt(50), p(6), '3"') # Arguments can be a list of other units types.
     (1.76cm, 2.54cm, 7.62cm)
     """
+    __slots__ = ()
+
     PT_FACTOR = MM*10 # mm <---> points
     UNIT = 'cm'
 
@@ -1154,7 +1317,10 @@ def pt(v, *args, **kwargs):
         u = tuple(u)
 
     elif isinstance(v, (int, float)): # Simple value as input, use class
-        u = Pt(v, *args, **kwargs)
+        if kwargs.get('base') is None and not kwargs.get('g'):
+            u = internedUnit(Pt, v) # Shared instance for common values
+        else:
+            u = Pt(v, *args, **kwargs)
     elif isUnit(v): # It's already a Unit instance, convert via points.
         u = Pt(v.pt, *args, **kwargs)
     elif isinstance(v, str): # Value is a string, interpret from unit extension.
@@ -1189,8 +1355,7 @@ class Pt(Unit):
     5pt
     >>> pt(12).pt
     12
-    >>> u = pt(12)
-    >>> u.pt = 120
+    >>> u = pt(12).derive(pt=120)
     >>> u
     120pt
     >>> pt(10, 11, 12) # Multiple arguments create a list of tuple pt
@@ -1204,6 +1369,8 @@ class Pt(Unit):
     >>> pt(10, 12, 13, (20, 21)) # Nested lists, created nested list of pt
     (10pt, 12pt, 13pt, (20pt, 21pt))
     """
+    __slots__ = ()
+
     PT_FACTOR = 1 # pt <--> pt factor
     UNIT = 'pt'
 
@@ -1269,10 +1436,9 @@ def p(v, *args, **kwargs):
             u.append(p(uv))
         u = tuple(u)
     elif isinstance(v, (int, float)):
-        u = P(v)
+        u = internedUnit(P, v)
     elif isUnit(v):
-        u = P() # Make new Pica and convert via pt
-        u.pt = v.pt
+        u = P(v.pt / P.PT_FACTOR) # Make new Pica and convert via pt
     elif isinstance(v, str):
         v = v.strip().lower().replace('pica', P.UNIT)
         if not 'pt' in v: # Hack to avoid confusion with '10pt')
@@ -1281,8 +1447,7 @@ def p(v, *args, **kwargs):
                 v0 = asNumberOrNone(vv[0][0] or '0')
                 v1 = asNumberOrNone(vv[0][1][1:] or '0')
                 if v0 is not None and v1 is not None:
-                    u = P()
-                    u.pt = v0*P.PT_FACTOR+v1
+                    u = P((v0*P.PT_FACTOR+v1) / P.PT_FACTOR)
             else:
                 u = p(units(v))
         else: # Something else, recursively try again.
@@ -1303,6 +1468,8 @@ class P(Unit):
     >>> p('2.5p')
     2p6
     """
+    __slots__ = ()
+
     # 12 points = 1p
     PT_FACTOR = 12
     UNIT = 'p'
@@ -1340,10 +1507,9 @@ def inch(v, *args, **kwargs):
             u.append(inch(uv))
         u = tuple(u)
     elif isinstance(v, (int, float)):
-        return Inch(v)
+        return internedUnit(Inch, v)
     elif isUnit(v):
-        u = Inch() # New Inch and convert via pt
-        u.pt = v.pt
+        u = Inch(v.pt / Inch.PT_FACTOR) # New Inch and convert via pt
     elif isinstance(v, str):
         v = v.strip().lower()
         if v.endswith(Inch.UNITC): # "-character
@@ -1389,6 +1555,8 @@ class Inch(Unit):
     >>> inch('10pt', '11mm')
     (0.14", 0.43")
     """
+    __slots__ = ()
+
     PT_FACTOR = INCH # 72pt = 1"
     UNIT = 'inch' # Alternative is "
     UNITC = '"'
@@ -1427,12 +1595,14 @@ class Formula(Unit):
     PT_FACTOR = 1
     UNIT = 'f'
 
+    __slots__ = ('f', 'units')
+
     def __init__(self, v=0, base=None, g=0, f=None, units=None):
-        Unit.__init__(self, v=v, base=base, g=g)
         self.f = f
         if units is None:
             units = {}
         self.units = units # Key is ID, value is unit
+        Unit.__init__(self, v=v, base=base, g=g)
 
     def addAll(self):
         result = None
@@ -1454,6 +1624,8 @@ class RelativeUnit(Unit):
     BASE = 1 # Default "base reference for relative units."
     GUTTER = U*2 # Used as default gutter measure for Col units.
     BASE_KEY = 'base' # Key in optional base of relative units.
+    __slots__ = ('_base', '_g')
+
     isAbsolute = False # Cannot do arithmetic with absolute Unit instances.
     isRelative = True
 
@@ -1594,7 +1766,7 @@ class RelativeUnit(Unit):
         >>> u = col(0.25, base=mm(200), g=mm(6))
         >>> u.base, u.g # Show unit base and gutter
         (200mm, 6mm)
-        >>> u.g = mm(8) # Set gutter
+        >>> u = u.derive(g=mm(8)) # Set gutter
         >>> #FIX u.mm # (200 + 8)/4 - 8 --> 44 + 8 + 44 + 8 + 44 + 8 + 44 = 200
         44
         >>> from pagebot.constants import A4
@@ -1670,6 +1842,8 @@ class Px(RelativeUnit):
     >>> u.pt
     1050
     """
+    __slots__ = ()
+
     PT_FACTOR = 1.3333 # This may not always be 1:1 to points.
     UNIT = 'px'
 
@@ -1693,7 +1867,7 @@ class Px(RelativeUnit):
         >>> u = px(12)
         >>> u.pt
         12
-        >>> u.pt = 100
+        >>> u = u.derive(pt=100)
         >>> u
         100px
         """
@@ -1758,11 +1932,13 @@ class Fr(RelativeUnit):
     2fr
     >>> u-0.5
     3.5fr
-    >>> u.base = 100
+    >>> u = u.derive(base=100)
     >>> # Answer fr value as points, relative to base master value.
     >>> u, pt(u)
     (4fr, 25pt)
     """
+    __slots__ = ()
+
     UNIT = 'fr'
 
     def _get_rv(self):
@@ -1828,7 +2004,7 @@ class Col(RelativeUnit):
     >>> u = col(1/4, base=mm(200), g=mm(6)) # Width of 1/4 width column.
     >>> u.base, u.g # Show unit base and gutter
     (200mm, 6mm)
-    >>> u.g = mm(8) # Set gutter
+    >>> u = u.derive(g=mm(8)) # Set gutter
     >>> #FIX u.mm # (200 + 8)/4 - 8 --> 44 + 8 + 44 + 8 + 44 + 8 + 44 = 200
     44
     >>> units('0.25col')
@@ -1844,11 +2020,13 @@ class Col(RelativeUnit):
     0.25col
     >>> u-0.3
     0.2col
-    >>> u.base = 500 # With of the column
-    >>> u.g = 8
+    >>> u = u.derive(base=500) # With of the column
+    >>> u = u.derive(g=8)
     >>> u, pt(u) # TODO: CHECK ANSWER. Answer col value as points, relative to base master value and gutter.
     (0.5col, 250pt)
     """
+    __slots__ = ()
+
     UNIT = 'col'
 
     def _get_rv(self):
@@ -1872,7 +2050,7 @@ def em(v, *args, **kwargs):
     >>> u = em(1, base=32)
     >>> u.pt
     32
-    >>> u.base = pt(34)
+    >>> u = u.derive(base=pt(34))
     >>> u.pt
     34
     >>> u = em(1.5, base=48)
@@ -1930,15 +2108,17 @@ class Em(RelativeUnit):
     >>> u-8
     2em
     >>> # Caller can set the base reference value.
-    >>> u.base = 12
+    >>> u = u.derive(base=12)
     >>> pt(u)
     120pt
-    >>> u.base = 24
+    >>> u = u.derive(base=24)
     >>> pt(u)
     240pt
     >>> em(1, 2, 3, 4)
     (1em, 2em, 3em, 4em)
     """
+    __slots__ = ()
+
     isEm = True
     UNIT = 'em'
     # Key in optional base of relative units.
@@ -1953,7 +2133,7 @@ class Em(RelativeUnit):
         >>> u, u.rv
         (10em, 120)
         >>> # Alter the base em.
-        >>> u.base = 8
+        >>> u = u.derive(base=8)
         >>> # Full representation.
         >>> u
         10em
@@ -2055,6 +2235,8 @@ class Perc(RelativeUnit):
     >>> Perc(1.2) + 1.2
     2.4%
     """
+    __slots__ = ()
+
     BASE = 100 # Default "base reference for relative units."
     UNIT = 'perc'
     UNITC = '%'
@@ -2131,8 +2313,22 @@ def value2Maker(v):
     True
     >>> value2Maker(Col) == col
     True
+    >>> value2Maker('123.45fr') == fr # Answered from VALUE_MAKERS cache
+    True
     """
+    # Fast paths for the most common values, avoid parsing.
+    vClass = v.__class__
+    if vClass is int or vClass is float:
+        return pt
+    if isinstance(v, Unit):
+        return UNIT_MAKERS[v.UNIT]
+    if vClass is str:
+        maker = VALUE_MAKERS.get(v)
+        if maker is not None:
+            return maker
+
     maker = None
+    key = v
     if isinstance(v, (int, float)):
         maker = pt
     elif isUnit(v):
@@ -2162,6 +2358,11 @@ def value2Maker(v):
                     unitType = Perc.UNIT
 
             maker = UNIT_MAKERS.get(unitType, maker)
+
+        if maker is not None:
+            if len(VALUE_MAKERS) >= MAX_VALUE_MAKERS:
+                VALUE_MAKERS.clear()
+            VALUE_MAKERS[key] = maker
     return maker
 
 def units(v, maker=None, base=None, g=None, default=None):
@@ -2208,8 +2409,11 @@ def units(v, maker=None, base=None, g=None, default=None):
     >>> units(mm(12), pt) # Casting to another unit type
     34.02pt
     >>> u1 = units('10pt')
-    >>> u1 is units(u1) # Creates copy of u1
-    False
+    >>> u1 is units(u1) # Immutable units are shared, not copied.
+    True
+    >>> u2 = units(u1, base=12) # Setting base or gutter answers a new instance.
+    >>> u1 is u2, u2.base, u1.base
+    (False, 12, None)
     >>> uu = pt(0), 12, (pt(13), pt(14))
     >>> units(uu) # Create a recursive list of units
     (0pt, 12pt, (13pt, 14pt))
@@ -2227,13 +2431,19 @@ def units(v, maker=None, base=None, g=None, default=None):
         return tuple(uu)
 
     u = default
-    makerF = value2Maker(maker)
-    assert maker is None or makerF in MAKERS, ('Cannot find unit maker for "%s"' % maker)
+    if maker is None:
+        makerF = None
+    else:
+        makerF = value2Maker(maker)
+        assert makerF in MAKERS, ('Cannot find unit maker for "%s"' % maker)
 
     if isUnit(v):
-        u = copy(v) # Make sure to copy, avoiding overwriting local values of units.
         if maker is not None:
-            u = makerF(u, base=base, g=g)
+            u = makerF(v, base=base, g=g)
+        else:
+            # Immutable units answer self. Otherwise make sure to copy,
+            # avoiding overwriting local values of units.
+            u = copy(v)
     elif v is not None:
         # Plain values are interpreted as point Units
         if makerF is None:
@@ -2243,11 +2453,13 @@ def units(v, maker=None, base=None, g=None, default=None):
             u = makerF(v, base=base, g=g)
 
     # In case we got a valid unit, then try to set the paremeters if not None.
-    if u is not None:
+    if u is not None and (base is not None or g is not None):
+        attrs = {}
         if base is not None: # Base can be unit or number.
-            u.base = base # Recursive force base to be unit instance
+            attrs['base'] = base # Recursive force base to be unit instance
         if g is not None: # Optional gutter can be unit or number
-            u.g = g # Recursive force gutter to be unit instance.
+            attrs['g'] = g # Recursive force gutter to be unit instance.
+        u = u.derive(**attrs)
 
     if u is None and default is not None:
         u = units(default, base=base, g=g)
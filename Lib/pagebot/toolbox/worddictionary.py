@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# -----------------------------------------------------------------------------
+#
+#     P A G E B O T
+#
+#     Copyright (c) 2016+ Buro Petr van Blokland + Claudia Mens
+#     www.pagebot.io
+#     Licensed under MIT conditions
+#
+#     Supporting DrawBot, www.drawbot.com
+#     Supporting Flat, xxyxyz.org/flat
+# -----------------------------------------------------------------------------
+#
+#     worddictionary.py
+#
+#     Compiled binary format of the hyphenated word lists in
+#     resources/languages. The .txt source is compiled once into the PageBot
+#     cache folder and then opened with mmap, so processes don't need to read
+#     and split the text file again, and share the memory pages of the file.
+#
+#     Layout of the file, all numbers little endian:
+#
+#     header    magic "PBWD", version (H), source size (Q), source mtime in
+#               nanoseconds (Q), number of words (I)
+#     offsets   number of words + 1 offsets (I) of the records, relative to
+#               the start of the records block
+#     records   per word, sorted by the UTF-8 bytes of the word: key length
+#               (H), key bytes, number of hyphens (B), hyphen positions (B)
+#
+import os
+import mmap
+import codecs
+import struct
+from collections.abc import Mapping, ItemsView, ValuesView
+
+from pagebot.filepaths import getCachePath
+from pagebot.toolbox.hyphenator import hyphenated2Positions, positions2Hyphenated
+
+WORD_DICTIONARY_MAGIC = b'PBWD'
+WORD_DICTIONARY_VERSION = 1
+WORD_DICTIONARY_HEADER = struct.Struct('<4sHQQI')
+WORD_DICTIONARY_FOLDER = 'languages'
+
+def readHyphenatedLines(path):
+    """Answers the dictionary {word: hyphenated} of the word list at `path`,
+    with the same rules as hyphenation.hyphenatedWords() always used."""
+    words = {}
+    f = codecs.open(path, mode='r', encoding='utf-8')
+    hyphenatedLines = f.read().split('\n')
+    f.close()
+    for line in hyphenatedLines:
+        if line.startswith('#'):
+            continue
+        key = line.replace('-', '')
+        if len(key) == 0:
+            continue
+        words[key] = line
+    return words
+
+def packWords(words, sourceStat=(0, 0)):
+    """Answers the bytes of the compiled dictionary {word: hyphenated}.
+    Words with hyphen positions that don't fit a byte are not included.
+
+    >>> data = packWords({'marmer': 'mar-mer', 'a': 'a'})
+    >>> d = WordDictionary(data)
+    >>> len(d), d['marmer'], list(d)
+    (2, 'mar-mer', ['a', 'marmer'])
+    """
+    records = []
+    for word, hyphenated in words.items():
+        _, positions = hyphenated2Positions(hyphenated)
+        if len(positions) > 255 or positions and positions[-1] > 255:
+            continue
+        records.append((word.encode('utf-8'), bytes(positions)))
+    records.sort()
+
+    offsets = []
+    data = []
+    offset = 0
+    for key, positions in records:
+        offsets.append(offset)
+        record = struct.pack('<H', len(key)) + key + struct.pack('<B', len(positions)) + positions
+        data.append(record)
+        offset += len(record)
+    offsets.append(offset)
+
+    size, mtime = sourceStat
+    header = WORD_DICTIONARY_HEADER.pack(WORD_DICTIONARY_MAGIC, WORD_DICTIONARY_VERSION,
+        size, mtime, len(records))
+    return header + struct.pack('<%dI' % len(offsets), *offsets) + b''.join(data)
+
+class WordDictionary(Mapping):
+    """Read-only dictionary {word: hyphenated} on the bytes of a compiled word
+    list, typically a mmap of the file. Words are found by binary search on
+    the sorted keys. Iteration answers the words in sorted order.
+
+    >>> d = WordDictionary(packWords({'plaat': 'plaat', 'jes': 'jes', 'marmer': 'mar-mer'}))
+    >>> 'marmer' in d, 'marmers' in d, d.get('plaat'), d.get('xxx')
+    (True, False, 'plaat', None)
+    >>> list(d.items())
+    [('jes', 'jes'), ('marmer', 'mar-mer'), ('plaat', 'plaat')]
+    >>> len(d.values()), 'mar-mer' in d.values()
+    (3, True)
+    """
+    def __init__(self, data):
+        self.data = data # Bytes or mmap
+        magic, version, self.sourceSize, self.sourceMtime, self.count = \
+            WORD_DICTIONARY_HEADER.unpack_from(data, 0)
+        assert magic == WORD_DICTIONARY_MAGIC and version == WORD_DICTIONARY_VERSION
+        self.offsetsStart = WORD_DICTIONARY_HEADER.size
+        self.recordsStart = self.offsetsStart + 4 * (self.count + 1)
+
+    def __repr__(self):
+        return '<%s %d words>' % (self.__class__.__name__, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def _getRecord(self, index):
+        """Answers the (key, positionsStart) of the record at `index`."""
+        start = self.recordsStart + struct.unpack_from('<I', self.data, self.offsetsStart + 4 * index)[0]
+        keyLength = struct.unpack_from('<H', self.data, start)[0]
+        keyStart = start + 2
+        return self.data[keyStart:keyStart + keyLength], keyStart + keyLength
+
+    def _find(self, word):
+        """Answers the position of the hyphen positions of `word` in the data
+        or None if it does not exist."""
+        try:
+            key = word.encode('utf-8')
+        except (AttributeError, UnicodeError):
+            return None
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            midKey, positionsStart = self._getRecord(mid)
+            if midKey < key:
+                lo = mid + 1
+            elif midKey > key:
+                hi = mid
+            else:
+                return positionsStart
+        return None
+
+    def _getHyphenated(self, word, positionsStart):
+        count = self.data[positionsStart]
+        positions = self.data[positionsStart + 1:positionsStart + 1 + count]
+        return positions2Hyphenated(word, positions)
+
+    def __getitem__(self, word):
+        positionsStart = self._find(word)
+        if positionsStart is None:
+            raise KeyError(word)
+        return self._getHyphenated(word, positionsStart)
+
+    def __contains__(self, word):
+        return self._find(word) is not None
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self._getRecord(index)[0].decode('utf-8')
+
+    def iterItems(self):
+        """Answers a generator of (word, hyphenated) in sorted order, reading
+        the records once, without searching the words."""
+        for index in range(self.count):
+            key, positionsStart = self._getRecord(index)
+            word = key.decode('utf-8')
+            yield word, self._getHyphenated(word, positionsStart)
+
+    def items(self):
+        return WordDictionaryItems(self)
+
+    def values(self):
+        return WordDictionaryValues(self)
+
+class WordDictionaryItems(ItemsView):
+    def __iter__(self):
+        return self._mapping.iterItems()
+
+class WordDictionaryValues(ValuesView):
+    def __iter__(self):
+        for _, hyphenated in self._mapping.iterItems():
+            yield hyphenated
+
+def getSourceStat(path):
+    """Answers the (size, mtime in nanoseconds) of the source file."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def getCompiledPath(path):
+    """Answers the path of the compiled dictionary of the word list at `path`
+    in the PageBot cache folder. Answers None if there is no cache folder."""
+    cachePath = getCachePath()
+    if cachePath is None:
+        return None
+    fileName = os.path.basename(path).rsplit('.', 1)[0]
+    return '%s/%s/%s.pbwd' % (cachePath, WORD_DICTIONARY_FOLDER, fileName)
+
+def openWordDictionary(path):
+    """Answers the WordDictionary of the compiled file at `path` with mmap.
+    Answers None if it does not exist or has an other format version."""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError): # Empty file
+        return None
+    finally:
+        f.close()
+    if data[:4] != WORD_DICTIONARY_MAGIC or \
+            struct.unpack_from('<H', data, 4)[0] != WORD_DICTIONARY_VERSION:
+        data.close()
+        return None
+    return WordDictionary(data)
+
+def loadWordDictionary(path, compiledPath=None):
+    """Answers the WordDictionary of the word list .txt file at `path`. The
+    compiled version in the cache folder is used if it matches size and
+    modification time of the source. Otherwise the source is compiled again.
+    If the compiled file cannot be written, then the dictionary is answered
+    from memory.
+
+    >>> import tempfile
+    >>> from pagebot.filepaths import getResourcesPath
+    >>> path = getResourcesPath() + '/languages/pt-br.txt'
+    >>> compiledPath = tempfile.mkdtemp() + '/pt-br.pbwd'
+    >>> words = loadWordDictionary(path, compiledPath)
+    >>> len(words), words['abarcar'], isinstance(words.data, mmap.mmap)
+    (27436, 'a-bar-car', True)
+    >>> words = loadWordDictionary(path, compiledPath) # Opened from cache.
+    >>> len(words) == len(readHyphenatedLines(path))
+    True
+    """
+    sourceStat = getSourceStat(path)
+    try:
+        if compiledPath is None:
+            compiledPath = getCompiledPath(path)
+        words = None
+        if compiledPath is not None:
+            words = openWordDictionary(compiledPath)
+        if words is not None:
+            if (words.sourceSize, words.sourceMtime) == sourceStat:
+                return words
+            words.data.close()
+    except OSError:
+        compiledPath = None
+
+    data = packWords(readHyphenatedLines(path), sourceStat)
+    if compiledPath is not None:
+        tmpPath = '%s.%d.tmp' % (compiledPath, os.getpid())
+        try:
+            folder = os.path.dirname(compiledPath)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(tmpPath, 'wb') as f:
+                f.write(data)
+            # Replace at once, so other processes never read a half written file.
+            os.replace(tmpPath, compiledPath)
+            words = openWordDictionary(compiledPath)
+            if words is not None:
+                return words
+        except OSError:
+            pass
+    return WordDictionary(data)
+
+if __name__ == "__main__":
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])